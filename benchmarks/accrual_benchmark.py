@@ -0,0 +1,169 @@
+"""
+Замеры производительности ежемесячного начисления без графического интерфейса.
+
+Для каждого размера базы создается синтетическая база абонентов (benchmarks/synthetic.py),
+после чего каждый способ начисления выполняется в отдельном процессе на свежей копии базы.
+Выводятся время выполнения, количество SQL-запросов, пиковое потребление памяти
+и количество записей о начислениях в секунду.
+
+Запуск из корня репозитория:
+    python -m benchmarks.accrual_benchmark --sizes 10000 100000 1000000
+    python -m benchmarks.accrual_benchmark --sizes 100000 --engines chunked parallel --output bench_output.txt
+    python -m benchmarks.accrual_benchmark --sizes 100000 --engines simulate
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from multiprocessing import get_context
+
+from sqlalchemy import event, select, func
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic import generate_database
+from src.db.database import SQLITE_PROFILES
+
+# Способы начисления: legacy — прежний обход абонентов по одному,
+# set-based — apply_monthly_accrual одной транзакцией, chunked — run_monthly_accrual
+# с журналом и коммитом каждой пачки, parallel — run_monthly_accrual с расчетом в пуле процессов
+# (для parallel считаются только запросы процесса-писателя), simulate — прогноз AccrualSimulator
+# (загрузка абонентов и расчет при ценах на SIMULATION_PRICE_FACTOR выше; в базу ничего не пишется,
+# в столбце "записей" — количество абонентов с начислением по прогнозу).
+ENGINES = ("legacy", "set-based", "chunked", "parallel", "simulate")
+
+# Прежний способ выполняет несколько запросов на абонента, на больших базах он идет часами
+LEGACY_MAX_CLIENTS = 10_000
+
+ACCRUAL_DATE = date(2026, 10, 3)
+
+# Прогноз при повышении цен всех тарифов на 10%; на базе из 100 000 абонентов он должен занимать меньше секунды
+SIMULATION_PRICE_FACTOR = Decimal("1.10")
+
+
+def _peak_rss_mb():
+    """Пиковое потребление памяти текущим процессом (МБ) или None, если модуль resource недоступен (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает килобайты, macOS — байты
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_case(engine_name: str, path: str, workers: int, profile: str) -> dict:
+    """Выполняет начисление одним способом в отдельном процессе и возвращает замеры."""
+    from src.db.crud import apply_monthly_accrual, run_monthly_accrual
+    from src.db.models import Accrual, Tariff
+    from src.db.simulation import AccrualSimulator
+    from src.db.database import create_db_engine
+    from benchmarks.legacy_accrual import legacy_accrual
+
+    engine = create_db_engine(f"sqlite:///{path}", profile)
+    queries = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        nonlocal queries
+        queries += 1
+
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    with session_factory() as db:
+        accruals_before = db.execute(select(func.count(Accrual.id))).scalar_one()
+        queries = 0
+
+        simulated = None
+        if engine_name == "simulate":
+            prices = {tariff.name: tariff.monthly_price * SIMULATION_PRICE_FACTOR
+                      for tariff in db.execute(select(Tariff)).scalars()}
+            db.rollback()
+            queries = 0
+
+        started = time.perf_counter()
+        if engine_name == "simulate":
+            simulated = AccrualSimulator(db).simulate(ACCRUAL_DATE, prices).clients_charged
+        elif engine_name == "legacy":
+            legacy_accrual(db, ACCRUAL_DATE)
+        elif engine_name == "set-based":
+            apply_monthly_accrual(db, ACCRUAL_DATE, batch_size=10 ** 9)
+            db.commit()
+        elif engine_name == "chunked":
+            run_monthly_accrual(db, ACCRUAL_DATE)
+        else:
+            run_monthly_accrual(db, ACCRUAL_DATE, workers=workers)
+        elapsed = time.perf_counter() - started
+        engine_queries = queries
+
+        accruals_written = db.execute(select(func.count(Accrual.id))).scalar_one() - accruals_before
+        if simulated is not None:
+            accruals_written = simulated
+    engine.dispose()
+
+    return {
+        "seconds": elapsed,
+        "queries": engine_queries,
+        "peak_rss_mb": _peak_rss_mb(),
+        "accruals": accruals_written,
+        "rows_per_second": accruals_written / elapsed if elapsed else 0.0,
+    }
+
+
+def _format_row(size: int, engine_name: str, result: dict) -> str:
+    rss = "н/д" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f}"
+    return (f"{size:>9} {engine_name:<10} {result['seconds']:>9.2f} {result['queries']:>9} "
+            f"{rss:>9} {result['accruals']:>9} {result['rows_per_second']:>11.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности ежемесячного начисления.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Количество абонентов в синтетических базах.")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES),
+                        help="Способы начисления.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Количество процессов для способа parallel.")
+    parser.add_argument("--legacy-max-clients", type=int, default=LEGACY_MAX_CLIENTS,
+                        help="Наибольший размер базы, на котором замеряется прежний способ.")
+    parser.add_argument("--profile", choices=list(SQLITE_PROFILES), default="desktop-safe",
+                        help="Профиль настроек SQLite (src/db/database.py).")
+    parser.add_argument("--seed", type=int, default=1, help="Начальное значение генератора базы.")
+    parser.add_argument("--output", help="Файл, в который дописываются результаты.")
+    args = parser.parse_args(argv)
+
+    header = (f"{'абонентов':>9} {'способ':<10} {'время, с':>9} {'запросов':>9} "
+              f"{'RSS, МБ':>9} {'записей':>9} {'записей/с':>11}")
+    lines = [f"# {datetime.now():%Y-%m-%d %H:%M} начисление за {ACCRUAL_DATE}, "
+             f"процессов: {args.workers}, профиль: {args.profile}", header]
+    print("\n".join(lines), flush=True)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            template = os.path.join(work_dir, f"clients_{size}.db")
+            generate_database(template, size, datetime.combine(ACCRUAL_DATE, datetime.min.time()), args.seed)
+
+            for engine_name in args.engines:
+                if engine_name == "legacy" and size > args.legacy_max_clients:
+                    continue
+                path = os.path.join(work_dir, "case.db")
+                shutil.copy(template, path)
+
+                # Отдельный процесс на каждый замер: пиковая память не накапливается между замерами
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    result = executor.submit(_run_case, engine_name, path, args.workers, args.profile).result()
+
+                line = _format_row(size, engine_name, result)
+                lines.append(line)
+                print(line, flush=True)
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as output:
+            output.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    main()
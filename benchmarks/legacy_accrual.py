@@ -0,0 +1,57 @@
+"""Прежнее начисление (обход абонентов по одному) — базовая линия для сравнения."""
+import calendar
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+from src.db.crud import get_clients, get_tariff_by_id, apply_monthly_charge, apply_daily_charge, \
+    create_accrual_monthly, create_accrual_daily, daily_charge_period
+from src.db.models import StatusClientEnum
+from src.db.price_book import TariffPriceBook
+
+
+def legacy_accrual(db: Session, today: date):
+    """
+    Повторяет цикл _accrual_of_amounts до перехода на начисление набором SQL-запросов:
+    по несколько запросов и коммитов на абонента через apply_monthly_charge,
+    apply_daily_charge, create_accrual_monthly и create_accrual_daily.
+    Цены тарифов за период берутся из истории цен, как в apply_monthly_accrual.
+    """
+    prices = TariffPriceBook.load(db).period_prices(today)
+    clients = get_clients(db, limit=-1)
+
+    for client in clients:
+        accrual_month = client.accrual_date.month if client.accrual_date else 0
+        status_date_month = client.status_date.month if client.status_date else 0
+        status_date_day = client.status_date.day if client.status_date else 0
+        status_date_year = client.status_date.year if client.status_date else 0
+        conn_date = client.connection_date
+        period = daily_charge_period(client, today)
+
+        if accrual_month == 0 or accrual_month != today.month:
+            if client.status == StatusClientEnum.CONNECTING:
+                if status_date_month != today.month:
+                    if conn_date.month != today.month and conn_date.year != today.year:
+                        if apply_monthly_charge(db, client.id, prices):
+                            client.accrual_date = today
+                            tariff = get_tariff_by_id(db, client.tariff_id)
+                            create_accrual_monthly(db, client, tariff, today, prices)
+                    else:
+                        _, days_in_month = calendar.monthrange(conn_date.year, conn_date.month)
+                        actual_days = days_in_month - conn_date.day + 1
+                        if apply_daily_charge(db, client.id, actual_days, period, prices):
+                            client.accrual_date = today
+                            create_accrual_daily(db, client.id, actual_days, today, period, prices)
+                elif status_date_month == today.month and status_date_year == today.year:
+                    _, days_in_month = calendar.monthrange(status_date_year, status_date_month)
+                    actual_days = days_in_month - conn_date.day + 1
+                    if apply_daily_charge(db, client.id, actual_days, period, prices):
+                        client.accrual_date = today
+                        create_accrual_daily(db, client.id, actual_days, today, period, prices)
+            elif client.status == StatusClientEnum.PAUSE:
+                if status_date_month == today.month and status_date_year == today.year:
+                    actual_days = status_date_day - 1
+                    if apply_daily_charge(db, client.id, actual_days, period, prices):
+                        client.accrual_date = today
+                        create_accrual_daily(db, client.id, actual_days, today, period, prices)
+    db.commit()
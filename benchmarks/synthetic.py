@@ -0,0 +1,90 @@
+"""Генератор синтетической базы абонентов для замеров производительности начисления."""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from src.db.database import BaseModel
+from src.db.models import Client, Tariff, StatusClientEnum
+
+# Тарифы и доля абонентов на каждом из них
+TARIFFS = [
+    ("Социальный", 250.0, 0.15),
+    ("Базовый", 350.0, 0.40),
+    ("Стандарт", 600.5, 0.30),
+    ("Премиум", 999.99, 0.15),
+]
+
+# Доли абонентов по статусам
+STATUSES = [
+    (StatusClientEnum.CONNECTING, 0.82),
+    (StatusClientEnum.PAUSE, 0.06),
+    (StatusClientEnum.DISCONNECTING, 0.12),
+]
+
+INSERT_CHUNK_SIZE = 50_000
+
+
+def _client_row(rnd: random.Random, number: int, today: datetime, tariff_ids: list[int]) -> dict:
+    """Формирует данные одного абонента (tariff_ids — ID тарифов в порядке TARIFFS)."""
+    tariff_id = rnd.choices(tariff_ids, weights=[share for _, _, share in TARIFFS])[0]
+    status = rnd.choices([status for status, _ in STATUSES], weights=[share for _, share in STATUSES])[0]
+
+    # Подключения за последние 5 лет, новых абонентов больше
+    days_ago = int(abs(rnd.gauss(0, 600))) % 1825
+    connection_date = today - timedelta(days=days_ago, hours=rnd.randrange(24))
+
+    # Статус меняли примерно у трети абонентов (и всегда у приостановленных и отключенных)
+    status_date = None
+    if status != StatusClientEnum.CONNECTING or rnd.random() < 0.3:
+        status_date = connection_date + timedelta(days=rnd.randrange(0, days_ago + 1))
+
+    # Большинство уже получали начисление в прошлом месяце, часть — в текущем, новые — ни разу
+    roll = rnd.random()
+    if roll < 0.1 or days_ago < 30:
+        accrual_date = None
+    elif roll < 0.2:
+        accrual_date = today.replace(day=1)
+    else:
+        accrual_date = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+    return dict(
+        personal_account=100000 + number,
+        full_name=f"Абонент{number} Иван Иванович",
+        address=f"ул. Ленина, д. {number // 150 + 1}, кв. {number % 150 + 1}",
+        phone_number=f"8900{number:07d}",
+        tariff_id=tariff_id,
+        connection_date=connection_date,
+        accrual_date=accrual_date,
+        balance=round(rnd.uniform(-500, 1500), 2),
+        status=status,
+        status_date=status_date,
+        is_active=status == StatusClientEnum.CONNECTING,
+    )
+
+
+def generate_database(path: str, clients: int, today: datetime, seed: int = 1):
+    """
+    Создает базу SQLite со справочником тарифов и clients синтетическими абонентами.
+
+    :param path: Путь к файлу базы данных (существующие таблицы пересоздаются).
+    :param clients: Количество абонентов.
+    :param today: Дата, относительно которой формируются даты подключения и начислений.
+    :param seed: Начальное значение генератора случайных чисел (одинаковая база при одинаковом seed).
+    """
+    engine = create_engine(f"sqlite:///{path}", echo=False)
+    BaseModel.metadata.drop_all(engine)
+    BaseModel.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    rnd = random.Random(seed)
+
+    with session_factory() as db:
+        db.execute(insert(Tariff), [{"name": name, "monthly_price": price} for name, price, _ in TARIFFS])
+        tariff_ids = db.execute(select(Tariff.id).order_by(Tariff.id)).scalars().all()
+        for start in range(0, clients, INSERT_CHUNK_SIZE):
+            rows = [_client_row(rnd, number, today, tariff_ids)
+                    for number in range(start, min(start + INSERT_CHUNK_SIZE, clients))]
+            db.execute(insert(Client), rows)
+        db.commit()
+    engine.dispose()
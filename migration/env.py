@@ -1,23 +1,26 @@
-import asyncio
 from logging.config import fileConfig
 
-from sqlalchemy import pool
+from sqlalchemy import engine_from_config, pool
 from sqlalchemy.engine import Connection
-from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
 
+from src.db.client_counts import CLIENT_STATUS_COUNTS
+from src.db.client_search import CLIENTS_FTS
 from src.db.database import BaseModel, DATABASE_URL
 from src.db.models import Client, Service
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-config.set_main_option("sqlalchemy.url", DATABASE_URL)
+# База программы (BILLING_DATABASE_URL), если адрес не задан в alembic.ini или вызывающим кодом
+if not config.get_main_option("sqlalchemy.url"):
+    config.set_main_option("sqlalchemy.url", DATABASE_URL)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# Вызывающий код (тесты) может оставить свои настройки журналирования: attributes["configure_logger"] = False
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -26,6 +29,18 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = BaseModel.metadata
 
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """
+    Исключает из автогенерации таблицы, которые создаются SQL-командами вне моделей:
+    полнотекстовый индекс clients_fts со служебными таблицами FTS5 и счетчики client_status_counts.
+    """
+    if type_ == "table" and reflected and compare_to is None:
+        return not (name.startswith(CLIENTS_FTS) or name == CLIENT_STATUS_COUNTS)
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -48,6 +63,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -57,34 +73,34 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    # SQLite не изменяет столбцы на месте: автогенерация пишет операции в batch-режиме
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object,
+                      render_as_batch=True)
 
     with context.begin_transaction():
         context.run_migrations()
 
 
-async def run_async_migrations() -> None:
-    """In this scenario we need to create an Engine
+def run_migrations_online() -> None:
+    """Run migrations in 'online' mode.
+
+    In this scenario we need to create an Engine
     and associate a connection with the context.
+    Программа работает с SQLite через синхронный драйвер (sqlite:///),
+    поэтому и миграции выполняются синхронным движком.
 
     """
 
-    connectable = async_engine_from_config(
+    connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
 
-    async with connectable.connect() as connection:
-        await connection.run_sync(do_run_migrations)
-
-    await connectable.dispose()
-
-
-def run_migrations_online() -> None:
-    """Run migrations in 'online' mode."""
+    with connectable.connect() as connection:
+        do_run_migrations(connection)
 
-    asyncio.run(run_async_migrations())
+    connectable.dispose()
 
 
 if context.is_offline_mode():
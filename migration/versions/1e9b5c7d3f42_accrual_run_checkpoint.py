@@ -0,0 +1,28 @@
+"""Контрольная точка и аренда начисления в журнале (accrual_runs.heartbeat_at, last_client_id)
+
+Revision ID: 1e9b5c7d3f42
+Revises: 6a1d4e8b2f07
+Create Date: 2026-10-17 10:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '1e9b5c7d3f42'
+down_revision: Union[str, None] = '6a1d4e8b2f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('accrual_runs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    op.add_column('accrual_runs', sa.Column('last_client_id', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('accrual_runs') as batch_op:
+        batch_op.drop_column('last_client_id')
+        batch_op.drop_column('heartbeat_at')
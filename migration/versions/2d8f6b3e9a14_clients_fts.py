@@ -0,0 +1,74 @@
+"""Полнотекстовый индекс поиска абонентов (SQLite FTS5) с триггерами синхронизации
+
+Если SQLite собран без FTS5, индекс не создается: поиск абонентов выполняется через LIKE.
+
+Revision ID: 2d8f6b3e9a14
+Revises: 9e4c2a6f1b57
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '2d8f6b3e9a14'
+down_revision: Union[str, None] = '9e4c2a6f1b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGGERS = ('clients_fts_ai', 'clients_fts_ad', 'clients_fts_au')
+
+
+def _fts5_available() -> bool:
+    try:
+        op.execute(sa.text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(value)"))
+        op.execute(sa.text("DROP TABLE temp.fts5_probe"))
+        return True
+    except sa.exc.OperationalError:
+        return False
+
+
+def _fts_values(row: str) -> str:
+    # Буква ё индексируется как е (токенизатор unicode61 их не отождествляет)
+    without_yo = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+    return (f"{row}.personal_account, {without_yo.format(f'{row}.full_name')}, "
+            f"{without_yo.format(f'{row}.address')}")
+
+
+def upgrade() -> None:
+    if not _fts5_available():
+        return
+    op.execute(sa.text(
+        "CREATE VIRTUAL TABLE clients_fts USING fts5("
+        "personal_account, full_name, address, content='clients', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')"
+    ))
+    op.execute(sa.text(
+        "CREATE TRIGGER clients_fts_ai AFTER INSERT ON clients BEGIN "
+        "INSERT INTO clients_fts (rowid, personal_account, full_name, address) "
+        f"VALUES (new.id, {_fts_values('new')}); END"
+    ))
+    op.execute(sa.text(
+        "CREATE TRIGGER clients_fts_ad AFTER DELETE ON clients BEGIN "
+        "INSERT INTO clients_fts (clients_fts, rowid, personal_account, full_name, address) "
+        f"VALUES ('delete', old.id, {_fts_values('old')}); END"
+    ))
+    op.execute(sa.text(
+        "CREATE TRIGGER clients_fts_au AFTER UPDATE OF personal_account, full_name, address ON clients BEGIN "
+        "INSERT INTO clients_fts (clients_fts, rowid, personal_account, full_name, address) "
+        f"VALUES ('delete', old.id, {_fts_values('old')}); "
+        "INSERT INTO clients_fts (rowid, personal_account, full_name, address) "
+        f"VALUES (new.id, {_fts_values('new')}); END"
+    ))
+    op.execute(sa.text(
+        "INSERT INTO clients_fts (rowid, personal_account, full_name, address) "
+        f"SELECT clients.id, {_fts_values('clients')} FROM clients"
+    ))
+
+
+def downgrade() -> None:
+    for trigger in TRIGGERS:
+        op.execute(sa.text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    op.execute(sa.text("DROP TABLE IF EXISTS clients_fts"))
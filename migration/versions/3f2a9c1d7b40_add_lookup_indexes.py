@@ -0,0 +1,49 @@
+"""Индексы для поиска по внешним ключам и полям отбора
+
+Revision ID: 3f2a9c1d7b40
+Revises: d5a3f8e1c270
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7b40'
+down_revision: Union[str, None] = 'd5a3f8e1c270'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Карточка абонента: платежи и начисления абонента
+    op.create_index('ix_payments_client_id', 'payments', ['client_id'], if_not_exists=True)
+    op.create_index('ix_accruals_client_id_accrual_date', 'accruals', ['client_id', 'accrual_date'],
+                    if_not_exists=True)
+    # Отчет по платежам за период (get_payments_in_range)
+    op.create_index('ix_payments_created_at', 'payments', ['created_at'], if_not_exists=True)
+    # Отчет по должникам (get_debtors_report)
+    op.create_index('ix_clients_balance', 'clients', ['balance'], if_not_exists=True)
+    # Отбор по статусу и дате его смены, ежемесячное начисление
+    op.create_index('ix_clients_status_status_date', 'clients', ['status', 'status_date'], if_not_exists=True)
+    op.create_index('ix_clients_accrual_date', 'clients', ['accrual_date'], if_not_exists=True)
+    # Отчеты по подключениям и границы календаря начислений (min/max даты подключения)
+    op.create_index('ix_clients_connection_date', 'clients', ['connection_date'], if_not_exists=True)
+    # Связь абонента с тарифом и поиск услуги по названию без учета регистра
+    op.create_index('ix_tariffs_lower_name', 'tariffs', [sa.text('lower(name)')], if_not_exists=True)
+    op.create_index('ix_services_lower_service_name', 'services', [sa.text('lower(service_name)')],
+                    if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_services_lower_service_name', table_name='services', if_exists=True)
+    op.drop_index('ix_tariffs_lower_name', table_name='tariffs', if_exists=True)
+    op.drop_index('ix_clients_connection_date', table_name='clients', if_exists=True)
+    op.drop_index('ix_clients_accrual_date', table_name='clients', if_exists=True)
+    op.drop_index('ix_clients_status_status_date', table_name='clients', if_exists=True)
+    op.drop_index('ix_clients_balance', table_name='clients', if_exists=True)
+    op.drop_index('ix_payments_created_at', table_name='payments', if_exists=True)
+    op.drop_index('ix_accruals_client_id_accrual_date', table_name='accruals', if_exists=True)
+    op.drop_index('ix_payments_client_id', table_name='payments', if_exists=True)
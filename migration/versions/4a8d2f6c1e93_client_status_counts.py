@@ -0,0 +1,44 @@
+"""Счетчики абонентов по статусам (client_status_counts) с триггерами на таблице clients
+
+Revision ID: 4a8d2f6c1e93
+Revises: 7c3e5a1f8b26
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4a8d2f6c1e93'
+down_revision: Union[str, None] = '7c3e5a1f8b26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGGERS = ('client_status_counts_ai', 'client_status_counts_ad', 'client_status_counts_au')
+
+INCREMENT = ("INSERT INTO client_status_counts (status, count) VALUES (new.status, 1) "
+             "ON CONFLICT (status) DO UPDATE SET count = count + 1;")
+DECREMENT = "UPDATE client_status_counts SET count = count - 1 WHERE status = old.status;"
+
+
+def upgrade() -> None:
+    op.execute(sa.text(
+        "CREATE TABLE client_status_counts (status VARCHAR NOT NULL PRIMARY KEY, count INTEGER NOT NULL)"
+    ))
+    op.execute(sa.text(f"CREATE TRIGGER client_status_counts_ai AFTER INSERT ON clients BEGIN {INCREMENT} END"))
+    op.execute(sa.text(f"CREATE TRIGGER client_status_counts_ad AFTER DELETE ON clients BEGIN {DECREMENT} END"))
+    op.execute(sa.text(
+        "CREATE TRIGGER client_status_counts_au AFTER UPDATE OF status ON clients "
+        f"WHEN old.status IS NOT new.status BEGIN {DECREMENT} {INCREMENT} END"
+    ))
+    op.execute(sa.text(
+        "INSERT INTO client_status_counts (status, count) SELECT status, count(*) FROM clients GROUP BY status"
+    ))
+
+
+def downgrade() -> None:
+    for trigger in TRIGGERS:
+        op.execute(sa.text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    op.execute(sa.text("DROP TABLE IF EXISTS client_status_counts"))
@@ -0,0 +1,26 @@
+"""Версия строки абонента (clients.version) для оптимистической блокировки
+
+Revision ID: 5b7e1d9a3c28
+Revises: c41f7a2e9d63
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e1d9a3c28'
+down_revision: Union[str, None] = 'c41f7a2e9d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('clients', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('clients') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,37 @@
+"""Журнал ежемесячных начислений (accrual_runs): один запуск на расчетный период
+
+Revision ID: 6a1d4e8b2f07
+Revises:
+Create Date: 2026-10-17 10:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '6a1d4e8b2f07'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'accrual_runs',
+        sa.Column('period', sa.String(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('clients_count', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Float(), nullable=False),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('period'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('accrual_runs')
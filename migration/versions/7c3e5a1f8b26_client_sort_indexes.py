@@ -0,0 +1,26 @@
+"""Индексы сортировки списка абонентов по ФИО и статусу
+
+Revision ID: 7c3e5a1f8b26
+Revises: 2d8f6b3e9a14
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e5a1f8b26'
+down_revision: Union[str, None] = '2d8f6b3e9a14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_clients_full_name', 'clients', ['full_name'], if_not_exists=True)
+    op.create_index('ix_clients_status', 'clients', ['status'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clients_status', table_name='clients', if_exists=True)
+    op.drop_index('ix_clients_full_name', table_name='clients', if_exists=True)
@@ -0,0 +1,58 @@
+"""Связь абонента с тарифом по ID тарифа (clients.tariff_id) вместо названия
+
+Названия тарифов абонентов (clients.tariff) сопоставляются с тарифами без учета регистра,
+как это делало начисление. Для названий, которым не нашлось тарифа, создаются
+неактивные тарифы с нулевой ценой: название сохраняется, абонента можно перевести
+на действующий тариф в карточке абонента.
+
+Revision ID: 8d5e2b7c4a91
+Revises: 3f2a9c1d7b40
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '8d5e2b7c4a91'
+down_revision: Union[str, None] = '3f2a9c1d7b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('clients', sa.Column('tariff_id', sa.Integer(), nullable=True))
+
+    # Неактивные тарифы для названий, которых нет в справочнике (одно на название без учета регистра)
+    op.execute(sa.text(
+        "INSERT INTO tariffs (name, monthly_price, is_active) "
+        "SELECT MIN(clients.tariff), 0.0, 0 FROM clients "
+        "WHERE NOT EXISTS (SELECT 1 FROM tariffs WHERE lower(tariffs.name) = lower(clients.tariff)) "
+        "GROUP BY lower(clients.tariff)"
+    ))
+    op.execute(sa.text(
+        "UPDATE clients SET tariff_id = "
+        "(SELECT MIN(tariffs.id) FROM tariffs WHERE lower(tariffs.name) = lower(clients.tariff))"
+    ))
+
+    # SQLite не изменяет столбцы и внешние ключи на месте: таблица пересоздается
+    with op.batch_alter_table('clients') as batch_op:
+        batch_op.alter_column('tariff_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_clients_tariff_id_tariffs', 'tariffs', ['tariff_id'], ['id'])
+        batch_op.drop_column('tariff')
+        batch_op.create_index('ix_clients_tariff_id', ['tariff_id'])
+
+
+def downgrade() -> None:
+    op.add_column('clients', sa.Column('tariff', sa.String(), nullable=True))
+    op.execute(sa.text(
+        "UPDATE clients SET tariff = (SELECT tariffs.name FROM tariffs WHERE tariffs.id = clients.tariff_id)"
+    ))
+
+    with op.batch_alter_table('clients') as batch_op:
+        batch_op.alter_column('tariff', existing_type=sa.String(), nullable=False)
+        batch_op.drop_index('ix_clients_tariff_id')
+        batch_op.drop_constraint('fk_clients_tariff_id_tariffs', type_='foreignkey')
+        batch_op.drop_column('tariff_id')
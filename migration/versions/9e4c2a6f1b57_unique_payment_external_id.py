@@ -0,0 +1,34 @@
+"""Уникальный частичный индекс по payments.external_id (повторная загрузка платежей)
+
+Повторы external_id, если они уже есть в базе, сохраняются у первого платежа;
+у остальных к идентификатору добавляется '#<id платежа>'.
+
+Revision ID: 9e4c2a6f1b57
+Revises: 5b7e1d9a3c28
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4c2a6f1b57'
+down_revision: Union[str, None] = '5b7e1d9a3c28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.text(
+        "UPDATE payments SET external_id = external_id || '#' || id "
+        "WHERE external_id IS NOT NULL AND id > "
+        "(SELECT MIN(first.id) FROM payments AS first WHERE first.external_id = payments.external_id)"
+    ))
+    op.create_index('uq_payments_external_id', 'payments', ['external_id'], unique=True,
+                    sqlite_where=sa.text('external_id IS NOT NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('uq_payments_external_id', table_name='payments')
@@ -0,0 +1,39 @@
+"""Календарь начислений (billing_calendar): дни пользования для каждого дня расчетного периода
+
+Таблица заполняется приложением перед начислением (crud.sync_billing_calendar).
+
+Revision ID: b2e7c9d4a613
+Revises: 1e9b5c7d3f42
+Create Date: 2026-10-17 11:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2e7c9d4a613'
+down_revision: Union[str, None] = '1e9b5c7d3f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'billing_calendar',
+        sa.Column('period', sa.String(), nullable=False),
+        sa.Column('day', sa.Integer(), nullable=False),
+        sa.Column('days_in_period', sa.Integer(), nullable=False),
+        sa.Column('connection_days', sa.Integer(), nullable=False),
+        sa.Column('suspension_days', sa.Integer(), nullable=False),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('period', 'day'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('billing_calendar')
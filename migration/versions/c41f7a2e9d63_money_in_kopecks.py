@@ -0,0 +1,59 @@
+"""Денежные суммы в целых копейках (INTEGER) вместо чисел с плавающей точкой
+
+Суммы переводятся в копейки с округлением до копейки: ROUND(сумма * 100).
+
+Revision ID: c41f7a2e9d63
+Revises: 8d5e2b7c4a91
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7a2e9d63'
+down_revision: Union[str, None] = '8d5e2b7c4a91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Индексы по выражениям (ревизия 3f2a9c1d7b40): пересоздание таблицы в batch-режиме их теряет,
+# так как SQLAlchemy не читает такие индексы из схемы SQLite
+EXPRESSION_INDEXES = [
+    ('ix_tariffs_lower_name', 'tariffs', 'lower(name)'),
+    ('ix_services_lower_service_name', 'services', 'lower(service_name)'),
+]
+
+# Денежный столбец каждой таблицы (все NOT NULL)
+MONEY_COLUMNS = {
+    'clients': 'balance',
+    'payments': 'amount',
+    'accruals': 'amount',
+    'tariffs': 'monthly_price',
+    'tariff_prices': 'monthly_price',
+    'services': 'service_price',
+    'accrual_runs': 'total_amount',
+}
+
+
+def _create_expression_indexes() -> None:
+    for name, table, expression in EXPRESSION_INDEXES:
+        op.create_index(name, table, [sa.text(expression)], if_not_exists=True)
+
+
+def upgrade() -> None:
+    for table, column in MONEY_COLUMNS.items():
+        op.execute(sa.text(f"UPDATE {table} SET {column} = CAST(ROUND({column} * 100) AS INTEGER)"))
+        # SQLite не изменяет тип столбца на месте: таблица пересоздается
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.Float(), type_=sa.Integer(), existing_nullable=False)
+    _create_expression_indexes()
+
+
+def downgrade() -> None:
+    for table, column in MONEY_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.Integer(), type_=sa.Float(), existing_nullable=False)
+        op.execute(sa.text(f"UPDATE {table} SET {column} = {column} / 100.0"))
+    _create_expression_indexes()
@@ -0,0 +1,39 @@
+"""История цен тарифов (tariff_prices): цена действует с effective_from до следующего изменения
+
+Таблица создается пустой: тарифы без истории начисляются по tariffs.monthly_price,
+первую запись истории добавляет crud.set_tariff_price при первом изменении цены.
+
+Revision ID: d5a3f8e1c270
+Revises: b2e7c9d4a613
+Create Date: 2026-10-17 11:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a3f8e1c270'
+down_revision: Union[str, None] = 'b2e7c9d4a613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'tariff_prices',
+        sa.Column('tariff_id', sa.Integer(), nullable=False),
+        sa.Column('monthly_price', sa.Float(), nullable=False),
+        sa.Column('effective_from', sa.Date(), nullable=False),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['tariff_id'], ['tariffs.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tariff_id', 'effective_from'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('tariff_prices')
@@ -0,0 +1,34 @@
+"""Индекс сортировки списка абонентов по статусу в порядке подписей
+
+Статусы упорядочиваются по подписи ("Отключен", "Подключен", "Приостановлен"), а не по имени
+элемента перечисления. Выражение индекса совпадает с CLIENT_STATUS_DISPLAY_ORDER в src/db/models.py.
+
+Revision ID: e7b1c4d9a502
+Revises: 4a8d2f6c1e93
+Create Date: 2026-10-18 01:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b1c4d9a502'
+down_revision: Union[str, None] = '4a8d2f6c1e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATUS_DISPLAY_ORDER = (
+    "CASE WHEN (status = 'DISCONNECTING') THEN 0 WHEN (status = 'CONNECTING') THEN 1 "
+    "WHEN (status = 'PAUSE') THEN 2 END"
+)
+
+
+def upgrade() -> None:
+    op.create_index('ix_clients_status_display_order', 'clients', [sa.text(STATUS_DISPLAY_ORDER)],
+                    if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clients_status_display_order', table_name='clients', if_exists=True)
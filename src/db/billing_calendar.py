@@ -0,0 +1,115 @@
+import calendar
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+from typing import NamedTuple
+
+from sqlalchemy import select, insert, func
+from sqlalchemy.orm import Session
+
+from src.db.models import BillingCalendarDay, Client
+from src.models.money import to_kopecks, from_kopecks, prorate_kopecks
+
+# Наибольший номер дня месяца: таблица содержит строки для дней 1..31 каждого периода,
+# дни, которых нет в месяце, дают 0 дней пользования
+MAX_DAY = 31
+
+
+class BillingPeriod(NamedTuple):
+    """Расчетный период (календарный месяц) с заранее рассчитанными днями пользования."""
+    year: int
+    month: int
+    days: int
+    # Индекс — день месяца (0 не используется)
+    connection_days: tuple[int, ...]
+    suspension_days: tuple[int, ...]
+
+    @property
+    def key(self) -> str:
+        """Период в формате 'ГГГГ-ММ'."""
+        return f"{self.year:04d}-{self.month:02d}"
+
+    def connection_factor(self, day: int) -> float:
+        """Доля месяца при подключении в указанный день (с этого дня до конца месяца включительно)."""
+        return self.connection_days[day] / self.days
+
+    def suspension_factor(self, day: int) -> float:
+        """Доля месяца при приостановке в указанный день (с начала месяца до этого дня, не включая его)."""
+        return self.suspension_days[day] / self.days
+
+
+@lru_cache(maxsize=None)
+def get_billing_period(year: int, month: int) -> BillingPeriod:
+    """
+    Возвращает расчетный период из таблицы в памяти (рассчитывается один раз на период).
+
+    :param year: Год.
+    :param month: Месяц.
+    :return: Расчетный период с днями пользования для каждого дня 1..31.
+    """
+    _, days = calendar.monthrange(year, month)
+    days_range = range(MAX_DAY + 1)
+    return BillingPeriod(
+        year=year,
+        month=month,
+        days=days,
+        connection_days=tuple(max(days - day + 1, 0) if day else 0 for day in days_range),
+        suspension_days=tuple(min(day - 1, days) if day else 0 for day in days_range),
+    )
+
+
+def billing_period_of(value: date) -> BillingPeriod:
+    """Возвращает расчетный период, в который попадает дата."""
+    return get_billing_period(value.year, value.month)
+
+
+def prorate(price: Decimal, used_days: int, period: BillingPeriod) -> Decimal:
+    """
+    Рассчитывает оплату за неполный месяц: цена * дни пользования / дней в периоде.
+
+    Расчет ведется в целых копейках (сначала умножаем, потом делим), половина копейки
+    округляется от нуля — так же, как в начислении набором SQL-запросов.
+    """
+    return from_kopecks(prorate_kopecks(to_kopecks(price), used_days, period.days))
+
+
+def sync_billing_calendar(db: Session, last_date: date) -> int:
+    """
+    Дополняет таблицу billing_calendar периодами от месяца самого раннего подключения
+    абонента до месяца last_date или самого позднего подключения (БЕЗ коммита).
+
+    Таблица используется начислением набором SQL-запросов вместо расчета дат на стороне SQLite.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param last_date: Дата последнего нужного периода (дата начисления).
+    :return: Количество добавленных периодов.
+    """
+    first_connection, last_connection = db.execute(
+        select(func.min(Client.connection_date), func.max(Client.connection_date))
+    ).one()
+    first = min(first_connection.date(), last_date) if first_connection is not None else last_date
+    last = max(last_connection.date(), last_date) if last_connection is not None else last_date
+
+    existing = set(db.execute(select(BillingCalendarDay.period).distinct()).scalars())
+    rows = []
+    added = 0
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        period = get_billing_period(year, month)
+        if period.key not in existing:
+            added += 1
+            rows.extend(
+                {
+                    "period": period.key,
+                    "day": day,
+                    "days_in_period": period.days,
+                    "connection_days": period.connection_days[day],
+                    "suspension_days": period.suspension_days[day],
+                }
+                for day in range(1, MAX_DAY + 1)
+            )
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    if rows:
+        db.execute(insert(BillingCalendarDay), rows)
+    return added
@@ -0,0 +1,83 @@
+import weakref
+
+from sqlalchemy import Connection, text
+
+# Количество абонентов по статусам, которое поддерживают триггеры на таблице clients.
+# Счетчики строки "Количество абонентов" читаются из трех строк этой таблицы, а не подсчетом
+# по всей таблице абонентов при каждом обновлении списка.
+CLIENT_STATUS_COUNTS = "client_status_counts"
+
+
+def _increment(status: str) -> str:
+    """Увеличение счетчика статуса status (new.status) на единицу в SQL."""
+    return (f"INSERT INTO {CLIENT_STATUS_COUNTS} (status, count) VALUES ({status}, 1) "
+            f"ON CONFLICT (status) DO UPDATE SET count = count + 1;")
+
+
+def _decrement(status: str) -> str:
+    """Уменьшение счетчика статуса status (old.status) на единицу в SQL."""
+    return f"UPDATE {CLIENT_STATUS_COUNTS} SET count = count - 1 WHERE status = {status};"
+
+
+_CREATE_CLIENT_STATUS_COUNTS = [
+    f"""
+    CREATE TABLE {CLIENT_STATUS_COUNTS} (
+        status VARCHAR NOT NULL PRIMARY KEY,
+        count INTEGER NOT NULL
+    )
+    """,
+    f"""
+    CREATE TRIGGER {CLIENT_STATUS_COUNTS}_ai AFTER INSERT ON clients BEGIN
+        {_increment('new.status')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER {CLIENT_STATUS_COUNTS}_ad AFTER DELETE ON clients BEGIN
+        {_decrement('old.status')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER {CLIENT_STATUS_COUNTS}_au AFTER UPDATE OF status ON clients
+    WHEN old.status IS NOT new.status BEGIN
+        {_decrement('old.status')}
+        {_increment('new.status')}
+    END
+    """,
+    # Счетчики уже существующих абонентов
+    f"""
+    INSERT INTO {CLIENT_STATUS_COUNTS} (status, count)
+    SELECT status, count(*) FROM clients GROUP BY status
+    """,
+]
+
+# Движки, в базах которых таблица счетчиков уже найдена (отсутствие таблицы не запоминается)
+_engines_with_counts = weakref.WeakKeyDictionary()
+
+
+def has_client_status_counts(connection: Connection) -> bool:
+    """Проверяет, есть ли в базе таблица счетчиков абонентов по статусам."""
+    if connection.engine in _engines_with_counts:
+        return True
+    found = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": CLIENT_STATUS_COUNTS}
+    ).first() is not None
+    if found:
+        _engines_with_counts[connection.engine] = True
+    return found
+
+
+def create_client_status_counts(connection: Connection) -> bool:
+    """
+    Создает таблицу счетчиков абонентов по статусам и триггеры, если их нет, и заполняет
+    счетчики по уже существующим абонентам.
+
+    :param connection: Соединение с базой данных SQLite (транзакция фиксируется вызывающим кодом).
+    :return: True, если таблица есть или создана; False для других СУБД.
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+    if has_client_status_counts(connection):
+        return True
+    for statement in _CREATE_CLIENT_STATUS_COUNTS:
+        connection.execute(text(statement))
+    return True
@@ -0,0 +1,116 @@
+import re
+import weakref
+from typing import Optional
+
+from sqlalchemy import Connection, text
+from sqlalchemy.exc import OperationalError
+
+# Полнотекстовый индекс абонентов (SQLite FTS5) по Л/С, ФИО и адресу.
+# Таблица хранит только индекс (content='clients'), строки берутся из clients по rowid = clients.id.
+# Токенизатор unicode61 не учитывает регистр, в том числе кириллицы ("иванов" находит "Иванов"),
+# и диакритику латиницы; "ё" он не приводит к "е", поэтому ФИО и адрес индексируются с заменой ё на е.
+# Префиксные индексы ускоряют поиск по первым 2-4 буквам слова.
+CLIENTS_FTS = "clients_fts"
+
+
+def _fts_values(row: str) -> str:
+    """Значения столбцов индекса для строки абонента row (new, old или clients) в SQL."""
+    without_yo = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+    return (f"{row}.personal_account, {without_yo.format(f'{row}.full_name')}, "
+            f"{without_yo.format(f'{row}.address')}")
+
+_CREATE_CLIENTS_FTS = [
+    f"""
+    CREATE VIRTUAL TABLE {CLIENTS_FTS} USING fts5(
+        personal_account, full_name, address,
+        content='clients', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )
+    """,
+    # Индекс обновляется триггерами; изменение баланса и статуса индекс не затрагивает
+    f"""
+    CREATE TRIGGER {CLIENTS_FTS}_ai AFTER INSERT ON clients BEGIN
+        INSERT INTO {CLIENTS_FTS} (rowid, personal_account, full_name, address)
+        VALUES (new.id, {_fts_values('new')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER {CLIENTS_FTS}_ad AFTER DELETE ON clients BEGIN
+        INSERT INTO {CLIENTS_FTS} ({CLIENTS_FTS}, rowid, personal_account, full_name, address)
+        VALUES ('delete', old.id, {_fts_values('old')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER {CLIENTS_FTS}_au AFTER UPDATE OF personal_account, full_name, address ON clients BEGIN
+        INSERT INTO {CLIENTS_FTS} ({CLIENTS_FTS}, rowid, personal_account, full_name, address)
+        VALUES ('delete', old.id, {_fts_values('old')});
+        INSERT INTO {CLIENTS_FTS} (rowid, personal_account, full_name, address)
+        VALUES (new.id, {_fts_values('new')});
+    END
+    """,
+    # Индекс по уже существующим абонентам
+    f"""
+    INSERT INTO {CLIENTS_FTS} (rowid, personal_account, full_name, address)
+    SELECT clients.id, {_fts_values('clients')} FROM clients
+    """,
+]
+
+# Движки, в базах которых индекс уже найден (отсутствие индекса не запоминается)
+_engines_with_fts = weakref.WeakKeyDictionary()
+
+
+def fts5_available(connection: Connection) -> bool:
+    """Проверяет, собран ли SQLite с модулем FTS5."""
+    try:
+        connection.execute(text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(value)"))
+        connection.execute(text("DROP TABLE temp.fts5_probe"))
+        return True
+    except OperationalError:
+        return False
+
+
+def has_clients_fts(connection: Connection) -> bool:
+    """Проверяет, есть ли в базе полнотекстовый индекс абонентов."""
+    if connection.engine in _engines_with_fts:
+        return True
+    found = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": CLIENTS_FTS}
+    ).first() is not None
+    if found:
+        _engines_with_fts[connection.engine] = True
+    return found
+
+
+def create_clients_fts(connection: Connection) -> bool:
+    """
+    Создает полнотекстовый индекс абонентов и триггеры, если их нет, и заполняет индекс
+    по уже существующим абонентам.
+
+    :param connection: Соединение с базой данных SQLite (транзакция фиксируется вызывающим кодом).
+    :return: True, если индекс есть или создан; False, если SQLite собран без FTS5.
+    """
+    if connection.dialect.name != "sqlite" or not fts5_available(connection):
+        return False
+    if has_clients_fts(connection):
+        return True
+    for statement in _CREATE_CLIENTS_FTS:
+        connection.execute(text(statement))
+    return True
+
+
+def clients_fts_query(search_term: str) -> Optional[str]:
+    """
+    Строит запрос FTS5 для строки поиска: все слова должны встречаться как начала слов.
+
+    Число ищется по началу Л/С, слова — по ФИО и адресу ("иван лен" находит
+    "Иванов Иван" с адресом "ул. Ленина").
+
+    :return: Выражение для MATCH или None, если в строке нет слов.
+    """
+    words = re.findall(r"[^\W_]+", search_term.replace("ё", "е").replace("Ё", "Е"))
+    if not words:
+        return None
+    phrases = " ".join(f'"{word}"*' for word in words)
+    if search_term.strip().isdigit():
+        return f"personal_account : ({phrases})"
+    return "{full_name address} : (" + phrases + ")"
@@ -1,16 +1,50 @@
-from datetime import datetime, date
-from typing import Optional, Sequence
-
-from sqlalchemy import select, or_, func, delete, desc, insert
+import calendar
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import Optional, Sequence, Callable, Mapping, Iterator
+
+from sqlalchemy import select, or_, and_, func, delete, desc, insert, update, case, cast, literal, Integer, \
+    DateTime, type_coerce, bindparam, literal_column, table, column, text, true
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload, raiseload, defer, undefer
 
 from src.models.services import ServiceCreate
-from src.db.models import Client, Tariff, Service, Payment, Accrual, StatusClientEnum
+from src.db.models import Client, Tariff, Service, Payment, Accrual, StatusClientEnum, AccrualRun, BillingCalendarDay, \
+    TariffPrice, CLIENT_STATUS_DISPLAY_ORDER, CLIENT_STATUS_DISPLAY_RANK
+from src.db.client_counts import CLIENT_STATUS_COUNTS, has_client_status_counts
+from src.db.client_search import CLIENTS_FTS, clients_fts_query, has_clients_fts
+from src.db.billing_calendar import BillingPeriod, billing_period_of, prorate, sync_billing_calendar
+from src.db.money import Kopecks
+from src.db.pagination import Page, paginate, walk_pages, decode_cursor
+from src.db.rows import ClientRow, DebtorRow, BankReportRow, ClientMovementRow, PaymentReportRow
+from src.db.price_book import TariffPriceBook
 from src.models.clients import ClientCreate, ClientUpdate
-from src.models.payments import PaymentCreate
+from src.models.payments import PaymentCreate, RegistryPayment, PaymentPostingResult, PaymentPostingSummary, \
+    PostingStatusEnum
 from src.models.tariffs import TariffCreate
-from src.models.accruals import AccrualCreate
+from src.models.accruals import AccrualCreate, AccrualSummary
+from src.models.money import to_kopecks
+
+# Количество абонентов, обрабатываемых одной пачкой при массовом начислении
+ACCRUAL_BATCH_SIZE = 5000
+# Время, после которого незавершенное начисление без отметок heartbeat_at считается прерванным
+ACCRUAL_RUN_LEASE = timedelta(minutes=5)
+# Сколько предыдущих месяцев доначисляется перед первым начислением нового периода
+ACCRUAL_BACKFILL_PERIODS = 12
+# Количество значений в одном условии IN (SQLite ограничивает число параметров запроса)
+IN_CHUNK_SIZE = 500
+# Количество строк на странице при постраничном чтении списков (клиенты, платежи, начисления)
+PAGE_SIZE = 500
+
+# Загрузка абонентов для списков и выгрузок: тариф одним JOIN, паспорт и платежи/начисления
+# не читаются, обращение к ним вызывает ошибку вместо запроса на каждого абонента
+_CLIENT_LIST_OPTIONS = (joinedload(Client.tariff), defer(Client.passport, raiseload=True), raiseload("*"))
+
+# Календарь месяца подключения абонента и календарь периода начисления
+_connection_calendar = aliased(BillingCalendarDay, name="connection_calendar")
+_period_calendar = aliased(BillingCalendarDay, name="period_calendar")
 
 
 def create_client(db: Session, client_data: ClientCreate) -> Client | None:
@@ -58,6 +92,9 @@ def delete_client(db: Session, client_id: int) -> bool:
     # 1. Формируем запрос на удаление
     # DELETE FROM clients WHERE id = :client_id
     try:
+        # Платежи и начисления абонента удаляются вместе с ним (внешние ключи проверяются SQLite)
+        db.execute(delete(Payment).where(Payment.client_id == client_id))
+        db.execute(delete(Accrual).where(Accrual.client_id == client_id))
         stmt = delete(Client).where(Client.id == client_id)
 
         # 2. Выполняем запрос
@@ -80,11 +117,17 @@ def delete_tariff(db: Session, tariff_id: int) -> bool:
 
             :param db: Активная синхронная сессия базы данных.
             :param tariff_id: Идентификатор Тарифа.
-            :return: True, если тариф был успешно удален, False в противном случае.
+            :return: True, если тариф был успешно удален, False в противном случае
+                (в том числе если тариф назначен абонентам).
             """
+    # Тариф, назначенный абонентам, не удаляем (clients.tariff_id ссылается на тариф)
+    if db.execute(select(Client.id).where(Client.tariff_id == tariff_id).limit(1)).first() is not None:
+        return False
+
     # 1. Формируем запрос на удаление
     # DELETE FROM clients WHERE id = :client_id
     try:
+        db.execute(delete(TariffPrice).where(TariffPrice.tariff_id == tariff_id))
         stmt = delete(Tariff).where(Tariff.id == tariff_id)
 
         # 2. Выполняем запрос
@@ -160,6 +203,32 @@ def get_client_by_pa(db: Session, client_pa: int) -> Optional[Client]:
     return result.scalars().first()
 
 
+def get_client_card(db: Session, client_pa: int) -> Optional[Client]:
+    """
+    Синхронно получает клиента по Лицевому счету со всеми данными карточки абонента:
+    паспортом, тарифом, платежами и начислениями.
+
+    Платежи и начисления читаются пакетно (selectinload): по одному запросу на каждый
+    список, а не отдельными обращениями к базе из карточки.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param client_pa: Уникальный PA (personal account) клиента.
+    :return: Объект клиента с загруженными связями или None, если клиент не найден.
+    """
+    stmt = (
+        select(Client)
+        .options(
+            undefer(Client.passport),
+            joinedload(Client.tariff),
+            selectinload(Client.payments),
+            selectinload(Client.accruals),
+        )
+        .where(Client.personal_account == client_pa)
+    )
+    result = db.execute(stmt)
+    return result.scalars().first()
+
+
 def update_client(db: Session, client_id: int, client_data: ClientUpdate) -> Optional[Client]:
     """
     Синхронно обновляет данные существующего клиента.
@@ -199,8 +268,8 @@ def get_clients(db: Session, skip: int = 0, limit: int = 1000) -> Sequence[Clien
     :param limit: Максимальное количество записей для возврата.
     :return: Список объектов клиентов (моделей SQLAlchemy).
     """
-    # 1. Формируем синхронный запрос: SELECT * FROM clients
-    stmt = select(Client).offset(skip).limit(limit)
+    # 1. Формируем синхронный запрос: SELECT * FROM clients JOIN tariffs (тариф нужен спискам и выгрузке)
+    stmt = select(Client).options(*_CLIENT_LIST_OPTIONS).offset(skip).limit(limit)
 
     # 2. Выполняем запрос
     result = db.execute(stmt)
@@ -210,28 +279,203 @@ def get_clients(db: Session, skip: int = 0, limit: int = 1000) -> Sequence[Clien
     return result.scalars().all()
 
 
-def search_clients(db: Session, search_term: str) -> Sequence[Client]:
+def get_clients_page(db: Session, cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Page:
+    """
+    Синхронно получает страницу клиентов в порядке ID (keyset-пагинация).
+
+    В отличие от get_clients, страница ищется по ID последнего клиента предыдущей
+    страницы, а не пропуском skip строк, поэтому любая страница читается за одно время.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param cursor: Курсор, полученный с предыдущей страницей (None — первая страница).
+    :param limit: Максимальное количество клиентов на странице.
+    :return: Страница клиентов (с загруженными тарифами) и курсор следующей страницы.
+    :raises ValueError: Если курсор поврежден.
     """
-    Синхронно ищет клиентов по Л/С (если цифры) или по частичному совпадению
-    ФИО или Адреса (без учета регистра).
+    stmt = select(Client).options(*_CLIENT_LIST_OPTIONS)
+    return paginate(db, stmt, (Client.id,), cursor, limit)
+
+
+def iter_clients(db: Session, page_size: int = PAGE_SIZE) -> Iterator[Client]:
     """
-    search_pattern = f"%{search_term}%"
+    Перебирает всех клиентов страницами по page_size (для списков, отчетов и выгрузок).
 
-    if search_term.isdigit():
-        stmt = select(Client).where(Client.personal_account.like(search_pattern))
-    else:
-        stmt = select(Client).where(
-            or_(
-                Client.full_name.ilike(search_pattern),
-                Client.address.ilike(search_pattern)
-            )
+    :param db: Активная синхронная сессия базы данных.
+    :param page_size: Количество клиентов, читаемых из базы за один запрос.
+    """
+    return walk_pages(lambda cursor: get_clients_page(db, cursor, page_size))
+
+
+def get_client_rows_page(db: Session, cursor: Optional[str] = None, limit: int = PAGE_SIZE,
+                         search_term: Optional[str] = None, sort: str = "id",
+                         descending: bool = False) -> Page:
+    """
+    Синхронно получает страницу строк списка абонентов (только отображаемые столбцы).
+
+    В отличие от get_clients_page, объекты Client не создаются: читаются только столбцы
+    ClientRow и название тарифа, паспорт и связи абонента не загружаются.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param cursor: Курсор, полученный с предыдущей страницей (None — первая страница).
+    :param limit: Максимальное количество строк на странице.
+    :param search_term: Строка поиска (см. _client_search_filter); None — все абоненты.
+    :param sort: Поле ClientRow, по которому сортируется список (ключ CLIENT_ROW_SORT_KEYS).
+        Абоненты с одинаковым значением поля упорядочиваются по ID.
+    :param descending: Сортировка по убыванию.
+    :return: Страница строк ClientRow и курсор следующей страницы.
+    :raises ValueError: Если курсор поврежден или поле сортировки неизвестно.
+    """
+    if sort not in CLIENT_ROW_SORT_KEYS:
+        raise ValueError(f"Неизвестное поле сортировки списка абонентов: {sort}")
+    keys = (*CLIENT_ROW_SORT_KEYS[sort], Client.id)
+
+    stmt = _client_rows_select()
+    if search_term is not None:
+        if sort == "id" and not descending:
+            # Индекс возвращает только абонентов этой страницы: ID после курсора, не больше limit + 1
+            after_id = decode_cursor(cursor)[0] if cursor is not None else None
+            stmt = stmt.where(_client_search_filter(db, search_term, limit + 1, after_id))
+        else:
+            stmt = stmt.where(_client_search_filter(db, search_term))
+    return paginate(db, stmt, keys, cursor, limit, descending=descending, scalars=False, row_type=ClientRow,
+                    key_values=_client_row_status_key if sort == "status" else None)
+
+
+def iter_client_rows(db: Session, page_size: int = PAGE_SIZE) -> Iterator[ClientRow]:
+    """Перебирает строки списка всех абонентов страницами по page_size."""
+    return walk_pages(lambda cursor: get_client_rows_page(db, cursor, page_size))
+
+
+def iter_client_movement_rows(db: Session, page_size: int = PAGE_SIZE) -> Iterator[ClientMovementRow]:
+    """Перебирает даты подключения и смены статуса всех абонентов (отчет по движению абонентов)."""
+    stmt = select(Client.id, Client.connection_date, Client.status, Client.status_date)
+    return walk_pages(lambda cursor: paginate(db, stmt, (Client.id,), cursor, page_size,
+                                              scalars=False, row_type=ClientMovementRow))
+
+
+_TARIFF_NAME = Tariff.name.label("tariff_name")
+
+# Столбцы сортировки списка абонентов по полям ClientRow (последним ключом всегда идет Client.id).
+# Для каждого есть индекс, в котором строки с одинаковым значением упорядочены по ID, поэтому
+# страница читается по индексу без сортировки всего списка.
+CLIENT_ROW_SORT_KEYS = {
+    "id": (),
+    "personal_account": (Client.personal_account,),
+    "full_name": (Client.full_name,),
+    "address": (Client.address,),
+    "tariff_name": (_TARIFF_NAME,),
+    "balance": (Client.balance,),
+    # Статусы упорядочиваются по подписи, как их видит оператор (индекс по выражению)
+    "status": (CLIENT_STATUS_DISPLAY_ORDER,),
+}
+
+
+def _client_row_status_key(row: ClientRow) -> tuple[int, int]:
+    """Ключ сортировки по статусу для курсора: номер статуса в порядке отображения и ID."""
+    return CLIENT_STATUS_DISPLAY_RANK[row.status], row.id
+
+
+def _client_rows_select():
+    """Запрос строк списка абонентов (ClientRow) с названием тарифа."""
+    return (
+        select(Client.id, Client.personal_account, Client.full_name, Client.address,
+               _TARIFF_NAME, Client.balance, Client.status)
+        .join(Tariff, _client_tariff_clause())
+    )
+
+
+def _client_search_filter(db: Session, search_term: str, limit: Optional[int] = None,
+                          after_id: Optional[int] = None):
+    """
+    Условие поиска клиентов по Л/С (если цифры) или по ФИО и адресу.
+
+    Если в базе есть полнотекстовый индекс clients_fts, ищутся абоненты, у которых слова
+    начинаются с введенных слов (без учета регистра, в том числе кириллицы). Иначе (SQLite без FTS5)
+    выполняется прежний поиск подстроки через LIKE с полным просмотром таблицы.
+
+    :param limit: Если задан, индекс возвращает только первые limit абонентов по ID
+        (для коротких запросов вроде "ив" не перебираются все совпадения).
+    :param after_id: Если задан, индекс возвращает только абонентов с ID больше after_id
+        (следующая страница списка).
+    """
+    fts_query = clients_fts_query(search_term)
+    if fts_query is not None and has_clients_fts(db.connection()):
+        rowid = literal_column("rowid")
+        matched = (
+            select(rowid)
+            .select_from(table(CLIENTS_FTS))
+            .where(text(f"{CLIENTS_FTS} MATCH :fts_query").bindparams(fts_query=fts_query))
         )
+        if after_id is not None:
+            matched = matched.where(rowid > after_id)
+        if limit is not None:
+            matched = matched.order_by(rowid).limit(limit)
+        return Client.id.in_(matched)
+
+    search_pattern = f"%{search_term}%"
+    if search_term.isdigit():
+        return Client.personal_account.like(search_pattern)
+    return or_(
+        Client.full_name.ilike(search_pattern),
+        Client.address.ilike(search_pattern)
+    )
+
+
+def search_clients(db: Session, search_term: str, limit: Optional[int] = None) -> Sequence[Client]:
+    """
+    Синхронно ищет клиентов по Л/С (если цифры) или по ФИО и Адресу без учета регистра
+    (см. _client_search_filter).
+
+    :param limit: Максимальное количество найденных клиентов (None — все).
+    """
+    stmt = (
+        select(Client).options(*_CLIENT_LIST_OPTIONS)
+        .where(_client_search_filter(db, search_term, limit))
+        .order_by(Client.id)
+        .limit(limit)
+    )
 
     result = db.execute(stmt)
 
     return result.scalars().all()
 
 
+def search_client_rows(db: Session, search_term: str, limit: Optional[int] = None) -> list[ClientRow]:
+    """
+    Ищет клиентов так же, как search_clients, но возвращает строки списка абонентов (ClientRow).
+    """
+    stmt = (
+        _client_rows_select()
+        .where(_client_search_filter(db, search_term, limit))
+        .order_by(Client.id)
+        .limit(limit)
+    )
+    return [ClientRow._make(row) for row in db.execute(stmt)]
+
+
+def count_clients_by_status(db: Session) -> dict[StatusClientEnum, int]:
+    """
+    Количество абонентов каждого статуса (для счетчиков на вкладке "Абоненты").
+
+    Если в базе есть таблица счетчиков client_status_counts, читаются ее строки (по одной на статус),
+    иначе абоненты подсчитываются GROUP BY по индексу ix_clients_status.
+
+    :param db: Активная синхронная сессия базы данных.
+    :return: Количество абонентов по статусам (0 для статусов без абонентов).
+    """
+    if has_client_status_counts(db.connection()):
+        counts = table(CLIENT_STATUS_COUNTS, column("status"), column("count"))
+        rows = db.execute(select(counts.c.status, counts.c.count)).all()
+    else:
+        rows = db.execute(select(Client.status, func.count()).group_by(Client.status)).all()
+
+    result = dict.fromkeys(StatusClientEnum, 0)
+    for status, count in rows:
+        # Статус хранится в базе по имени элемента перечисления
+        result[status if isinstance(status, StatusClientEnum) else StatusClientEnum[status]] = count
+    return result
+
+
 def create_tariff(db: Session, tariff_data: TariffCreate) -> Tariff | None:
     """Добавляет новый тариф."""
     try:
@@ -244,6 +488,75 @@ def create_tariff(db: Session, tariff_data: TariffCreate) -> Tariff | None:
         return None
 
 
+def set_tariff_price(db: Session, tariff_id: int, monthly_price: Decimal, effective_from: date) -> TariffPrice | None:
+    """
+    Устанавливает цену тарифа с указанной даты, сохраняя прежние цены в истории tariff_prices.
+
+    При первом изменении цены прежняя цена записывается в историю с даты создания тарифа.
+    Если новая цена уже действует, обновляется и текущая цена Tariff.monthly_price.
+    Цена применяется к начислениям за периоды, которые начинаются не раньше effective_from.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param tariff_id: Идентификатор тарифа.
+    :param monthly_price: Новая стоимость в месяц.
+    :param effective_from: Дата начала действия цены.
+    :return: Запись истории цен или None, если тариф не найден или произошла ошибка.
+    """
+    tariff = get_tariff_by_id(db, tariff_id)
+    if tariff is None:
+        return None
+
+    try:
+        if not tariff.prices:
+            first_date = tariff.created_at.date() if tariff.created_at else effective_from
+            if first_date < effective_from:
+                db.add(TariffPrice(tariff_id=tariff.id, monthly_price=tariff.monthly_price,
+                                   effective_from=first_date))
+
+        tariff_price = db.execute(
+            select(TariffPrice).where(TariffPrice.tariff_id == tariff.id, TariffPrice.effective_from == effective_from)
+        ).scalar_one_or_none()
+        if tariff_price is None:
+            tariff_price = TariffPrice(tariff_id=tariff.id, monthly_price=monthly_price, effective_from=effective_from)
+            db.add(tariff_price)
+        else:
+            tariff_price.monthly_price = monthly_price
+        db.flush()
+
+        tariff.monthly_price = TariffPriceBook.load(db).price(tariff.id, date.today())
+        db.commit()
+        return tariff_price
+    except SQLAlchemyError as e:
+        db.rollback()
+        return None
+
+
+def get_tariff_prices_on(db: Session, on: date) -> dict[int, Decimal]:
+    """
+    Синхронно получает цены всех тарифов, действующие на дату (для списка тарифов и документов).
+
+    Цена берется из истории цен (TariffPriceBook), а не из Tariff.monthly_price: цена,
+    установленная с будущей даты, начинает действовать без повторного сохранения тарифа.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param on: Дата, на которую нужны цены.
+    :return: {id тарифа: цена}.
+    """
+    return TariffPriceBook.load(db).prices(on)
+
+
+def get_tariff_prices(db: Session, tariff_id: int) -> Sequence[TariffPrice]:
+    """
+    Синхронно получает историю цен тарифа по возрастанию даты начала действия.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param tariff_id: Идентификатор тарифа.
+    :return: Список записей истории цен.
+    """
+    stmt = select(TariffPrice).where(TariffPrice.tariff_id == tariff_id).order_by(TariffPrice.effective_from)
+    return db.execute(stmt).scalars().all()
+
+
 def create_service(db: Session, service_data: ServiceCreate) -> Service | None:
     """Добавляет новую Услугу."""
     try:
@@ -293,6 +606,20 @@ def get_tariff_by_id(db: Session, tariff_id: int) -> Tariff | None:
     return result.scalars().first()
 
 
+def get_tariff_ids(db: Session) -> dict[str, int]:
+    """
+    Возвращает ID тарифов по названию в нижнем регистре (для загрузки абонентов из файла).
+
+    :param db: Активная синхронная сессия базы данных.
+    :return: Словарь {название тарифа в нижнем регистре: ID тарифа}.
+    """
+    stmt = select(Tariff.name, Tariff.id).order_by(Tariff.id)
+    tariff_ids = {}
+    for name, tariff_id in db.execute(stmt):
+        tariff_ids.setdefault(name.lower(), tariff_id)
+    return tariff_ids
+
+
 def get_tariffs(db: Session, skip: int = 0, limit: int = 100) -> Sequence[Tariff]:
     """Получение списка Тарифов"""
     stmt = select(Tariff).offset(skip).limit(limit)
@@ -300,9 +627,22 @@ def get_tariffs(db: Session, skip: int = 0, limit: int = 100) -> Sequence[Tariff
     return result.scalars().all()
 
 
-def apply_monthly_charge(db: Session, client_id: int) -> Optional[Client]:
+def _tariff_price(tariff: Tariff, prices: Optional[Mapping[int, Decimal]]) -> Decimal:
+    """
+    Цена тарифа за период: из истории цен (prices — {id тарифа: цена}, см. TariffPriceBook.period_prices)
+    или текущая цена Tariff.monthly_price, как _tariff_price_expr в SQL.
+    """
+    if prices is None:
+        return tariff.monthly_price
+    return prices.get(tariff.id, tariff.monthly_price)
+
+
+def apply_monthly_charge(db: Session, client_id: int,
+                         prices: Optional[Mapping[int, Decimal]] = None) -> Optional[Client]:
     """
     Рассчитывает ежемесячную плату и вычитает ее из баланса (БЕЗ коммита).
+
+    :param prices: Цены тарифов за период из истории цен (см. TariffPriceBook.period_prices).
     """
     client = get_client_by_id(db, client_id)
 
@@ -310,14 +650,14 @@ def apply_monthly_charge(db: Session, client_id: int) -> Optional[Client]:
     if client is None or client.status != StatusClientEnum.CONNECTING:
         return None
 
-    tariff = get_tariff_by_name(db, client.tariff)
+    tariff = client.tariff
     if tariff is None:
         # Логирование вместо простого принта — хороший тон в 2026
-        # logger.warning(f"Тариф '{client.tariff}' не найден для ID {client_id}")
+        # logger.warning(f"Тариф {client.tariff_id} не найден для ID {client_id}")
         return client
 
     # Вычитаем стоимость
-    client.balance -= tariff.monthly_price
+    client.balance -= _tariff_price(tariff, prices)
 
     # db.flush() синхронизирует состояние с БД, но не закрывает транзакцию.
     # Это позволяет другим запросам в этой же сессии видеть обновленный баланс.
@@ -326,27 +666,44 @@ def apply_monthly_charge(db: Session, client_id: int) -> Optional[Client]:
     return client
 
 
-def apply_daily_charge(db: Session, client_id: int, count_days: int) -> Optional[Client]:
+def daily_charge_period(client: Client, accrual_date: date) -> BillingPeriod:
+    """
+    Возвращает расчетный период, по длине которого рассчитывается пропорциональная оплата.
+
+    Выбор совпадает с календарями начисления набором SQL-запросов (см. _accrual_joins):
+    месяц подключения, если статус абонента не менялся в месяце начисления, иначе — месяц начисления.
+
+    :param client: Абонент.
+    :param accrual_date: Дата выполнения начисления.
+    """
+    status_month = client.status_date.month if client.status_date else 0
+    if status_month != accrual_date.month:
+        return billing_period_of(client.connection_date)
+    return billing_period_of(accrual_date)
+
+
+def apply_daily_charge(db: Session, client_id: int, count_days: int, period: BillingPeriod,
+                       prices: Optional[Mapping[int, Decimal]] = None) -> Optional[Client]:
     """
     Рассчитывает пропорциональную оплату (БЕЗ коммита).
+
+    :param count_days: Количество дней пользования.
+    :param period: Расчетный период (см. daily_charge_period), задает количество дней в месяце.
+    :param prices: Цены тарифов за период из истории цен (см. TariffPriceBook.period_prices).
     """
     client = get_client_by_id(db, client_id)
     if client is None or client.status != StatusClientEnum.CONNECTING:
         return None
 
-    tariff = get_tariff_by_name(db, client.tariff)
+    tariff = client.tariff
     if tariff is None:
         return client
 
-    # Расчет суммы (Вариант А: Точный финансовый через Decimal)
-    # Чтобы не терять копейки, сначала умножаем цену на дни, затем делим на 30
-    charge_amount = (tariff.monthly_price * count_days) / 30
-
-    # Округляем до 2 знаков после запятой
-    charge_amount = round(charge_amount, 2)
+    # Доля месяца по календарю начислений (сначала умножаем цену на дни, затем делим на дни месяца)
+    charge_amount = prorate(_tariff_price(tariff, prices), count_days, period)
 
     # Обновляем баланс
-    client.balance -= float(charge_amount)  # или оставить Decimal, если поле Numeric
+    client.balance -= charge_amount
 
     # Синхронизируем состояние, но оставляем транзакцию открытой
     db.flush()
@@ -421,6 +778,224 @@ def create_payment(db: Session, payment: PaymentCreate) -> Payment | None:
         return None
 
 
+def _post_balance_delta(db: Session, client_id: int, delta: Decimal, expected_version: Optional[int] = None):
+    """
+    Изменяет баланс абонента на delta одним запросом UPDATE clients SET balance = balance + :delta
+    и увеличивает версию строки. Транзакция не фиксируется.
+
+    :param expected_version: Версия абонента, которую видел оператор; если строка с тех пор
+        изменилась, изменение не выполняется.
+    :raises StaleDataError: Если абонент не найден или его версия отличается от expected_version.
+    """
+    stmt = (
+        update(Client)
+        .where(Client.id == client_id)
+        .values(balance=Client.balance + delta, version=Client.version + 1)
+        .execution_options(synchronize_session="fetch")
+    )
+    if expected_version is not None:
+        stmt = stmt.where(Client.version == expected_version)
+    if db.execute(stmt).rowcount != 1:
+        raise StaleDataError(f"Абонент id={client_id} удален или изменен другим пользователем")
+
+
+def _payment_insert():
+    """INSERT платежа, который пропускается, если платеж с тем же external_id уже проведен."""
+    return sqlite_insert(Payment).on_conflict_do_nothing(
+        index_elements=[Payment.external_id], index_where=Payment.external_id.is_not(None)
+    )
+
+
+def get_payment_by_external_id(db: Session, external_id: str) -> Optional[Payment]:
+    """
+    Синхронно получает платеж по идентификатору из банка или окна оплаты.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param external_id: Идентификатор платежа (external_id).
+    :return: Объект платежа или None, если платеж не найден.
+    """
+    stmt = select(Payment).where(Payment.external_id == external_id)
+    return db.execute(stmt).scalar_one_or_none()
+
+
+def post_payment(db: Session, payment: PaymentCreate, expected_version: Optional[int] = None) -> Payment | None:
+    """
+    Синхронно проводит платеж: добавляет платеж и увеличивает баланс абонента в одной транзакции.
+
+    Баланс изменяется на стороне SQLite (balance = balance + сумма), поэтому одновременные
+    проводки не теряют друг друга, как при чтении баланса и записи нового значения.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param payment: Объект Pydantic с данными платежа.
+    :param expected_version: Версия абонента, с которой работал оператор (None — без проверки).
+    Платеж с external_id, который уже проведен (повторное нажатие «Оплатить», повторная
+    загрузка реестра), второй раз не добавляется и баланс не изменяет: возвращается
+    проведенный ранее платеж.
+
+    :return: Созданный (или ранее проведенный) объект платежа или None, если произошла ошибка базы данных.
+    :raises StaleDataError: Если абонент удален или изменен после чтения expected_version.
+    """
+    try:
+        db_payment = db.scalars(
+            _payment_insert().values(**payment.model_dump(exclude_none=True)).returning(Payment)
+        ).first()
+        if db_payment is None:
+            db.rollback()
+            return get_payment_by_external_id(db, payment.external_id)
+        _post_balance_delta(db, payment.client_id, payment.amount, expected_version)
+        db.commit()
+        return db_payment
+    except StaleDataError:
+        db.rollback()
+        raise
+    except SQLAlchemyError as e:
+        db.rollback()
+        return None
+
+
+def post_accrual(db: Session, accrual: AccrualCreate, expected_version: Optional[int] = None) -> Accrual | None:
+    """
+    Синхронно проводит начисление: добавляет начисление и списывает его сумму с баланса
+    абонента в одной транзакции (см. post_payment).
+
+    :param db: Активная синхронная сессия базы данных.
+    :param accrual: Объект Pydantic с данными начисления.
+    :param expected_version: Версия абонента, с которой работал оператор (None — без проверки).
+    :return: Созданный объект начисления или None, если произошла ошибка базы данных.
+    :raises StaleDataError: Если абонент удален или изменен после чтения expected_version.
+    """
+    db_accrual = Accrual(**accrual.model_dump())
+    try:
+        db.add(db_accrual)
+        _post_balance_delta(db, accrual.client_id, -accrual.amount, expected_version)
+        db.commit()
+        return db_accrual
+    except StaleDataError:
+        db.rollback()
+        raise
+    except SQLAlchemyError as e:
+        db.rollback()
+        return None
+
+
+def _chunks(values: Sequence, size: int = IN_CHUNK_SIZE):
+    """Делит последовательность на части не длиннее size (для условий IN)."""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _client_ids_by_pa(db: Session, accounts: Sequence[int]) -> dict[int, int]:
+    """Сопоставляет лицевые счета с ID абонентов (неизвестных счетов в результате нет)."""
+    client_ids = {}
+    for chunk in _chunks(list(set(accounts))):
+        client_ids.update(db.execute(
+            select(Client.personal_account, Client.id).where(Client.personal_account.in_(chunk))
+        ).tuples().all())
+    return client_ids
+
+
+def _posted_external_ids(db: Session, external_ids: Sequence[str]) -> set[str]:
+    """Идентификаторы платежей из external_ids, которые уже проведены."""
+    posted = set()
+    for chunk in _chunks(list(set(external_ids))):
+        posted.update(db.execute(select(Payment.external_id).where(Payment.external_id.in_(chunk))).scalars())
+    return posted
+
+
+def post_payments_bulk(db: Session, payments: Sequence[RegistryPayment]) -> PaymentPostingSummary | None:
+    """
+    Синхронно проводит реестр платежей одной транзакцией.
+
+    Лицевые счета сопоставляются с абонентами пакетными запросами, все платежи добавляются одним
+    INSERT (executemany), а балансы абонентов увеличиваются на сумму их платежей одним UPDATE
+    (executemany по абонентам). Строки с неизвестным лицевым счетом не проводятся, строки с суммой
+    не больше нуля (RegistryPayment, созданный без проверки) отклоняются.
+
+    Повторы external_id отсеиваются до записи: внутри реестра — по множеству уже встреченных
+    идентификаторов, среди проведенных ранее — одним запросом по индексу на пачку. Платеж,
+    проведенный другим пользователем в это же время, пропускается при INSERT (ON CONFLICT DO NOTHING).
+    Повторы отмечаются в результате и не мешают провести остальные платежи, поэтому загрузку
+    реестра можно безопасно повторить.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param payments: Строки реестра.
+    :return: Итог проведения с результатами по строкам или None, если произошла ошибка базы данных.
+    """
+    client_ids = _client_ids_by_pa(db, [payment.personal_account for payment in payments])
+    seen_external_ids = _posted_external_ids(
+        db, [payment.external_id for payment in payments if payment.external_id is not None]
+    )
+
+    statuses = []
+    payment_rows = []
+    posted_at = datetime.now()
+    for payment in payments:
+        if payment.amount <= 0:
+            statuses.append(PostingStatusEnum.REJECTED)
+        elif client_ids.get(payment.personal_account) is None:
+            statuses.append(PostingStatusEnum.UNKNOWN_ACCOUNT)
+        elif payment.external_id is not None and payment.external_id in seen_external_ids:
+            statuses.append(PostingStatusEnum.DUPLICATE)
+        else:
+            statuses.append(PostingStatusEnum.POSTED)
+            if payment.external_id is not None:
+                seen_external_ids.add(payment.external_id)
+            payment_rows.append({
+                "client_id": client_ids[payment.personal_account],
+                "amount": payment.amount,
+                "external_id": payment.external_id,
+                "payment_date": payment.payment_date or posted_at,
+            })
+
+    clients = Client.__table__
+    balance_update = (
+        update(clients)
+        .where(clients.c.id == bindparam("client_id_"))
+        .values(balance=clients.c.balance + bindparam("delta", type_=Kopecks), version=clients.c.version + 1)
+    )
+    inserted_external_ids = set()
+    if payment_rows:
+        try:
+            # RETURNING возвращает только добавленные строки: по ним считаются изменения балансов
+            inserted = db.execute(
+                _payment_insert().returning(Payment.client_id, Payment.amount, Payment.external_id),
+                payment_rows,
+            ).all()
+            deltas: dict[int, Decimal] = {}
+            for client_id, amount, external_id in inserted:
+                deltas[client_id] = deltas.get(client_id, Decimal("0")) + amount
+                inserted_external_ids.add(external_id)
+            if deltas:
+                db.execute(balance_update, [{"client_id_": client_id, "delta": delta}
+                                            for client_id, delta in deltas.items()])
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            return None
+
+    summary = PaymentPostingSummary()
+    for payment, status in zip(payments, statuses):
+        if (status is PostingStatusEnum.POSTED and payment.external_id is not None
+                and payment.external_id not in inserted_external_ids):
+            status = PostingStatusEnum.DUPLICATE
+        if status is PostingStatusEnum.POSTED:
+            summary.posted += 1
+            summary.total_amount += payment.amount
+        elif status is PostingStatusEnum.DUPLICATE:
+            summary.duplicates += 1
+        elif status is PostingStatusEnum.REJECTED:
+            summary.rejected += 1
+        else:
+            summary.unknown_accounts += 1
+        summary.results.append(PaymentPostingResult(
+            personal_account=payment.personal_account,
+            external_id=payment.external_id,
+            amount=payment.amount,
+            status=status,
+        ))
+    return summary
+
+
 def get_payment_by_id(db: Session, payment_id: int) -> Optional[Payment]:
     """
     Синхронно получает один платеж по его уникальному ID.
@@ -456,6 +1031,24 @@ def get_payments(db: Session, skip: int = 0, limit: int = 100) -> Sequence[Payme
     return result.scalars().all()
 
 
+def get_payments_page(db: Session, cursor: Optional[str] = None, limit: int = PAGE_SIZE,
+                      client_id: Optional[int] = None) -> Page:
+    """
+    Синхронно получает страницу платежей в порядке ID (keyset-пагинация).
+
+    :param db: Активная синхронная сессия базы данных.
+    :param cursor: Курсор, полученный с предыдущей страницей (None — первая страница).
+    :param limit: Максимальное количество платежей на странице.
+    :param client_id: ID Клиента, если нужны только его платежи.
+    :return: Страница платежей и курсор следующей страницы.
+    :raises ValueError: Если курсор поврежден.
+    """
+    stmt = select(Payment)
+    if client_id is not None:
+        stmt = stmt.where(Payment.client_id == client_id)
+    return paginate(db, stmt, (Payment.id,), cursor, limit)
+
+
 def get_debtors_report(db: Session) -> Sequence[Client]:
     """Формирует отчет: получает список всех клиентов, чей баланс меньше 0 (должники).
     :param db: Активная синхронная сессия базы данных.
@@ -465,6 +1058,35 @@ def get_debtors_report(db: Session) -> Sequence[Client]:
     return result.scalars().all()
 
 
+def get_debtor_rows(db: Session) -> list[DebtorRow]:
+    """
+    Отчет по должникам в виде строк (DebtorRow), по возрастанию баланса, как get_debtors_report.
+
+    :param db: Активная синхронная сессия базы данных.
+    """
+    stmt = (
+        select(Client.id, Client.personal_account, Client.full_name, Client.address, Client.balance, Client.status)
+        .where(Client.balance < 0)
+        .order_by(Client.balance)
+    )
+    return [DebtorRow._make(row) for row in db.execute(stmt)]
+
+
+def get_bank_report_rows(db: Session) -> list[BankReportRow]:
+    """
+    Подключенные абоненты с отрицательным балансом для реестра задолженности в банк.
+
+    :param db: Активная синхронная сессия базы данных.
+    """
+    stmt = (
+        select(Client.id, Client.personal_account, Client.full_name, Client.accrual_date, Client.balance,
+               Client.status)
+        .where(Client.balance < 0, Client.status == StatusClientEnum.CONNECTING)
+        .order_by(Client.id)
+    )
+    return [BankReportRow._make(row) for row in db.execute(stmt)]
+
+
 def get_payments_by_client(db: Session, client_id: int) -> Sequence[Payment]:
     """
     Синхронно получает список платежей с Клиента.
@@ -501,6 +1123,48 @@ def get_payments_in_range(db: Session, start_date: datetime, end_date: datetime)
     return result.scalars().all()
 
 
+def get_payments_in_range_page(db: Session, start_date: datetime, end_date: datetime,
+                               cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Page:
+    """
+    Синхронно получает страницу платежей за период в порядке даты платежа.
+
+    Ключ страницы — дата платежа и ID (платежи с одинаковой датой не теряются
+    и не повторяются на границе страниц).
+
+    :param db: Активная синхронная сессия базы данных.
+    :param start_date: Начало периода.
+    :param end_date: Конец периода.
+    :param cursor: Курсор, полученный с предыдущей страницей (None — первая страница).
+    :param limit: Максимальное количество платежей на странице.
+    :return: Страница платежей и курсор следующей страницы.
+    :raises ValueError: Если курсор поврежден.
+    """
+    stmt = select(Payment).where(Payment.created_at.between(start_date, end_date))
+    return paginate(db, stmt, (Payment.created_at, Payment.id), cursor, limit)
+
+
+def iter_payments_in_range(db: Session, start_date: datetime, end_date: datetime,
+                           page_size: int = PAGE_SIZE) -> Iterator[Payment]:
+    """Перебирает платежи за период страницами по page_size в порядке даты платежа."""
+    return walk_pages(lambda cursor: get_payments_in_range_page(db, start_date, end_date, cursor, page_size))
+
+
+def iter_payment_report_rows(db: Session, start_date: datetime, end_date: datetime,
+                             page_size: int = PAGE_SIZE) -> Iterator[PaymentReportRow]:
+    """
+    Перебирает платежи за период вместе с Л/С и ФИО плательщика (PaymentReportRow)
+    в порядке даты платежа. Клиент читается в том же запросе, а не отдельно на каждый платеж.
+    """
+    stmt = (
+        select(Payment.id, Payment.created_at, Payment.payment_date, Client.personal_account, Client.full_name,
+               Payment.amount)
+        .join(Client, Client.id == Payment.client_id)
+        .where(Payment.created_at.between(start_date, end_date))
+    )
+    return walk_pages(lambda cursor: paginate(db, stmt, (Payment.created_at, Payment.id), cursor, page_size,
+                                              scalars=False, row_type=PaymentReportRow))
+
+
 def get_accruals_by_client(db: Session, client_id: int) -> Sequence[Accrual]:
     """
         Синхронно получает список начислений Клиента.
@@ -514,6 +1178,24 @@ def get_accruals_by_client(db: Session, client_id: int) -> Sequence[Accrual]:
     return result.scalars().all()
 
 
+def get_accruals_page(db: Session, cursor: Optional[str] = None, limit: int = PAGE_SIZE,
+                      client_id: Optional[int] = None) -> Page:
+    """
+    Синхронно получает страницу начислений в порядке ID (keyset-пагинация).
+
+    :param db: Активная синхронная сессия базы данных.
+    :param cursor: Курсор, полученный с предыдущей страницей (None — первая страница).
+    :param limit: Максимальное количество начислений на странице.
+    :param client_id: ID Клиента, если нужны только его начисления.
+    :return: Страница начислений и курсор следующей страницы.
+    :raises ValueError: Если курсор поврежден.
+    """
+    stmt = select(Accrual)
+    if client_id is not None:
+        stmt = stmt.where(Accrual.client_id == client_id)
+    return paginate(db, stmt, (Accrual.id,), cursor, limit)
+
+
 def get_last_accrual_by_client(db: Session, client_id: int) -> Optional[Accrual]:
     """
         Синхронно получает последний платеж Клиента.
@@ -548,25 +1230,28 @@ def create_accrual(db: Session, accrual: AccrualCreate) -> Accrual | None:
         return None
 
 
-def create_accrual_daily(db: Session, client_id: int, count_days: int, accrual_date: datetime) -> Optional[Accrual]:
+def create_accrual_daily(db: Session, client_id: int, count_days: int, accrual_date: datetime,
+                         period: BillingPeriod, prices: Optional[Mapping[int, Decimal]] = None) -> Optional[Accrual]:
     """
     Синхронно добавляет начисление за неполный месяц.
+
+    :param period: Расчетный период (см. daily_charge_period), задает количество дней в месяце.
+    :param prices: Цены тарифов за период из истории цен (см. TariffPriceBook.period_prices).
     """
     client = get_client_by_id(db, client_id)
     if client is None or client.is_active == 0:
         return None
 
-    tariff = get_tariff_by_name(db, client.tariff)
+    tariff = client.tariff
     if tariff is None:
         return None
 
-    # Точный расчет суммы (сначала умножаем, потом делим)
-    # Используем round(..., 2) для денежного формата
-    charge_amount = round((tariff.monthly_price * count_days) / 30, 2)
+    # Доля месяца по календарю начислений
+    charge_amount = prorate(_tariff_price(tariff, prices), count_days, period)
 
     # Используем Pydantic v2 .model_dump()
     accrual_data = AccrualCreate(
-        amount=float(charge_amount),
+        amount=charge_amount,
         client_id=client.id,
         accrual_date=accrual_date
     )
@@ -580,35 +1265,528 @@ def create_accrual_daily(db: Session, client_id: int, count_days: int, accrual_d
     return accrual_db
 
 
-def create_accrual_monthly(db: Session, client: Client, tariff: Tariff, accrual_date: date) -> Optional[Accrual]:
+def create_accrual_monthly(db: Session, client: Client, tariff: Tariff, accrual_date: date,
+                           prices: Optional[Mapping[int, Decimal]] = None) -> Accrual:
     """
     Создает запись о начислении на основе уже имеющихся объектов клиента и тарифа.
+
+    Ошибки не перехватываются: запись добавляется в транзакцию вызывающего кода,
+    и при ошибке он откатывает начисление целиком.
+
+    :param prices: Цены тарифов за период из истории цен (см. TariffPriceBook.period_prices).
+    :raises pydantic.ValidationError: Если данные начисления некорректны.
+    :raises SQLAlchemyError: Если запись не удалось добавить в базу.
     """
-    try:
-        # Используем Pydantic схему для валидации (Pydantic v2 .model_dump())
-        accrual_data = AccrualCreate(
-            amount=tariff.monthly_price,
-            client_id=client.id,
-            accrual_date=accrual_date
+    # Используем Pydantic схему для валидации (Pydantic v2 .model_dump())
+    accrual_data = AccrualCreate(
+        amount=_tariff_price(tariff, prices),
+        client_id=client.id,
+        accrual_date=accrual_date
+    )
+
+    # Создаем модель SQLAlchemy
+    accrual_db = Accrual(**accrual_data.model_dump())
+
+    db.add(accrual_db)
+    db.flush()  # Отправляем в БД, но не фиксируем (commit будет в конце цикла)
+    return accrual_db
+
+
+def _date_part(column, fmt: str):
+    """Возвращает часть даты (месяц, год, день) как целое число на стороне SQLite."""
+    return cast(func.strftime(fmt, column), Integer)
+
+
+def _tariff_price_expr(prices: Optional[Mapping[int, Decimal]] = None):
+    """
+    SQL-выражение цены тарифа за период в целых копейках: цена из истории цен
+    (prices — {id тарифа: цена}, см. TariffPriceBook.period_prices) или текущая цена Tariff.monthly_price.
+    """
+    monthly_price = type_coerce(Tariff.monthly_price, Integer)
+    if not prices:
+        return monthly_price
+    return case({tariff_id: to_kopecks(price) for tariff_id, price in prices.items()},
+                value=Tariff.id, else_=monthly_price)
+
+
+def _prorate_expr(kopecks, used_days, days):
+    """
+    SQL-выражение доли суммы в копейках: kopecks * used_days / days, половина копейки
+    округляется вверх (цены неотрицательны). Целочисленно, как prorate_kopecks.
+    """
+    return (kopecks * used_days * 2 + days) // (days * 2)
+
+
+def _monthly_charge_expr(accrual_date: date, prices: Optional[Mapping[int, Decimal]] = None,
+                         backfill: bool = False):
+    """
+    Формирует SQL-выражение суммы ежемесячного начисления абоненту.
+
+    Повторяет ветвления метода начисления в GUI: полный месяц, пропорциональное
+    начисление с даты подключения и пропорциональное начисление при смене статуса
+    в текущем месяце. Если начисление не положено, выражение возвращает NULL.
+    Дни пользования и длина месяца берутся из календаря начислений billing_calendar
+    (см. _accrual_joins), сумма за неполный месяц — цена * дни пользования / дней в месяце.
+
+    Суммы рассчитываются в целых копейках (целочисленное деление SQLite, половина
+    копейки округляется вверх) и совпадают с prorate() до копейки.
+
+    :param accrual_date: Дата выполнения начисления.
+    :param prices: Цены тарифов за период из истории цен (см. _tariff_price_expr).
+    :param backfill: Доначисление за прошедший период (accrual_date — его первое число): подключение
+        и смена статуса относятся к периоду по полной дате, а не по номеру месяца и году.
+    :return: SQL-выражение суммы начисления.
+    """
+    monthly_price = _tariff_price_expr(prices)
+    if backfill:
+        period_start = datetime.combine(accrual_date.replace(day=1), datetime.min.time())
+        # Статус после конца периода исключен условием отбора (_backfill_accrual_filter)
+        status_outside_period = or_(Client.status_date.is_(None), Client.status_date < period_start)
+        connected_before_period = Client.connection_date < period_start
+        status_in_period_year = true()
+    else:
+        status_month = func.coalesce(_date_part(Client.status_date, '%m'), 0)
+        status_year = func.coalesce(_date_part(Client.status_date, '%Y'), 0)
+        conn_month = _date_part(Client.connection_date, '%m')
+        conn_year = _date_part(Client.connection_date, '%Y')
+        status_outside_period = status_month != accrual_date.month
+        connected_before_period = and_(conn_month != accrual_date.month, conn_year != accrual_date.year)
+        status_in_period_year = status_year == accrual_date.year
+
+    charge = case(
+        # Подключение было в прошлом месяце или раньше — полная стоимость тарифа
+        (
+            and_(status_outside_period, connected_before_period),
+            monthly_price
+        ),
+        # Подключение в этом месяце — пропорционально дням пользования в месяце подключения
+        (
+            status_outside_period,
+            _prorate_expr(monthly_price, _connection_calendar.connection_days, _connection_calendar.days_in_period)
+        ),
+        # Статус изменен в этом месяце и в этом году — дни пользования с дня подключения в текущем месяце
+        (
+            status_in_period_year,
+            _prorate_expr(monthly_price, _period_calendar.connection_days, _period_calendar.days_in_period)
+        ),
+        else_=None,
+    )
+    return type_coerce(charge, Kopecks)
+
+
+def _accrual_joins(accrual_date: date) -> list:
+    """
+    Таблицы, которые присоединяются к абонентам при начислении, и условия присоединения:
+    тариф, календарь месяца подключения и календарь периода начисления (по дню подключения).
+    """
+    conn_day = _date_part(Client.connection_date, '%d')
+    return [
+        (Tariff, _client_tariff_clause()),
+        (_connection_calendar, and_(_connection_calendar.period == func.strftime('%Y-%m', Client.connection_date),
+                                    _connection_calendar.day == conn_day)),
+        (_period_calendar, and_(_period_calendar.period == accrual_period(accrual_date),
+                                _period_calendar.day == conn_day)),
+    ]
+
+
+def _join_accrual_sources(stmt, accrual_date: date):
+    """Присоединяет к запросу по абонентам тариф и календарь начислений (см. _accrual_joins)."""
+    for target, onclause in _accrual_joins(accrual_date):
+        stmt = stmt.join(target, onclause)
+    return stmt
+
+
+def _monthly_accrual_filter(accrual_date: date):
+    """
+    Условие отбора абонентов для ежемесячного начисления.
+
+    Приостановленным и отключенным абонентам начисление не выполняется:
+    пропорциональное списание (apply_daily_charge) применяется только к подключенным.
+    """
+    return and_(
+        Client.status == StatusClientEnum.CONNECTING,
+        or_(Client.accrual_date.is_(None), _date_part(Client.accrual_date, '%m') != accrual_date.month),
+        _monthly_charge_expr(accrual_date).is_not(None),
+    )
+
+
+def _client_tariff_clause():
+    """Условие связи абонента с тарифом по ID тарифа."""
+    return Tariff.id == Client.tariff_id
+
+
+def _backfill_accrual_filter(period_start: date):
+    """
+    Условие отбора абонентов для доначисления за пропущенный период.
+
+    В отличие от ежемесячного начисления сравнивается полная дата последнего начисления.
+    Доначисление выполняется только абонентам, которые уже получали начисление: у абонента
+    без начислений (accrual_date пуст) пропуск не определить, и первое начисление ему
+    выполняет ежемесячное начисление. Абонент должен быть подключен и находиться в текущем
+    статусе до конца периода, чтобы не начислять оплату за месяцы приостановки или до подключения.
+    """
+    next_period_start = datetime.combine((period_start + timedelta(days=31)).replace(day=1), datetime.min.time())
+    return and_(
+        Client.status == StatusClientEnum.CONNECTING,
+        Client.accrual_date.is_not(None),
+        Client.accrual_date < datetime.combine(period_start, datetime.min.time()),
+        Client.connection_date < next_period_start,
+        or_(Client.status_date.is_(None), Client.status_date < next_period_start),
+        _monthly_charge_expr(period_start, backfill=True).is_not(None),
+    )
+
+
+def _apply_monthly_accrual_slice(db: Session, accrual_date: date, accrual_filter,
+                                 prices: Optional[Mapping[int, Decimal]] = None,
+                                 backfill: bool = False) -> tuple[int, Decimal]:
+    """
+    Выполняет начисление абонентам, отобранным условием accrual_filter (БЕЗ коммита).
+
+    :param accrual_date: Дата начисления (определяет правила полного и неполного месяца).
+    :param accrual_filter: Условие отбора абонентов (ежемесячное начисление или доначисление и диапазон id).
+    :param prices: Цены тарифов за период из истории цен (см. _tariff_price_expr).
+    :param backfill: Доначисление за прошедший период (см. _monthly_charge_expr).
+    :return: Количество абонентов, которым выполнено начисление, и сумма начислений среза.
+    """
+    accrual_datetime = datetime.combine(accrual_date, datetime.min.time())
+    charge = _monthly_charge_expr(accrual_date, prices, backfill)
+
+    # 1. Итоги считаем до изменения данных, пока условие отбора еще выполняется (сумма — целые копейки)
+    totals_stmt = _join_accrual_sources(
+        select(func.count(Client.id), func.sum(charge)), accrual_date
+    ).where(accrual_filter)
+    clients_charged, total_amount = db.execute(totals_stmt).one()
+
+    if not clients_charged:
+        return 0, Decimal("0")
+
+    # 2. Записи о начислениях: INSERT INTO accruals ... SELECT (в порядке id абонентов)
+    accruals_select = (
+        _join_accrual_sources(select(charge, literal(accrual_datetime, DateTime), Client.id), accrual_date)
+        .where(accrual_filter)
+        .order_by(Client.id)
+    )
+    db.execute(
+        insert(Accrual).from_select(["amount", "accrual_date", "client_id"], accruals_select)
+    )
+
+    # 3. Списание с баланса: UPDATE clients ... FROM tariffs, billing_calendar
+    db.execute(
+        update(Client)
+        .where(*(onclause for _, onclause in _accrual_joins(accrual_date)), accrual_filter)
+        .values(balance=Client.balance - charge, accrual_date=accrual_datetime, version=Client.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+    return clients_charged, total_amount
+
+
+def _next_id_bound(db: Session, last_id: int, batch_size: int) -> Optional[int]:
+    """Возвращает наибольший id следующей пачки абонентов (поиск по ключу) или None для последней пачки."""
+    stmt = select(Client.id).where(Client.id > last_id).order_by(Client.id).offset(batch_size - 1).limit(1)
+    return db.execute(stmt).scalar_one_or_none()
+
+
+def _iter_monthly_accrual_slices(db: Session, accrual_date: date, batch_size: int, start_after_id: int = 0,
+                                 prices: Optional[Mapping[int, Decimal]] = None):
+    """
+    Выполняет начисление пачками абонентов по возрастанию id, начиная после start_after_id (БЕЗ коммита).
+
+    После каждой пачки возвращает кортеж: (наибольший id пачки или None для последней пачки,
+    количество абонентов с начислением, сумма начислений, обработано абонентов, всего абонентов).
+    """
+    total_clients = db.execute(select(func.count(Client.id))).scalar_one()
+    processed = db.execute(select(func.count(Client.id)).where(Client.id <= start_after_id)).scalar_one()
+    last_id = start_after_id
+
+    while True:
+        upper_id = _next_id_bound(db, last_id, batch_size)
+        id_clauses = [Client.id > last_id]
+        if upper_id is not None:
+            id_clauses.append(Client.id <= upper_id)
+
+        slice_count, slice_amount = _apply_monthly_accrual_slice(
+            db, accrual_date, and_(_monthly_accrual_filter(accrual_date), *id_clauses), prices
         )
+        processed = total_clients if upper_id is None else min(processed + batch_size, total_clients)
+
+        yield upper_id, slice_count, slice_amount, processed, total_clients
+
+        if upper_id is None:
+            break
+        last_id = upper_id
+
+
+def apply_monthly_accrual(
+        db: Session,
+        accrual_date: date,
+        batch_size: int = ACCRUAL_BATCH_SIZE,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+) -> AccrualSummary:
+    """
+    Выполняет ежемесячное начисление всем абонентам набором SQL-запросов (БЕЗ коммита).
+
+    Вместо обхода абонентов по одному для каждой пачки абонентов (по возрастанию id)
+    выполняются три запроса: подсчет итогов, INSERT INTO accruals ... SELECT
+    и UPDATE clients ... FROM tariffs.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param accrual_date: Дата выполнения начисления.
+    :param batch_size: Количество абонентов в одной пачке.
+    :param on_progress: Функция, вызываемая после каждой пачки с аргументами
+        (обработано абонентов, всего абонентов). Исключение из нее прерывает начисление.
+    :return: Итог начисления (количество абонентов и общая сумма).
+    """
+    sync_billing_calendar(db, accrual_date)
+    prices = TariffPriceBook.load(db).period_prices(accrual_date)
+
+    clients_charged = 0
+    total_amount = Decimal("0")
+
+    for _, slice_count, slice_amount, processed, total_clients in _iter_monthly_accrual_slices(
+            db, accrual_date, batch_size, prices=prices):
+        clients_charged += slice_count
+        total_amount += slice_amount
+
+        if on_progress is not None:
+            on_progress(processed, total_clients)
+
+    return AccrualSummary(clients_charged=clients_charged, total_amount=total_amount)
+
+
+def accrual_period(accrual_date: date) -> str:
+    """Возвращает расчетный период начисления в формате 'ГГГГ-ММ'."""
+    return f"{accrual_date.year:04d}-{accrual_date.month:02d}"
+
+
+def get_accrual_run(db: Session, period: str) -> Optional[AccrualRun]:
+    """
+    Синхронно получает запись журнала начислений за расчетный период.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param period: Расчетный период в формате 'ГГГГ-ММ'.
+    :return: Объект записи журнала или None, если начисление за период не выполнялось.
+    """
+    stmt = select(AccrualRun).where(AccrualRun.period == period)
+    result = db.execute(stmt)
+    return result.scalars().first()
+
+
+def _claim_accrual_run(db: Session, period: str, force: bool) -> Optional[tuple[int, int]]:
+    """
+    Захватывает расчетный период для начисления (С коммитом).
+
+    :return: Кортеж (id записи журнала, id последнего обработанного абонента) или None,
+        если период завершен или начисление по нему выполняется в другом экземпляре программы.
+    """
+    now = datetime.now()
+    accrual_run = get_accrual_run(db, period)
+
+    try:
+        if accrual_run is None:
+            accrual_run = AccrualRun(period=period, started_at=now, heartbeat_at=now,
+                                     last_client_id=0, clients_count=0, total_amount=Decimal("0"))
+            db.add(accrual_run)
+            db.flush()
+            claimed = (accrual_run.id, 0)
+        else:
+            if accrual_run.finished_at is not None and not force:
+                return None
+            lease_active = accrual_run.heartbeat_at is not None and now - accrual_run.heartbeat_at < ACCRUAL_RUN_LEASE
+            if accrual_run.finished_at is None and lease_active:
+                return None
+
+            values = {"heartbeat_at": now}
+            if accrual_run.finished_at is not None:
+                # Повторное (ручное) начисление завершенного периода начинается с первого абонента
+                values.update(started_at=now, finished_at=None, last_client_id=0)
+
+            # Сравнение с прочитанным heartbeat_at не дает двум экземплярам захватить период одновременно
+            seen_heartbeat = (AccrualRun.heartbeat_at.is_(None) if accrual_run.heartbeat_at is None
+                              else AccrualRun.heartbeat_at == accrual_run.heartbeat_at)
+            stmt = update(AccrualRun).where(AccrualRun.id == accrual_run.id, seen_heartbeat).values(**values)
+            if db.execute(stmt).rowcount == 0:
+                db.rollback()
+                return None
+            claimed = (accrual_run.id, values.get("last_client_id", accrual_run.last_client_id))
+
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        return None
+
+    db.expunge_all()
+    return claimed
 
-        # Создаем модель SQLAlchemy
-        accrual_db = Accrual(**accrual_data.model_dump())
 
-        db.add(accrual_db)
-        db.flush()  # Отправляем в БД, но не фиксируем (commit будет в конце цикла)
-        return accrual_db
+def run_monthly_accrual(
+        db: Session,
+        accrual_date: date,
+        force: bool = False,
+        batch_size: int = ACCRUAL_BATCH_SIZE,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        workers: int = 1,
+) -> Optional[AccrualSummary]:
+    """
+    Выполняет ежемесячное начисление пачками с отметкой в журнале accrual_runs (С коммитом).
 
+    Завершенный период пропускается одним запросом по уникальному периоду. Каждая пачка
+    абонентов фиксируется отдельной транзакцией вместе с контрольной точкой (id последнего
+    обработанного абонента), поэтому прерванное или отмененное начисление при следующем
+    запуске продолжается с места остановки. Пока начисление выполняется, запись журнала
+    обновляет heartbeat_at: второй экземпляр программы отклоняется, а если heartbeat_at
+    не обновлялся дольше ACCRUAL_RUN_LEASE, считает запуск аварийно прерванным и продолжает его.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param accrual_date: Дата выполнения начисления.
+    :param force: Повторить начисление за уже завершенный период (ручное начисление).
+        Абонентам, которым начисление за период уже выполнено, повторно ничего не начисляется.
+    :param batch_size: Количество абонентов в одной пачке (одной транзакции).
+    :param on_progress: Функция отслеживания хода начисления (см. apply_monthly_accrual).
+        Исключение из нее откатывает текущую пачку, уже зафиксированные пачки сохраняются.
+    :param workers: Количество процессов для расчета сумм начисления
+        (см. parallel_accrual.iter_parallel_monthly_accrual_slices). 1 — расчет в текущем процессе.
+    :return: Итог начисления в этом запуске или None, если период уже завершен
+        или начисление выполняется в другом месте.
+    """
+    claimed = _claim_accrual_run(db, accrual_period(accrual_date), force)
+    if claimed is None:
+        return None
+    run_id, last_client_id = claimed
+    # Цены тарифов за период определяются один раз на весь запуск
+    prices = TariffPriceBook.load(db).period_prices(accrual_date)
+
+    if workers > 1:
+        # Импорт здесь: модуль параллельного начисления сам использует функции этого модуля
+        from src.db.parallel_accrual import iter_parallel_monthly_accrual_slices
+        slices = iter_parallel_monthly_accrual_slices(db, accrual_date, batch_size, last_client_id, workers, prices)
+    else:
+        slices = _iter_monthly_accrual_slices(db, accrual_date, batch_size, last_client_id, prices)
+
+    clients_charged = 0
+    total_amount = Decimal("0")
+    try:
+        # Календарь начислений фиксируется до расчета: процессы пула читают его из базы
+        if sync_billing_calendar(db, accrual_date):
+            db.commit()
+
+        for upper_id, slice_count, slice_amount, processed, total_clients in slices:
+            if on_progress is not None:
+                on_progress(processed, total_clients)
+
+            values = {
+                "clients_count": AccrualRun.clients_count + slice_count,
+                "total_amount": AccrualRun.total_amount + slice_amount,
+                "heartbeat_at": datetime.now(),
+            }
+            if upper_id is None:
+                values["finished_at"] = datetime.now()
+            else:
+                values["last_client_id"] = upper_id
+            db.execute(update(AccrualRun).where(AccrualRun.id == run_id).values(**values))
+
+            # Пачка и контрольная точка фиксируются вместе
+            db.commit()
+            db.expunge_all()
+
+            clients_charged += slice_count
+            total_amount += slice_amount
     except Exception as e:
-        print(f"Ошибка создания записи начисления: {e}")
+        db.rollback()
+        # Освобождаем период, чтобы продолжить начисление можно было сразу, не дожидаясь ACCRUAL_RUN_LEASE
+        try:
+            db.execute(update(AccrualRun).where(AccrualRun.id == run_id).values(heartbeat_at=None))
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+        raise e
+
+    return AccrualSummary(clients_charged=clients_charged, total_amount=total_amount)
+
+
+def backfill_accruals(db: Session, accrual_date: date, periods: int) -> Optional[AccrualSummary]:
+    """
+    Доначисляет оплату за пропущенные месяцы одной транзакцией (С коммитом).
+
+    Для каждого из periods месяцев перед текущим (от более раннего к более позднему)
+    абонентам, чье последнее начисление было раньше начала месяца, создаются записи
+    о начислении и списывается оплата по тем же правилам полного и неполного месяца.
+    Абоненты, которые еще ни разу не получали начисление, не доначисляются.
+    Месяцы до подключения абонента не начисляются. Текущий месяц выполняет обычное
+    ежемесячное начисление. Доначисленные месяцы отмечаются в журнале accrual_runs.
+
+    Пропуск определяется по дате последнего начисления абонента, поэтому доначисление
+    выполняется до ежемесячного начисления текущего месяца. На время доначисления
+    захватывается запись журнала текущего периода (как в run_monthly_accrual), поэтому
+    второй экземпляр программы не выполняет доначисление одновременно; после фиксации
+    запись освобождается для ежемесячного начисления.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param accrual_date: Текущая дата (месяц этой даты не доначисляется).
+    :param periods: Количество предыдущих месяцев, за которые выполняется доначисление.
+    :return: Итог доначисления (количество начислений и общая сумма) или None, если текущий
+        период уже завершен или начисление по нему выполняется в другом месте.
+    """
+    claimed = _claim_accrual_run(db, accrual_period(accrual_date), force=False)
+    if claimed is None:
         return None
+    run_id, _ = claimed
+    release_run = update(AccrualRun).where(AccrualRun.id == run_id).values(heartbeat_at=None)
+
+    current_period = date(accrual_date.year, accrual_date.month, 1)
+    period_starts = []
+    period_start = current_period
+    for _ in range(periods):
+        period_start = (period_start - timedelta(days=1)).replace(day=1)
+        period_starts.append(period_start)
+
+    accruals_count = 0
+    total_amount = Decimal("0")
+    try:
+        sync_billing_calendar(db, accrual_date)
+        price_book = TariffPriceBook.load(db)
+
+        for period_start in reversed(period_starts):
+            period_count, period_amount = _apply_monthly_accrual_slice(
+                db, period_start, _backfill_accrual_filter(period_start), price_book.period_prices(period_start),
+                backfill=True
+            )
+            if not period_count:
+                continue
+            accruals_count += period_count
+            total_amount += period_amount
+
+            accrual_run = get_accrual_run(db, accrual_period(period_start))
+            if accrual_run is None:
+                accrual_run = AccrualRun(period=accrual_period(period_start), started_at=datetime.now(),
+                                         last_client_id=0, clients_count=0, total_amount=Decimal("0"))
+                db.add(accrual_run)
+            accrual_run.clients_count += period_count
+            accrual_run.total_amount += period_amount
+            accrual_run.finished_at = accrual_run.finished_at or datetime.now()
+
+        # Доначисление и освобождение периода фиксируются вместе
+        db.execute(release_run)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        try:
+            db.execute(release_run)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+        raise e
+
+    return AccrualSummary(clients_charged=accruals_count, total_amount=total_amount)
 
 
 def clear_db_clients(db: Session):
     """
-    Удаление базы клиентов.
+    Удаление базы клиентов вместе с их платежами и начислениями.
 
     :param db: Активная синхронная сессия базы данных.
     """
+    db.execute(delete(Payment))
+    db.execute(delete(Accrual))
     db.execute(delete(Client))
     db.commit()
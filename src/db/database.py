@@ -1,16 +1,101 @@
+import os
 from datetime import datetime
+from typing import Optional
 
-from sqlalchemy import func, create_engine
+from sqlalchemy import func, create_engine, event, inspect, Engine, Connection, Integer
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.orm import Mapped, mapped_column, declared_attr, DeclarativeBase, sessionmaker
 
-DATABASE_URL = 'sqlite:///data/dbase.db'
-engine = create_engine(DATABASE_URL, echo=False)
+from src.db.client_counts import create_client_status_counts
+from src.db.client_search import create_clients_fts
+from src.db.money import Kopecks
+
+DATABASE_URL = os.environ.get('BILLING_DATABASE_URL', 'sqlite:///data/dbase.db')
+
+# Профиль настроек SQLite выбирается переменной окружения BILLING_DB_PROFILE
+DB_PROFILE = os.environ.get('BILLING_DB_PROFILE', 'desktop-safe')
+
+# Профили настроек соединения SQLite (PRAGMA). journal_mode относится ко всему файлу базы
+# и задается только при подключении, остальные настройки действуют на одно соединение.
+SQLITE_PROFILES = {
+    # Работа программы: WAL (читатели не блокируют писателя), fsync только при контрольной точке WAL
+    "desktop-safe": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,  # ~16 МБ
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "foreign_keys": "ON",
+    },
+    # Массовая загрузка и пересчет: без ожидания записи на диск, большой кэш
+    "bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -262144,  # ~256 МБ
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+        "foreign_keys": "ON",
+    },
+    # Отчеты и выгрузки: только чтение, большой кэш и отображение файла в память
+    "read-only-reporting": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,  # ~64 МБ
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+        "foreign_keys": "ON",
+        "query_only": "ON",
+    },
+}
+
+
+def _set_pragmas(dbapi_connection, pragmas: dict):
+    """Выполняет PRAGMA для соединения DB-API."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE) -> Engine:
+    """
+    Создает движок базы данных с профилем настроек SQLite.
+
+    Настройки профиля применяются к каждому новому соединению через событие connect.
+
+    :param url: Адрес базы данных.
+    :param profile: Название профиля из SQLITE_PROFILES.
+    :return: Движок SQLAlchemy.
+    """
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Неизвестный профиль базы данных: {profile}")
+
+    db_engine = create_engine(url, echo=False)
+    if db_engine.dialect.name == "sqlite":
+        pragmas = SQLITE_PROFILES[profile]
+
+        @event.listens_for(db_engine, "connect")
+        def _apply_profile(dbapi_connection, connection_record):
+            _set_pragmas(dbapi_connection, pragmas)
+
+    return db_engine
+
+
+engine = create_db_engine(DATABASE_URL, DB_PROFILE)
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine,
 )
 
+# Движки других профилей создаются при первом обращении
+_profile_sessions = {DB_PROFILE: SessionLocal}
+
 
 class BaseModel(DeclarativeBase):
     __abstract__ = True
@@ -24,13 +109,82 @@ class BaseModel(DeclarativeBase):
         return cls.__name__.lower() + 's'
 
 
-def get_db():
-    """Предоставляет синхронную сессию для работы с базой данных."""
-    with SessionLocal() as session:
+def get_db(profile: Optional[str] = None):
+    """
+    Предоставляет синхронную сессию для работы с базой данных.
+
+    :param profile: Профиль настроек SQLite на время работы сессии (например, "bulk-load"
+        для массовой загрузки). По умолчанию — профиль программы (BILLING_DB_PROFILE).
+    """
+    profile = profile or DB_PROFILE
+    if profile not in _profile_sessions:
+        _profile_sessions[profile] = sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=create_db_engine(DATABASE_URL, profile),
+        )
+
+    with _profile_sessions[profile]() as session:
         try:
             yield session
         finally:
             session.close()
 
-def init_db():
-    BaseModel.metadata.create_all(bind=engine)
+class OutdatedSchemaError(RuntimeError):
+    """Схема существующей базы данных отстает от моделей: базу нужно обновить миграциями."""
+
+
+def schema_differences(connection: Connection) -> list[str]:
+    """
+    Сравнивает схему базы данных с моделями.
+
+    :param connection: Соединение с базой данных.
+    :return: Описания расхождений: отсутствующие таблицы и столбцы, денежные столбцы,
+        которые хранят сумму не в копейках. Пустой список — схема соответствует моделям.
+    """
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    differences = []
+    for table in BaseModel.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            differences.append(f"нет таблицы {table.name}")
+            continue
+        existing_columns = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                differences.append(f"нет столбца {table.name}.{column.name}")
+            elif isinstance(column.type, Kopecks) and not isinstance(existing_columns[column.name], Integer):
+                differences.append(f"сумма {table.name}.{column.name} хранится не в копейках")
+    return differences
+
+
+def init_db(db_engine: Optional[Engine] = None):
+    """
+    Создает таблицы новой базы данных и недостающие индексы существующей.
+
+    Существующая база данных обновляется миграциями (alembic upgrade head). Если ее схема
+    отстает от моделей, база не изменяется: индексы по новым столбцам нельзя создать до миграции.
+
+    :param db_engine: Движок базы данных (по умолчанию — движок программы).
+    :raises OutdatedSchemaError: Если схема существующей базы данных отстает от моделей.
+    """
+    db_engine = db_engine or engine
+    with db_engine.connect() as connection:
+        model_tables = set(BaseModel.metadata.tables) & set(inspect(connection).get_table_names())
+        differences = schema_differences(connection) if model_tables else []
+    if differences:
+        raise OutdatedSchemaError(
+            f"Схема базы данных устарела ({'; '.join(differences)}). Выполните миграции: alembic upgrade head"
+        )
+
+    BaseModel.metadata.create_all(bind=db_engine)
+    with db_engine.begin() as connection:
+        # Индексы, добавленные к уже существующим таблицам (см. migration/versions). IF NOT EXISTS
+        # вместо checkfirst: индексы по выражениям (lower(name)) не видны при чтении схемы
+        for table in BaseModel.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+        # Полнотекстовый индекс абонентов для базы, созданной до его появления
+        create_clients_fts(connection)
+        # Счетчики абонентов по статусам для базы, созданной до их появления
+        create_client_status_counts(connection)
@@ -1,11 +1,15 @@
 import enum
-from datetime import datetime
+from datetime import datetime, date
+from decimal import Decimal
 from typing import List
 
-from sqlalchemy import func, ForeignKey, JSON
+from sqlalchemy import func, ForeignKey, JSON, UniqueConstraint, Index, text, event, case, literal_column
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.db.database import BaseModel
+from src.db.client_counts import create_client_status_counts
+from src.db.client_search import create_clients_fts
+from src.db.money import Kopecks
 
 
 class StatusEnum(str, enum.Enum):
@@ -29,30 +33,61 @@ class Client(BaseModel):
     """Модель клиента.
     """
     __tablename__ = 'clients'
+    __table_args__ = (
+        # Отчет по должникам (balance < 0), отбор по статусу и дате его смены, ежемесячное начисление,
+        # отчеты по подключениям и границы календаря начислений
+        Index('ix_clients_balance', 'balance'),
+        Index('ix_clients_status_status_date', 'status', 'status_date'),
+        Index('ix_clients_accrual_date', 'accrual_date'),
+        Index('ix_clients_connection_date', 'connection_date'),
+        # Связь абонента с тарифом при начислении
+        Index('ix_clients_tariff_id', 'tariff_id'),
+        # Сортировка списка абонентов по ФИО и по статусу (Л/С и адрес уникальны и уже индексированы)
+        Index('ix_clients_full_name', 'full_name'),
+        Index('ix_clients_status', 'status'),
+    )
     personal_account: Mapped[int] = mapped_column(unique=True)
     full_name: Mapped[str] = mapped_column()
     address: Mapped[str] = mapped_column(unique=True)
     phone_number: Mapped[str] = mapped_column(unique=True)
-    tariff: Mapped[str] = mapped_column(nullable=False)
+    tariff_id: Mapped[int] = mapped_column(ForeignKey("tariffs.id"), nullable=False)
     connection_date: Mapped[datetime] = mapped_column(server_default=func.now())
     accrual_date: Mapped[datetime] = mapped_column(nullable=True)
-    balance: Mapped[float] = mapped_column(default=0.0)
+    balance: Mapped[Decimal] = mapped_column(Kopecks, default=Decimal("0"))
     is_active: Mapped[bool] = mapped_column(default=True)
     status: Mapped[StatusClientEnum] = mapped_column(default=StatusClientEnum.CONNECTING)
     status_date: Mapped[datetime] = mapped_column(nullable=True)
-    passport: Mapped[str] = mapped_column(JSON, default=lambda: {"ser_num": "Нет", "date": "Нет", "how": "Нет"})
-    payments: Mapped[List["Payment"]] = relationship("Payment", back_populates="client", cascade="all, delete-orphan")
-    accruals: Mapped[List["Accrual"]] = relationship("Accrual", back_populates="client", cascade="all, delete-orphan")
+    # Паспорт нужен только карточке абонента: столбец JSON не читается и не разбирается при загрузке списков
+    passport: Mapped[str] = mapped_column(JSON, deferred=True,
+                                          default=lambda: {"ser_num": "Нет", "date": "Нет", "how": "Нет"})
+    # Платежи и начисления загружаются только явно (selectinload в get_client_card), случайное
+    # обращение к ним в списках и отчетах вызывает ошибку вместо отдельного запроса на каждого абонента
+    payments: Mapped[List["Payment"]] = relationship("Payment", back_populates="client", cascade="all, delete-orphan",
+                                                     lazy="raise", order_by="Payment.id")
+    accruals: Mapped[List["Accrual"]] = relationship("Accrual", back_populates="client", cascade="all, delete-orphan",
+                                                     lazy="raise", order_by="Accrual.id")
+    tariff: Mapped["Tariff"] = relationship("Tariff", back_populates="clients")
+    # Версия строки абонента для оптимистической блокировки: увеличивается при каждом изменении
+    # (ORM проверяет ее при UPDATE, проводки и начисления увеличивают ее в том же запросе)
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     def __repr__(self):
         return f'Абонент (id={self.id}, ФИО={self.full_name}, Баланс={self.balance}, Статус={self.is_active})'
 
 
+# Полнотекстовый индекс поиска и счетчики абонентов по статусам создаются вместе с таблицей clients
+event.listen(Client.__table__, "after_create", lambda target, connection, **kw: create_clients_fts(connection))
+event.listen(Client.__table__, "after_create",
+             lambda target, connection, **kw: create_client_status_counts(connection))
+
+
 class Service(BaseModel):
     """Модель услуг"""
     __tablename__ = 'services'
     service_name: Mapped[str] = mapped_column(unique=True)
-    service_price: Mapped[float] = mapped_column(default=0.0)
+    service_price: Mapped[Decimal] = mapped_column(Kopecks, default=Decimal("0"))
 
     def __repr__(self):
         return f'Услуга (Наименование={self.service_name}, цена={self.service_price})'
@@ -62,17 +97,62 @@ class Tariff(BaseModel):
     """Модель тарифов"""
     __tablename__ = 'tariffs'
     name: Mapped[str] = mapped_column(unique=True, nullable=False)
-    monthly_price: Mapped[float] = mapped_column(nullable=False)
+    # Цена тарифа без истории цен. Для тарифа с историей (tariff_prices) действующую цену дает
+    # TariffPriceBook, здесь — копия цены на день последнего изменения; цену меняет set_tariff_price
+    monthly_price: Mapped[Decimal] = mapped_column(Kopecks, nullable=False)
     is_active: Mapped[bool] = mapped_column(default=True)
+    prices: Mapped[List["TariffPrice"]] = relationship("TariffPrice", back_populates="tariff",
+                                                       cascade="all, delete-orphan",
+                                                       order_by="TariffPrice.effective_from")
+    # Абонентов тарифа может быть десятки тысяч: список не загружается через тариф
+    clients: Mapped[List["Client"]] = relationship("Client", back_populates="tariff", lazy="raise")
 
     def __repr__(self):
         return f"Тариф (id={self.id}, Наименование='{self.name}', цена={self.monthly_price})"
 
 
+class TariffPrice(BaseModel):
+    """Модель истории цен тарифа (цена действует с effective_from до следующего изменения)"""
+    __tablename__ = 'tariff_prices'
+    __table_args__ = (UniqueConstraint('tariff_id', 'effective_from'),)
+    tariff_id: Mapped[int] = mapped_column(ForeignKey("tariffs.id"))
+    monthly_price: Mapped[Decimal] = mapped_column(Kopecks, nullable=False)
+    effective_from: Mapped[date] = mapped_column(nullable=False)
+    tariff: Mapped["Tariff"] = relationship("Tariff", back_populates="prices")
+
+    def __repr__(self):
+        return f"Цена тарифа (id тарифа={self.tariff_id}, цена={self.monthly_price}, с={self.effective_from})"
+
+
+# Поиск тарифа и услуги по названию без учета регистра
+Index('ix_tariffs_lower_name', func.lower(Tariff.name))
+Index('ix_services_lower_service_name', func.lower(Service.service_name))
+
+# Порядок статусов в списке абонентов — по алфавиту подписей, которые видит оператор
+# ("Отключен", "Подключен", "Приостановлен"), а не по именам элементов, под которыми статус хранится в базе
+CLIENT_STATUS_DISPLAY_RANK = {status: rank for rank, status in
+                              enumerate(sorted(StatusClientEnum, key=lambda status: status.value))}
+# Номер статуса в этом порядке в SQL. Значения записаны литералами, а не параметрами: SQLite использует
+# индекс по выражению, только если выражение в ORDER BY совпадает с выражением индекса
+CLIENT_STATUS_DISPLAY_ORDER = case(
+    *((Client.status == literal_column(f"'{status.name}'"), literal_column(str(rank)))
+      for status, rank in CLIENT_STATUS_DISPLAY_RANK.items())
+)
+Index('ix_clients_status_display_order', CLIENT_STATUS_DISPLAY_ORDER, _table=Client.__table__)
+
+
 class Payment(BaseModel):
     """Модель платежей"""
     __tablename__ = 'payments'
-    amount: Mapped[float] = mapped_column(default=0.0)
+    __table_args__ = (
+        # Платежи абонента (карточка) и платежи за период (отчеты)
+        Index('ix_payments_client_id', 'client_id'),
+        Index('ix_payments_created_at', 'created_at'),
+        # Платеж с идентификатором из банка или окна оплаты проводится только один раз
+        Index('uq_payments_external_id', 'external_id', unique=True,
+              sqlite_where=text('external_id IS NOT NULL')),
+    )
+    amount: Mapped[Decimal] = mapped_column(Kopecks, default=Decimal("0"))
     payment_date: Mapped[datetime] = mapped_column(server_default=func.now())
     currency: Mapped[CurrencyEnum] = mapped_column(nullable=True, default=CurrencyEnum.RUB)
     status: Mapped[StatusEnum] = mapped_column(nullable=True, default=StatusEnum.PAID)
@@ -87,10 +167,43 @@ class Payment(BaseModel):
 class Accrual(BaseModel):
     """Модель начислений"""
     __tablename__ = 'accruals'
-    amount: Mapped[float] = mapped_column(default=0.0)
+    __table_args__ = (
+        # Начисления абонента (карточка) по дате начисления
+        Index('ix_accruals_client_id_accrual_date', 'client_id', 'accrual_date'),
+    )
+    amount: Mapped[Decimal] = mapped_column(Kopecks, default=Decimal("0"))
     accrual_date: Mapped[datetime] = mapped_column(nullable=True)
     client_id: Mapped[int] = mapped_column(ForeignKey("clients.id"))
     client: Mapped["Client"] = relationship("Client", back_populates="accruals")
 
     def __repr__(self):
         return f"Начислено (Сумма={self.amount}, за месяц={self.accrual_date.month})"
+
+
+class AccrualRun(BaseModel):
+    """Модель журнала ежемесячных начислений (один запуск на расчетный период)"""
+    __tablename__ = 'accrual_runs'
+    period: Mapped[str] = mapped_column(unique=True, nullable=False)
+    started_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    finished_at: Mapped[datetime | None] = mapped_column(nullable=True)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(nullable=True)
+    last_client_id: Mapped[int] = mapped_column(default=0)
+    clients_count: Mapped[int] = mapped_column(default=0)
+    total_amount: Mapped[Decimal] = mapped_column(Kopecks, default=Decimal("0"))
+
+    def __repr__(self):
+        return f"Начисление за период (Период={self.period}, Абонентов={self.clients_count}, Сумма={self.total_amount})"
+
+
+class BillingCalendarDay(BaseModel):
+    """Модель календаря начислений: дни пользования для каждого дня расчетного периода"""
+    __tablename__ = 'billing_calendar'
+    __table_args__ = (UniqueConstraint('period', 'day'),)
+    period: Mapped[str] = mapped_column(nullable=False)
+    day: Mapped[int] = mapped_column(nullable=False)
+    days_in_period: Mapped[int] = mapped_column(nullable=False)
+    connection_days: Mapped[int] = mapped_column(nullable=False)
+    suspension_days: Mapped[int] = mapped_column(nullable=False)
+
+    def __repr__(self):
+        return f"День календаря (Период={self.period}, День={self.day}, Дней пользования={self.connection_days})"
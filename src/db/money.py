@@ -0,0 +1,29 @@
+from decimal import Decimal
+
+from sqlalchemy import Integer, TypeDecorator
+
+from src.models.money import to_kopecks, from_kopecks
+
+
+class Kopecks(TypeDecorator):
+    """
+    Денежная сумма, хранимая целым числом копеек (INTEGER).
+
+    В программе значение — Decimal с двумя знаками (см. src/models/money.py), поэтому
+    сложение балансов и SUM/GROUP BY на стороне SQLite выполняются точно, без float.
+    Целые числа в SQL-выражениях со столбцом (balance < 0, price * дни) считаются
+    множителями и не переводятся в копейки; суммы в выражениях передаются Decimal.
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_kopecks(value)
+
+    def process_result_value(self, value, dialect) -> Decimal | None:
+        return None if value is None else from_kopecks(value)
+
+    def coerce_compared_value(self, op, value):
+        if isinstance(value, int):
+            return Integer()
+        return self
@@ -0,0 +1,125 @@
+import base64
+import enum
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import NamedTuple, Optional, Sequence, Any, Callable, Iterator
+
+from sqlalchemy import Select, tuple_, literal
+from sqlalchemy.orm import Session
+
+
+class Page(NamedTuple):
+    """Страница списка и курсор следующей страницы (None — страница последняя)."""
+    items: Sequence[Any]
+    next_cursor: Optional[str]
+
+
+def _encode_value(value):
+    """Значение ключа сортировки в виде, пригодном для JSON (с типом для дат и сумм)."""
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"date": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"decimal": str(value)}
+    if isinstance(value, enum.Enum):
+        # Перечисления хранятся в базе по имени элемента
+        return value.name
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        (kind, raw), = value.items()
+        if kind == "datetime":
+            return datetime.fromisoformat(raw)
+        if kind == "date":
+            return date.fromisoformat(raw)
+        if kind == "decimal":
+            return Decimal(raw)
+        raise ValueError(f"Неизвестный тип значения курсора: {kind}")
+    return value
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Кодирует значения ключа последней строки страницы в непрозрачный курсор (base64 от JSON)."""
+    payload = json.dumps([_encode_value(value) for value in values], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Раскодирует курсор, полученный от encode_cursor.
+
+    :raises ValueError: Если курсор поврежден.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Некорректный курсор страницы: {e}") from None
+    if not isinstance(values, list):
+        raise ValueError("Некорректный курсор страницы")
+    return [_decode_value(value) for value in values]
+
+
+def paginate(db: Session, stmt: Select, keys: Sequence, cursor: Optional[str], limit: int,
+             descending: bool = False, scalars: bool = True, row_type: Optional[type] = None,
+             key_values: Optional[Callable[[Any], Sequence]] = None) -> Page:
+    """
+    Выполняет запрос постранично поиском по ключу (keyset): следующая страница начинается
+    сразу после ключа последней строки предыдущей, без OFFSET, поэтому время получения
+    страницы не зависит от ее номера.
+
+    :param db: Активная синхронная сессия базы данных.
+    :param stmt: Запрос без ORDER BY и LIMIT.
+    :param keys: Столбцы ключа сортировки; последний должен быть уникальным (обычно id).
+    :param cursor: Курсор предыдущей страницы (None — первая страница).
+    :param limit: Количество строк на странице.
+    :param descending: Сортировка по убыванию ключа.
+    :param scalars: Вернуть объекты моделей (True) или строки запроса (False).
+    :param row_type: NamedTuple, в который упаковываются строки запроса (при scalars=False).
+    :param key_values: Значения ключа сортировки строки для курсора. По умолчанию — атрибуты строки
+        с именами столбцов ключа; нужна, если ключ — выражение, а не столбец строки.
+    :return: Страница и курсор следующей страницы.
+    """
+    if cursor is not None:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise ValueError("Курсор относится к другому порядку сортировки")
+        key_tuple = tuple_(*keys)
+        bound = tuple_(*(literal(value, key.type) for key, value in zip(keys, values)))
+        stmt = stmt.where(key_tuple < bound if descending else key_tuple > bound)
+
+    stmt = stmt.order_by(*(key.desc() if descending else key.asc() for key in keys)).limit(limit + 1)
+    result = db.execute(stmt)
+    if scalars:
+        items = result.scalars().all()
+    elif row_type is not None:
+        items = [row_type._make(row) for row in result]
+    else:
+        items = result.all()
+
+    # Лишняя строка показывает, что следующая страница есть
+    if len(items) <= limit:
+        return Page(items, None)
+    items = items[:limit]
+    last = items[-1]
+    if key_values is not None:
+        return Page(items, encode_cursor(key_values(last)))
+    return Page(items, encode_cursor([getattr(last, key.key) for key in keys]))
+
+
+def walk_pages(get_page: Callable[[Optional[str]], Page]) -> Iterator:
+    """
+    Перебирает строки всех страниц, запрашивая следующую страницу по курсору предыдущей.
+
+    :param get_page: Функция, возвращающая страницу по курсору (None — первая страница).
+    """
+    cursor = None
+    while True:
+        page = get_page(cursor)
+        yield from page.items
+        if page.next_cursor is None:
+            return
+        cursor = page.next_cursor
@@ -0,0 +1,168 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional, Mapping
+
+from sqlalchemy import select, func, and_, or_, insert, update, delete, literal, type_coerce, \
+    Table, MetaData, Column, Integer, DateTime
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.db.database import create_db_engine
+from src.db.models import Client, Accrual, StatusClientEnum
+from src.db.money import Kopecks
+from src.db.crud import _monthly_charge_expr, _monthly_accrual_filter, _join_accrual_sources, _date_part, \
+    _next_id_bound, _iter_monthly_accrual_slices
+
+# Параллельный расчет имеет смысл только для больших баз: запуск процессов занимает заметное время
+PARALLEL_ACCRUAL_MIN_CLIENTS = 100_000
+
+# Временная таблица писателя: рассчитанные процессами начисления одной пачки (суммы в копейках)
+_accrual_charges = Table(
+    "accrual_charges",
+    MetaData(),
+    Column("client_id", Integer, primary_key=True),
+    Column("amount", Integer, nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+# Фабрика сессий процесса пула (создается один раз при запуске процесса)
+_worker_session_factory = None
+
+
+def _init_worker(database_url: str):
+    """Создает подключение к базе данных в процессе пула (процессы только читают базу)."""
+    global _worker_session_factory
+    _worker_session_factory = sessionmaker(bind=create_db_engine(database_url, "read-only-reporting"))
+
+
+def _compute_charges(accrual_date: date, low_id: int, high_id: Optional[int],
+                     prices: Optional[Mapping[int, Decimal]] = None) -> list[tuple[int, int]]:
+    """
+    Рассчитывает начисления абонентам с id в диапазоне (low_id, high_id] в процессе пула (только чтение).
+
+    :param prices: Цены тарифов за период из истории цен (см. crud._tariff_price_expr).
+    :return: Список пар (id абонента, сумма начисления в копейках) по возрастанию id.
+    """
+    id_clauses = [Client.id > low_id]
+    if high_id is not None:
+        id_clauses.append(Client.id <= high_id)
+
+    stmt = (
+        _join_accrual_sources(
+            select(Client.id, type_coerce(_monthly_charge_expr(accrual_date, prices), Integer)), accrual_date
+        )
+        .where(_monthly_accrual_filter(accrual_date), *id_clauses)
+        .order_by(Client.id)
+    )
+    with _worker_session_factory() as db:
+        return [(client_id, amount) for client_id, amount in db.execute(stmt)]
+
+
+def _apply_computed_charges(db: Session, accrual_date: date, charges: list[tuple[int, int]]) -> tuple[int, Decimal]:
+    """
+    Записывает рассчитанные начисления пачки одним соединением-писателем (БЕЗ коммита).
+
+    Начисления загружаются во временную таблицу, после чего выполняются
+    INSERT INTO accruals ... SELECT и UPDATE clients ... FROM accrual_charges.
+    Повторно проверяется, что начисление абоненту за месяц еще не выполнено.
+
+    :return: Количество абонентов, которым выполнено начисление, и сумма начислений пачки.
+    """
+    if not charges:
+        return 0, Decimal("0")
+
+    accrual_datetime = datetime.combine(accrual_date, datetime.min.time())
+    # Временная таблица существует в рамках соединения, поэтому проверяется перед каждой пачкой
+    _accrual_charges.create(db.connection(), checkfirst=True)
+    db.execute(insert(_accrual_charges), [{"client_id": client_id, "amount": amount} for client_id, amount in charges])
+
+    due_filter = and_(
+        Client.id == _accrual_charges.c.client_id,
+        Client.status == StatusClientEnum.CONNECTING,
+        or_(Client.accrual_date.is_(None), _date_part(Client.accrual_date, '%m') != accrual_date.month),
+    )
+
+    clients_charged, total_amount = db.execute(
+        select(func.count(Client.id), func.sum(type_coerce(_accrual_charges.c.amount, Kopecks))).where(due_filter)
+    ).one()
+
+    if clients_charged:
+        accruals_select = (
+            select(_accrual_charges.c.amount, literal(accrual_datetime, DateTime), Client.id)
+            .where(due_filter)
+            .order_by(Client.id)
+        )
+        db.execute(insert(Accrual).from_select(["amount", "accrual_date", "client_id"], accruals_select))
+
+        db.execute(
+            update(Client)
+            .where(due_filter)
+            .values(balance=Client.balance - _accrual_charges.c.amount, accrual_date=accrual_datetime,
+                    version=Client.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    db.execute(delete(_accrual_charges))
+    return clients_charged, total_amount if clients_charged else Decimal("0")
+
+
+def iter_parallel_monthly_accrual_slices(
+        db: Session,
+        accrual_date: date,
+        batch_size: int,
+        start_after_id: int = 0,
+        workers: Optional[int] = None,
+        prices: Optional[Mapping[int, Decimal]] = None,
+):
+    """
+    Выполняет начисление пачками, рассчитывая суммы в пуле процессов (БЕЗ коммита).
+
+    Диапазон id абонентов делится на пачки по batch_size абонентов. Процессы пула
+    выполняют запрос расчета начислений (те же правила _monthly_charge_expr) каждый
+    для своей пачки и только читают базу данных. Записывает результаты одно соединение
+    db в порядке возрастания id, поэтому записи о начислениях, балансы и итоги
+    совпадают с последовательным начислением, а SQLite работает с одним писателем.
+
+    Для базы в памяти и для небольших баз (меньше PARALLEL_ACCRUAL_MIN_CLIENTS
+    необработанных абонентов) начисление выполняется последовательно.
+
+    :param workers: Количество процессов (по умолчанию — количество ядер процессора).
+    :param prices: Цены тарифов за период из истории цен (см. crud._tariff_price_expr).
+    :return: Генератор кортежей того же вида, что и _iter_monthly_accrual_slices.
+    """
+    workers = workers or os.cpu_count() or 1
+    url = db.get_bind().url
+    total_clients = db.execute(select(func.count(Client.id))).scalar_one()
+    processed = db.execute(select(func.count(Client.id)).where(Client.id <= start_after_id)).scalar_one()
+
+    if workers < 2 or url.database in (None, "", ":memory:") \
+            or total_clients - processed < PARALLEL_ACCRUAL_MIN_CLIENTS:
+        yield from _iter_monthly_accrual_slices(db, accrual_date, batch_size, start_after_id, prices)
+        return
+
+    # Границы пачек (поиск по ключу), последняя пачка не ограничена сверху
+    bounds = []
+    last_id = start_after_id
+    while True:
+        upper_id = _next_id_bound(db, last_id, batch_size)
+        bounds.append((last_id, upper_id))
+        if upper_id is None:
+            break
+        last_id = upper_id
+
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(url.render_as_string(hide_password=False),),
+    ) as executor:
+        futures = [executor.submit(_compute_charges, accrual_date, low_id, high_id, prices) for low_id, high_id in bounds]
+        try:
+            for (_, upper_id), future in zip(bounds, futures):
+                slice_count, slice_amount = _apply_computed_charges(db, accrual_date, future.result())
+                processed = total_clients if upper_id is None else min(processed + batch_size, total_clients)
+
+                yield upper_id, slice_count, slice_amount, processed, total_clients
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,65 @@
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal
+from typing import Mapping
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.db.models import Tariff, TariffPrice
+
+
+class TariffPriceBook:
+    """
+    Цены тарифов по датам, загруженные в память на время начисления.
+
+    История цен (tariff_prices) читается одним запросом, цена на дату находится
+    двоичным поиском по датам начала действия. Для тарифа без истории цен
+    используется Tariff.monthly_price, для даты раньше первой записи истории — первая цена.
+    """
+
+    def __init__(self, history: Mapping[int, list[tuple[date, Decimal]]], current: Mapping[int, Decimal]):
+        """
+        :param history: {id тарифа: [(дата начала действия, цена), ...] по возрастанию даты}.
+        :param current: {id тарифа: Tariff.monthly_price}.
+        """
+        self._dates = {tariff_id: [effective_from for effective_from, _ in prices]
+                       for tariff_id, prices in history.items()}
+        self._prices = {tariff_id: [price for _, price in prices] for tariff_id, prices in history.items()}
+        self._current = dict(current)
+
+    @classmethod
+    def load(cls, db: Session) -> "TariffPriceBook":
+        """Загружает историю цен всех тарифов из базы данных."""
+        history = {}
+        stmt = select(TariffPrice.tariff_id, TariffPrice.effective_from, TariffPrice.monthly_price).order_by(
+            TariffPrice.tariff_id, TariffPrice.effective_from
+        )
+        for tariff_id, effective_from, price in db.execute(stmt):
+            history.setdefault(tariff_id, []).append((effective_from, price))
+        current = dict(db.execute(select(Tariff.id, Tariff.monthly_price)).all())
+        return cls(history, current)
+
+    def price(self, tariff_id: int, on: date) -> Decimal:
+        """Возвращает цену тарифа, действующую на дату."""
+        dates = self._dates.get(tariff_id)
+        if not dates:
+            return self._current[tariff_id]
+        index = bisect_right(dates, on) - 1
+        return self._prices[tariff_id][max(index, 0)]
+
+    def period_prices(self, accrual_date: date) -> dict[int, Decimal]:
+        """
+        Цены тарифов с историей цен за расчетный период даты начисления.
+
+        Действует цена на первое число месяца: изменение цены с середины месяца
+        применяется со следующего периода.
+
+        :return: {id тарифа: цена}. Тарифы без истории цен не включаются.
+        """
+        period_start = accrual_date.replace(day=1)
+        return {tariff_id: self.price(tariff_id, period_start) for tariff_id in self._dates}
+
+    def prices(self, on: date) -> dict[int, Decimal]:
+        """Цены всех тарифов, действующие на дату: {id тарифа: цена}."""
+        return {tariff_id: self.price(tariff_id, on) for tariff_id in self._current}
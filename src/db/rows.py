@@ -0,0 +1,57 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from src.db.models import StatusClientEnum
+
+# Строки списков и отчетов: только отображаемые столбцы, без объектов ORM.
+# Имена полей совпадают с именами столбцов моделей, поэтому по ним строится курсор страницы.
+
+
+class ClientRow(NamedTuple):
+    """Строка списка абонентов на главном окне."""
+    id: int
+    personal_account: int
+    full_name: str
+    address: str
+    tariff_name: str
+    balance: Decimal
+    status: StatusClientEnum
+
+
+class DebtorRow(NamedTuple):
+    """Строка отчета по должникам."""
+    id: int
+    personal_account: int
+    full_name: str
+    address: str
+    balance: Decimal
+    status: StatusClientEnum
+
+
+class BankReportRow(NamedTuple):
+    """Строка реестра задолженности для банка."""
+    id: int
+    personal_account: int
+    full_name: str
+    accrual_date: Optional[datetime]
+    balance: Decimal
+    status: StatusClientEnum
+
+
+class ClientMovementRow(NamedTuple):
+    """Даты подключения и смены статуса абонента для отчета по движению абонентов."""
+    id: int
+    connection_date: datetime
+    status: StatusClientEnum
+    status_date: Optional[datetime]
+
+
+class PaymentReportRow(NamedTuple):
+    """Строка отчета по платежам за период (с Л/С и ФИО плательщика)."""
+    id: int
+    created_at: datetime
+    payment_date: datetime
+    personal_account: int
+    full_name: str
+    amount: Decimal
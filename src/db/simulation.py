@@ -0,0 +1,166 @@
+from datetime import date
+from decimal import Decimal
+from typing import Mapping, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, type_coerce, String, Integer
+from sqlalchemy.orm import Session
+
+from src.db.billing_calendar import get_billing_period, MAX_DAY
+from src.db.models import Client, Tariff, StatusClientEnum
+from src.db.price_book import TariffPriceBook
+from src.models.accruals import AccrualSimulation, TariffSimulation
+from src.models.money import to_kopecks, from_kopecks
+
+
+def _prorate_kopecks(kopecks: np.ndarray, used_days: np.ndarray, days) -> np.ndarray:
+    """Доля суммы в копейках (int64) с округлением половины копейки вверх, как _prorate_expr в SQL."""
+    return (kopecks * used_days * 2 + days) // (days * 2)
+
+
+class AccrualSimulator:
+    """
+    Прогноз ежемесячного начисления ("что если") при изменении стоимости тарифов.
+
+    Данные абонентов загружаются из базы один раз в виде столбцов (баланс, статус, части дат),
+    после чего правила начисления apply_monthly_accrual применяются векторно средствами NumPy
+    для любого набора цен без изменения данных в базе. Суммы считаются в целых копейках (int64).
+    """
+
+    def __init__(self, db: Session):
+        """
+        :param db: Активная синхронная сессия базы данных.
+        """
+        # Баланс читается целым числом копеек, даты — строками и разбираются pandas целым столбцом.
+        stmt = select(
+            Client.id,
+            Client.tariff_id,
+            type_coerce(Client.balance, Integer),
+            Client.status == StatusClientEnum.CONNECTING,
+            type_coerce(Client.accrual_date, String),
+            type_coerce(Client.status_date, String),
+            type_coerce(Client.connection_date, String),
+        )
+        columns = ["id", "tariff_id", "balance", "connected", "accrual_date", "status_date", "connection_date"]
+        # Core-запрос без ORM: строки сразу идут в столбцы DataFrame
+        connection = db.connection()
+        self.clients = pd.DataFrame(connection.execute(stmt).all(), columns=columns)
+        for column in ("accrual_date", "status_date", "connection_date"):
+            self.clients[column] = pd.to_datetime(self.clients[column], format="ISO8601")
+
+        # Тарифы: ключ — ID тарифа; цены за период — из истории цен
+        self.tariff_names = dict(connection.execute(select(Tariff.id, Tariff.name).order_by(Tariff.id)).all())
+        self.price_book = TariffPriceBook.load(db)
+
+        self._tariff_codes = pd.Categorical(self.clients["tariff_id"], categories=list(self.tariff_names))
+        self._balance = self.clients["balance"].to_numpy(dtype=np.int64)
+        self._connected = self.clients["connected"].to_numpy(dtype=bool)
+        accrual_date = self.clients["accrual_date"].dt
+        status_date = self.clients["status_date"].dt
+        connection_date = self.clients["connection_date"].dt
+        self._int_columns = {
+            "accrual_month": accrual_date.month.fillna(0).to_numpy(dtype=np.int64),
+            "status_month": status_date.month.fillna(0).to_numpy(dtype=np.int64),
+            "status_year": status_date.year.fillna(0).to_numpy(dtype=np.int64),
+            "conn_month": connection_date.month.to_numpy(dtype=np.int64),
+            "conn_year": connection_date.year.to_numpy(dtype=np.int64),
+            "conn_day": connection_date.day.to_numpy(dtype=np.int64),
+        }
+
+        # Дни пользования в месяце подключения — выборка из календаря начислений
+        # по каждому встречающемуся месяцу подключения, а не расчет дат для каждого абонента
+        col = self._int_columns
+        conn_periods, conn_period_index = np.unique(col["conn_year"] * 12 + col["conn_month"] - 1,
+                                                    return_inverse=True)
+        periods = [get_billing_period(int(value) // 12, int(value) % 12 + 1) for value in conn_periods]
+        connection_days = np.array([period.connection_days for period in periods], dtype=np.int64).reshape(-1, MAX_DAY + 1)
+        days_in_period = np.array([period.days for period in periods], dtype=np.int64)
+        col["conn_days"] = connection_days[conn_period_index, col["conn_day"]]
+        col["conn_period_days"] = days_in_period[conn_period_index]
+
+    def _charges(self, accrual_date: date, prices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Векторно рассчитывает начисление каждому абоненту в копейках.
+
+        Повторяет правила _monthly_charge_expr и _monthly_accrual_filter.
+
+        :param prices: Цены тарифов в копейках (int64) в порядке self.tariff_names.
+        :return: Суммы начисления (int64, 0 — начисление не положено) и признак начисления.
+        """
+        col = self._int_columns
+        month, year = accrual_date.month, accrual_date.year
+        period = get_billing_period(year, month)
+
+        codes = self._tariff_codes.codes
+        has_tariff = codes >= 0
+        price = np.where(has_tariff, prices[codes], 0)
+
+        status_other_month = col["status_month"] != month
+        full_month = status_other_month & (col["conn_month"] != month) & (col["conn_year"] != year)
+        status_this_month = ~status_other_month & (col["status_year"] == year)
+
+        status_days = np.array(period.connection_days, dtype=np.int64)[col["conn_day"]]
+
+        charge = np.zeros(len(codes), dtype=np.int64)
+        charge = np.where(status_this_month, _prorate_kopecks(price, status_days, period.days), charge)
+        charge = np.where(status_other_month, _prorate_kopecks(price, col["conn_days"], col["conn_period_days"]),
+                          charge)
+        charge = np.where(full_month, price, charge)
+
+        charged = has_tariff & self._connected & (col["accrual_month"] != month) \
+            & (status_other_month | status_this_month)
+        return np.where(charged, charge, 0), charged
+
+    def simulate(self, accrual_date: date, prices: Optional[Mapping[str, Decimal]] = None) -> AccrualSimulation:
+        """
+        Рассчитывает прогноз начисления за месяц для гипотетических цен тарифов.
+
+        :param accrual_date: Дата выполнения начисления.
+        :param prices: Новые цены в виде {название тарифа: цена в месяц}.
+            Тарифы, не указанные в словаре, сохраняют цену, действующую в периоде начисления.
+        :return: Итоги прогноза: сумма начисления при текущих и новых ценах,
+            количество новых должников и разбивка по тарифам.
+        """
+        period_start = accrual_date.replace(day=1)
+        current_prices = {tariff_id: to_kopecks(self.price_book.price(tariff_id, period_start))
+                          for tariff_id in self.tariff_names}
+        new_prices = dict(current_prices)
+        ids_by_name = {name: tariff_id for tariff_id, name in self.tariff_names.items()}
+        for name, price in (prices or {}).items():
+            tariff_id = ids_by_name.get(name)
+            if tariff_id is not None:
+                new_prices[tariff_id] = to_kopecks(price)
+
+        current_amount, _ = self._charges(accrual_date, np.array(list(current_prices.values()), dtype=np.int64))
+        projected_amount, charged = self._charges(accrual_date, np.array(list(new_prices.values()), dtype=np.int64))
+        new_balance = self._balance - projected_amount
+        new_debtors = charged & (self._balance >= 0) & (new_balance < 0)
+
+        breakdown = pd.DataFrame({
+            "tariff_id": self._tariff_codes,
+            "charged": charged,
+            "current_amount": current_amount,
+            "projected_amount": projected_amount,
+            "new_debtors": new_debtors,
+        }).groupby("tariff_id", observed=False).sum()
+
+        by_tariff = [
+            TariffSimulation(
+                tariff=self.tariff_names[tariff_id],
+                monthly_price=from_kopecks(new_prices[tariff_id]),
+                clients_charged=int(row.charged),
+                current_amount=from_kopecks(row.current_amount),
+                projected_amount=from_kopecks(row.projected_amount),
+                new_debtors=int(row.new_debtors),
+            )
+            for tariff_id, row in breakdown.iterrows()
+        ]
+
+        return AccrualSimulation(
+            clients_charged=int(charged.sum()),
+            current_amount=from_kopecks(current_amount.sum()),
+            projected_amount=from_kopecks(projected_amount.sum()),
+            new_debtors=int(new_debtors.sum()),
+            by_tariff=by_tariff,
+        )
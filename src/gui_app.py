@@ -1,30 +1,270 @@
 import calendar
-import math
+import hashlib
+import os
+import queue
+import threading
+import time as timer
 import tkinter
+import uuid
 import pandas as pd
 from pathlib import Path
 from openpyxl.reader.excel import load_workbook
 
 from tkcalendar import DateEntry
 from datetime import date, time, datetime
+from decimal import Decimal
+from typing import Optional, Sequence
 from tkinter import ttk, messagebox, filedialog
 from tkinter.constants import END
 
 from pydantic import ValidationError
-
-from src.db.models import StatusClientEnum
-from src.db.crud import delete_tariff, delete_client, get_client_by_pa, update_client, create_payment, create_client, \
-    search_clients, get_clients, get_tariffs, create_tariff, get_tariff_by_name, set_client_activity, \
-    get_payments_by_client, apply_monthly_charge, apply_daily_charge, get_accruals_by_client, create_accrual_daily, \
-    create_accrual_monthly, get_debtors_report, set_client_status, get_last_payment_by_client, clear_db_clients, \
-    bulk_create_clients, get_last_accrual_by_client, get_payments_in_range, get_payment_by_id, get_client_by_id, \
-    create_service, get_services, get_service_by_name, delete_service, create_accrual
-from src.db.database import get_db, init_db
+from sqlalchemy.orm.exc import StaleDataError
+
+from src.db.models import StatusClientEnum, Accrual, Payment
+from src.db.crud import delete_tariff, delete_client, get_client_by_pa, get_client_card, update_client, post_payment, \
+    post_accrual, post_payments_bulk, create_client, \
+    get_client_rows_page, count_clients_by_status, iter_clients, iter_client_rows, get_tariffs, create_tariff, get_tariff_by_name, \
+    set_tariff_price, get_tariff_prices_on, set_client_activity, \
+    get_tariff_ids, run_monthly_accrual, get_accrual_run, accrual_period, backfill_accruals, \
+    ACCRUAL_BACKFILL_PERIODS, \
+    get_debtor_rows, get_bank_report_rows, iter_client_movement_rows, set_client_status, get_last_payment_by_client, \
+    clear_db_clients, bulk_create_clients, get_last_accrual_by_client, iter_payment_report_rows, get_payment_by_id, \
+    create_service, get_services, get_service_by_name, delete_service
+from src.db.database import get_db, init_db, OutdatedSchemaError
+from src.db.pagination import Page
 from src.models.clients import ClientUpdate, ClientForPayments, ClientCard, ClientCreate, ClientBase
-from src.models.payments import PaymentCreate
+from src.models.payments import PaymentCreate, RegistryPayment, PostingStatusEnum
 from src.models.tariffs import TariffCreate
 from src.models.services import ServiceCreate
 from src.models.accruals import AccrualCreate
+from src.models.money import to_money
+
+# Поиск при вводе: пауза после последнего нажатия клавиши
+SEARCH_DEBOUNCE_MS = 300
+# Количество строк списка абонентов, читаемых из базы за один запрос
+CLIENT_LIST_PAGE_SIZE = 200
+# Поля сортировки списка абонентов (см. CLIENT_ROW_SORT_KEYS) по столбцам client_tree
+CLIENT_SORT_FIELDS = {
+    "account": "personal_account",
+    "fio": "full_name",
+    "address": "address",
+    "tariff": "tariff_name",
+    "balance": "balance",
+    "status": "status",
+}
+
+
+class AccrualCancelled(Exception):
+    """Начисление прервано пользователем."""
+
+
+class AccrualWorker(threading.Thread):
+    """Фоновый поток ежемесячного начисления.
+
+    Работает со своей сессией базы данных и передает сообщения в главный поток через очередь:
+    ("progress", (обработано, всего, прошло_секунд)), ("done", итог), ("cancelled", None), ("error", ошибка).
+    Перед первым начислением нового периода доначисляет пропущенные месяцы (итог в backfill_summary).
+    """
+
+    def __init__(self, accrual_date: date, force: bool = False):
+        super().__init__(daemon=True)
+        self.accrual_date = accrual_date
+        self.force = force
+        self.messages = queue.Queue()
+        self._cancel_event = threading.Event()
+        self.started_at = None
+        self.backfill_summary = None
+
+    def cancel(self):
+        """Запрашивает отмену начисления (текущая пачка будет откачена, начисление продолжится при следующем запуске)."""
+        self._cancel_event.set()
+
+    def run(self):
+        self.started_at = timer.monotonic()
+        db = next(get_db())
+        try:
+            if get_accrual_run(db, accrual_period(self.accrual_date)) is None:
+                self.backfill_summary = backfill_accruals(db, self.accrual_date, ACCRUAL_BACKFILL_PERIODS)
+            # Начисление выполняется в потоке приложения, поэтому пул процессов не запускается
+            summary = run_monthly_accrual(db, self.accrual_date, force=self.force, on_progress=self._on_progress)
+            self.messages.put(("done", summary))
+        except AccrualCancelled:
+            self.messages.put(("cancelled", None))
+        except Exception as e:
+            self.messages.put(("error", e))
+        finally:
+            db.close()
+
+    def _on_progress(self, processed: int, total: int):
+        if self._cancel_event.is_set():
+            raise AccrualCancelled()
+        self.messages.put(("progress", (processed, total, timer.monotonic() - self.started_at)))
+
+
+class SearchWorker(threading.Thread):
+    """Фоновый поток поиска абонентов при вводе строки поиска.
+
+    Запросы выполняются по одному со своей сессией базы данных; из накопившихся запросов
+    выполняется только последний, а выполняющийся запрос прерывается, когда приходит более новый.
+    Результаты передаются в главный поток через очередь: (номер_запроса, "done", первая_страница)
+    или (номер_запроса, "error", ошибка).
+    """
+
+    def __init__(self, page_size: int):
+        super().__init__(daemon=True)
+        self.page_size = page_size
+        self.results = queue.Queue()
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._running_generation = None
+        self._running_connection = None
+
+    def search(self, generation: int, search_term: str, sort: str = "id", descending: bool = False):
+        """Ставит поиск в очередь и прерывает выполняющийся устаревший запрос."""
+        self._requests.put((generation, search_term, sort, descending))
+        with self._lock:
+            if self._running_connection is not None and self._running_generation < generation:
+                # sqlite3: interrupt() можно вызывать из другого потока, запрос завершится ошибкой "interrupted"
+                self._running_connection.interrupt()
+
+    def run(self):
+        while True:
+            request = self._requests.get()
+            # Ввод продолжается: устаревшие запросы не выполняются
+            while True:
+                try:
+                    request = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+            self._search(*request)
+
+    def _search(self, generation: int, search_term: str, sort: str, descending: bool):
+        db = next(get_db())
+        try:
+            with self._lock:
+                self._running_generation = generation
+                self._running_connection = db.connection().connection.dbapi_connection
+            page = get_client_rows_page(db, None, self.page_size, search_term=search_term,
+                                        sort=sort, descending=descending)
+            self.results.put((generation, "done", page))
+        except Exception as e:
+            # Ошибка прерванного запроса не показывается: результат уже не нужен
+            if not self._requests.empty():
+                return
+            self.results.put((generation, "error", e))
+        finally:
+            with self._lock:
+                self._running_generation = None
+                self._running_connection = None
+            db.close()
+
+
+class PagedTreeview:
+    """Список Treeview, читаемый из базы страницами по мере прокрутки (keyset-курсоры).
+
+    В Treeview находятся не более max_pages страниц вокруг видимой области. Когда прокрутка
+    подходит к нижнему краю, дочитывается следующая страница, а верхняя удаляется (ее курсор
+    запоминается); у верхнего края удаленная страница читается заново по сохраненному курсору.
+
+    :param tree: Treeview списка.
+    :param scrollbar: Вертикальная полоса прокрутки списка.
+    :param to_values: Функция, возвращающая значения столбцов Treeview для строки страницы.
+    :param max_pages: Наибольшее число страниц в Treeview.
+    """
+
+    # Доля прокрутки у края списка, при которой читается соседняя страница
+    EDGE = 0.1
+
+    def __init__(self, tree: ttk.Treeview, scrollbar: ttk.Scrollbar, to_values, max_pages: int = 3):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.to_values = to_values
+        self.max_pages = max_pages
+        self.fetch_page = None
+        # Загруженные страницы: [курсор страницы, ID элементов Treeview, курсор следующей страницы]
+        self.pages = []
+        # Курсоры страниц выше загруженных (последний — ближайшей)
+        self.cursors_above = []
+        self.item_count = 0
+        self._loading = False
+        tree.configure(yscrollcommand=self._on_scroll)
+
+    def reset(self, fetch_page, first_page: Optional[Page] = None) -> Page:
+        """
+        Показывает новый список с первой страницы.
+
+        :param fetch_page: Функция, возвращающая страницу по курсору (None — первая страница).
+        :param first_page: Уже прочитанная первая страница (например, в фоновом потоке).
+        :return: Отображенная первая страница.
+        """
+        self.fetch_page = fetch_page
+        self.tree.delete(*self.tree.get_children())
+        self.pages = []
+        self.cursors_above = []
+        self.item_count = 0
+        if first_page is None:
+            first_page = fetch_page(None)
+        self._append_page(None, first_page)
+        self.tree.yview_moveto(0)
+        return first_page
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._loading or not self.pages:
+            return
+        if float(last) >= 1 - self.EDGE and self.pages[-1][2] is not None:
+            self._loading = True
+            self.tree.after_idle(self._load_below)
+        elif float(first) <= self.EDGE and self.cursors_above:
+            self._loading = True
+            self.tree.after_idle(self._load_above)
+
+    def _top_index(self) -> int:
+        """Номер строки в верхней части видимой области."""
+        return round(self.tree.yview()[0] * self.item_count)
+
+    def _append_page(self, cursor, page: Page):
+        items = [self.tree.insert("", "end", values=self.to_values(row)) for row in page.items]
+        self.pages.append([cursor, items, page.next_cursor])
+        self.item_count += len(items)
+
+    def _load_below(self):
+        """Дочитывает следующую страницу и удаляет лишнюю верхнюю."""
+        try:
+            if not self.pages or self.pages[-1][2] is None:
+                return
+            top = self._top_index()
+            next_cursor = self.pages[-1][2]
+            self._append_page(next_cursor, self.fetch_page(next_cursor))
+            if len(self.pages) > self.max_pages:
+                cursor, items, _ = self.pages.pop(0)
+                self.tree.delete(*items)
+                self.item_count -= len(items)
+                self.cursors_above.append(cursor)
+                top -= len(items)
+            self.tree.yview_moveto(top / max(self.item_count, 1))
+        finally:
+            self._loading = False
+
+    def _load_above(self):
+        """Читает заново ближайшую удаленную верхнюю страницу и удаляет лишнюю нижнюю."""
+        try:
+            if not self.cursors_above:
+                return
+            top = self._top_index()
+            cursor = self.cursors_above.pop()
+            page = self.fetch_page(cursor)
+            items = [self.tree.insert("", index, values=self.to_values(row)) for index, row in enumerate(page.items)]
+            self.pages.insert(0, [cursor, items, page.next_cursor])
+            self.item_count += len(items)
+            top += len(items)
+            if len(self.pages) > self.max_pages:
+                _, items, _ = self.pages.pop()
+                self.tree.delete(*items)
+                self.item_count -= len(items)
+            self.tree.yview_moveto(top / max(self.item_count, 1))
+        finally:
+            self._loading = False
 
 
 class BillingSysemApp(tkinter.Tk):
@@ -43,8 +283,26 @@ class BillingSysemApp(tkinter.Tk):
             style.theme_use("vista")
         except tkinter.TclError:
             print("Тема 'vista' не найдена, используется 'default'")
-        # Инициализация БД
-        init_db()
+        # Инициализация БД (существующая база должна быть обновлена миграциями)
+        try:
+            init_db()
+        except OutdatedSchemaError as e:
+            messagebox.showerror("Ошибка базы данных", str(e))
+            self.destroy()
+            raise SystemExit(1)
+
+        self.accrual_worker = None
+        self.accrual_manual = False
+        self.search_worker = SearchWorker(CLIENT_LIST_PAGE_SIZE)
+        self.search_worker.start()
+        self.search_generation = 0
+        # Поле сортировки списка абонентов и направление (по убыванию)
+        self.client_sort = ("id", False)
+        self.search_after_id = None
+        self.search_input = ""
+        self.search_pending = False
+        self.search_polling = False
+        self._setup_status_bar()
 
         # Создание вкладок (Notebook)
         notebook = ttk.Notebook(self)
@@ -69,7 +327,7 @@ class BillingSysemApp(tkinter.Tk):
 
         self.date_todey = date.today()
 
-        if 1 < self.date_todey.day < 10:
+        if 1 < self.date_todey.day < 10 or self._has_unfinished_accrual():
             self._accrual_of_amounts()
 
     def _setup_abonents_tab(self, frame):
@@ -84,9 +342,10 @@ class BillingSysemApp(tkinter.Tk):
         self.search_entry.pack(side="left", padx=5, fill="x", expand=True)
 
         self.search_entry.bind("<Return>", lambda e: self._search_clients())
+        self.search_entry.bind("<KeyRelease>", self._on_search_input)
 
         ttk.Button(search_frame, text="Найти", command=self._search_clients).pack(side="left", padx=5)
-        ttk.Button(search_frame, text="Сброс", command=self._load_clients).pack(side="left", padx=5)
+        ttk.Button(search_frame, text="Сброс", command=self._reset_search).pack(side="left", padx=5)
 
         tree_container = ttk.Frame(frame)
         tree_container.pack(fill="both", expand=True, padx=10, pady=5)
@@ -95,7 +354,8 @@ class BillingSysemApp(tkinter.Tk):
         self.client_tree = ttk.Treeview(tree_container, columns=columns, show='headings')
 
         scrollbar = ttk.Scrollbar(tree_container, orient="vertical", command=self.client_tree.yview)
-        self.client_tree.configure(yscrollcommand=scrollbar.set)
+        # Строки читаются из базы страницами по мере прокрутки
+        self.client_list = PagedTreeview(self.client_tree, scrollbar, self._client_values)
 
         self.client_tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
@@ -109,9 +369,10 @@ class BillingSysemApp(tkinter.Tk):
             "status": "Статус"
         }
 
+        self.client_headers = headers
         for col_id, col_text in headers.items():
             self.client_tree.heading(col_id, text=col_text,
-                                     command=lambda c=col_id: self._sort_column(c, False))
+                                     command=lambda c=col_id: self._sort_clients(c))
 
             width = 150 if col_id in ["fio", "address"] else 100
             self.client_tree.column(col_id, width=width, anchor="center" if width == 100 else "w")
@@ -149,19 +410,34 @@ class BillingSysemApp(tkinter.Tk):
 
         self._load_clients()
 
-    def _sort_column(self, col, reverse):
-        """Сортировка содержимого Treeview"""
-        data = [(self.client_tree.set(child, col), child) for child in self.client_tree.get_children('')]
+    def _sort_clients(self, col):
+        """
+        Сортирует список клиентов по столбцу: запрос страницы выполняется заново с сортировкой в базе.
+        Повторное нажатие на заголовок меняет направление сортировки.
+        """
+        sort = CLIENT_SORT_FIELDS[col]
+        current_sort, descending = self.client_sort
+        self.client_sort = (sort, not descending if sort == current_sort else False)
+
+        for col_id, col_text in self.client_headers.items():
+            if CLIENT_SORT_FIELDS[col_id] == sort:
+                col_text += " ▼" if self.client_sort[1] else " ▲"
+            self.client_tree.heading(col_id, text=col_text)
+        self._search_clients()
 
-        if col in ["balance", "account"]:
+    def _sort_column(self, tree, col, reverse):
+        """Сортировка содержимого Treeview небольших справочников (тарифы, услуги)"""
+        data = [(tree.set(child, col), child) for child in tree.get_children('')]
+
+        if col in ["price", "cost"]:
             data.sort(key=lambda x: float(x[0].replace(' ', '') or 0), reverse=reverse)
         else:
             data.sort(key=lambda x: x[0].lower(), reverse=reverse)
 
         for index, (val, child) in enumerate(data):
-            self.client_tree.move(child, '', index)
+            tree.move(child, '', index)
 
-        self.client_tree.heading(col, command=lambda: self._sort_column(col, not reverse))
+        tree.heading(col, command=lambda: self._sort_column(tree, col, not reverse))
 
     def _setup_tariffs_tab(self, frame):
         """Создает таблицы 'Тарифы' и 'Услуги'"""
@@ -197,6 +473,7 @@ class BillingSysemApp(tkinter.Tk):
         t_btns.pack(fill="x", pady=5)
         ttk.Button(t_btns, text="Добавить тариф", command=self._add_tariff).pack(side="left", padx=5)
         ttk.Button(t_btns, text="Удалить тариф", command=self._delete_tariff).pack(side="left", padx=5)
+        ttk.Button(t_btns, text="Изменить цену", command=self._change_tariff_price).pack(side="left", padx=5)
 
         # --- СЕКЦИЯ 2: УСЛУГИ ---
         services_label_frame = ttk.LabelFrame(frame, text="Услуги", padding=10)
@@ -336,63 +613,113 @@ class BillingSysemApp(tkinter.Tk):
                                      f"Список платежей за период с {start_date.strftime("%d.%m.%Y")} по {end_date.strftime("%d.%m.%Y")}",
                                      1, start_date, actual_end)
 
+    def _on_search_input(self, event):
+        """Откладывает поиск до паузы во вводе: при быстром наборе выполняется только последний запрос."""
+        # Клавиши, не изменяющие строку (стрелки, Shift, Enter), поиск не запускают
+        if self.search_entry.get() == self.search_input:
+            return
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(SEARCH_DEBOUNCE_MS, self._search_clients)
+
     def _search_clients(self):
-        """Выполняет поиск клиентов (синхронная версия)."""
-        val = self.search_entry.get().strip()
+        """Выполняет поиск клиентов в фоновом потоке; результат отображается по готовности."""
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+            self.search_after_id = None
+
+        # Результаты ранее начатых поисков больше не отображаются
+        self.search_generation += 1
+        self.search_input = self.search_entry.get()
+        val = self.search_input.strip()
+        self.search_pending = bool(val)
         if not val:
             return self._load_clients()
-        clients = None
-        for db in get_db():
-            clients = search_clients(db, val)
 
-        self._display_clients(clients)
+        self.search_worker.search(self.search_generation, val, *self.client_sort)
+        if not self.search_polling:
+            self.search_polling = True
+            self.after(50, self._poll_search)
         return None
 
+    def _poll_search(self):
+        """Забирает результаты фонового поиска и отображает результат последнего запроса."""
+        while True:
+            try:
+                generation, kind, payload = self.search_worker.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.search_generation:
+                continue
+            self.search_pending = False
+            if kind == "done":
+                self._display_clients(self.search_input.strip(), payload)
+            else:
+                messagebox.showerror("Ошибка поиска", f"Не удалось выполнить поиск:\n{payload}")
+
+        if self.search_pending:
+            self.after(50, self._poll_search)
+        else:
+            self.search_polling = False
+
+    def _reset_search(self):
+        """Очищает строку поиска и отображает всех клиентов."""
+        self.search_entry.delete(0, END)
+        self._search_clients()
+
     def _load_clients(self):
         """Загружает и отображает список всех клиентов (или сброс поиска)."""
-        # 1. Очистка Treeview
-        for item in self.client_tree.get_children():
-            self.client_tree.delete(item)
+        self._display_clients(None)
 
-        clients = None
-
-        # 2. Получение данных
+    def _fetch_client_rows(self, search_term, sort, descending, cursor):
+        """Читает страницу строк списка клиентов (ClientRow) по курсору."""
+        page = None
         for db in get_db():
-            clients = get_clients(db)
+            page = get_client_rows_page(db, cursor, CLIENT_LIST_PAGE_SIZE, search_term=search_term,
+                                        sort=sort, descending=descending)
             break
+        return page
+
+    @staticmethod
+    def _client_values(client):
+        """Значения столбцов Treeview для строки списка клиентов (ClientRow)."""
+        return (
+            client.personal_account,
+            client.full_name,
+            client.address,
+            client.tariff_name,
+            f"{client.balance:.2f}",  # Форматируем баланс
+            client.status.value,
+        )
 
-        # 3. Отображение
-        self._display_clients(clients)
+    def _display_clients(self, search_term, first_page=None):
+        """
+        Отображает список клиентов с первой страницы; следующие страницы читаются при прокрутке.
 
-    def _display_clients(self, clients):
-        """Отображает список объектов клиентов в Treeview."""
-        # Очистка Treeview
-        for item in self.client_tree.get_children():
-            self.client_tree.delete(item)
-        count_connecting_clients = 0
-        count_disconnecting_clients = 0
-        count_paused_clients = 0
-        for client in clients:
-            if client.status is StatusClientEnum.CONNECTING:
-                count_connecting_clients += 1
-            elif client.status is StatusClientEnum.DISCONNECTING:
-                count_disconnecting_clients += 1
-            elif client.status is StatusClientEnum.PAUSE:
-                count_paused_clients += 1
-            self.client_tree.insert("", "end", values=(
-                client.personal_account,
-                client.full_name,
-                client.address,
-                client.tariff,
-                f"{client.balance:.2f}",  # Форматируем баланс
-                client.status.value,
-            ))
-        self.lbl_total.configure(text=f"Всего: {count_connecting_clients}")
-        self.lbl_disabled.configure(text=f"Отключенных: {count_disconnecting_clients}")
-        self.lbl_pause.configure(text=f"Приостановленных: {count_paused_clients}")
+        :param search_term: Строка поиска (None — все клиенты).
+        :param first_page: Первая страница, уже прочитанная в фоновом потоке поиска.
+        """
+        sort, descending = self.client_sort
+        self.client_list.reset(lambda cursor: self._fetch_client_rows(search_term, sort, descending, cursor), first_page)
 
-    def _display_tariffs(self, tariffs):
-        """Отображает список объектов тарифов в Treeview."""
+        self._update_client_counts()
+
+    def _update_client_counts(self):
+        """Обновляет количество клиентов по статусам в рамке 'Количество абонентов' (по всей базе)."""
+        counts = None
+        for db in get_db():
+            counts = count_clients_by_status(db)
+            break
+        self.lbl_total.configure(text=f"Всего: {counts[StatusClientEnum.CONNECTING]}")
+        self.lbl_disabled.configure(text=f"Отключенных: {counts[StatusClientEnum.DISCONNECTING]}")
+        self.lbl_pause.configure(text=f"Приостановленных: {counts[StatusClientEnum.PAUSE]}")
+
+    def _display_tariffs(self, tariffs, prices):
+        """
+        Отображает список объектов тарифов в Treeview.
+
+        :param prices: Цены тарифов на сегодня {id тарифа: цена} (см. get_tariff_prices_on).
+        """
         # Очистка Treeview
         for item in self.tariffs_tree.get_children():
             self.tariffs_tree.delete(item)
@@ -403,7 +730,7 @@ class BillingSysemApp(tkinter.Tk):
 
             self.tariffs_tree.insert("", "end", values=(
                 tariff.name,
-                tariff.monthly_price,
+                prices[tariff.id],
                 is_active_status
             ))
 
@@ -443,13 +770,15 @@ class BillingSysemApp(tkinter.Tk):
         for item in self.tariffs_tree.get_children():
             self.tariffs_tree.delete(item)
         tariffs = None
-        # 2. Получение данных
+        prices = None
+        # 2. Получение данных (цены — действующие сегодня, из истории цен)
         for db in get_db():
             tariffs = get_tariffs(db)
+            prices = get_tariff_prices_on(db, date.today())
             break
 
         # 3. Отображение
-        self._display_tariffs(tariffs)
+        self._display_tariffs(tariffs, prices)
 
     def _load_services(self):
         """Загружает и отображает список всех Услуг."""
@@ -514,8 +843,8 @@ class BillingSysemApp(tkinter.Tk):
                             full_name=str(client.full_name),
                             address=str(client.address),
                             phone_number=str(client.phone_number),
-                            tariff=str(client.tariff),
-                            balance=float(client.balance),
+                            tariff_id=int(client.tariff_id),
+                            balance=client.balance,
                         )
                         new_window_edit_client = WindowAddClient(self)
                         new_window_edit_client.set_data_client(current_client)
@@ -540,11 +869,16 @@ class BillingSysemApp(tkinter.Tk):
             try:
                 for db in get_db():
                     tariff = get_tariff_by_name(db, select_tariff[0])
-                    delete_tariff(db, int(tariff.id))
-                    messagebox.showinfo(
-                        "Успех",
-                        f"Тариф {tariff.name} успешно удален!"
-                    )
+                    if delete_tariff(db, int(tariff.id)):
+                        messagebox.showinfo(
+                            "Успех",
+                            f"Тариф {tariff.name} успешно удален!"
+                        )
+                    else:
+                        messagebox.showwarning(
+                            "Внимание!",
+                            f"Тариф {tariff.name} назначен абонентам, удаление невозможно."
+                        )
                     break
             except Exception as e:
                 messagebox.showerror("Ошибка удаления", f"Не удалось удалить тариф:\n{e}")
@@ -599,9 +933,10 @@ class BillingSysemApp(tkinter.Tk):
                             full_name=str(client.full_name),
                             address=str(client.address),
                             phone_number=str(client.phone_number),
-                            tariff=str(client.tariff),
-                            balance=float(client.balance),
+                            tariff_id=int(client.tariff_id),
+                            balance=client.balance,
                             is_active=bool(client.is_active),
+                            version=client.version,
                         )
                         new_window_edit_client = WindowAddPayment(self)
                         new_window_edit_client.set_data_client(current_client)
@@ -618,6 +953,17 @@ class BillingSysemApp(tkinter.Tk):
         """Создание нового окна для добавления тарифа."""
         add_window_tariff = WindowAddTariff(self)
 
+    def _change_tariff_price(self):
+        """Создание нового окна для изменения цены выбранного тарифа."""
+        select_tariff = self.tariffs_tree.item(self.tariffs_tree.focus()).get('values')
+        if not select_tariff:
+            messagebox.showerror(
+                "Внимание!",
+                "Необходимо выбрать тариф!"
+            )
+            return
+        change_price_window = WindowTariffPrice(self, str(select_tariff[0]))
+
     def _add_service(self):
         """Создание нового окна для добавления Услуги."""
         add_window_service = WindowAddService(self)
@@ -666,22 +1012,26 @@ class BillingSysemApp(tkinter.Tk):
         values = item_data['values']
 
         current_client = None
+        accruals, payments = [], []
         try:
             for db in get_db():
-                client = get_client_by_pa(db, values[0])
+                # Паспорт, платежи и начисления абонента читаются сразу, одной пакетной загрузкой
+                client = get_client_card(db, values[0])
+                accruals, payments = list(client.accruals), list(client.payments)
                 current_client = ClientCard(
                     personal_account=client.personal_account,
                     full_name=client.full_name,
                     address=client.address,
                     phone_number=client.phone_number,
-                    tariff=client.tariff,
-                    balance=float(client.balance),
+                    tariff_id=client.tariff_id,
+                    balance=client.balance,
                     client_id=client.id,
                     is_active=client.is_active,
                     connection_date=client.connection_date,
                     passport=client.passport,
                     status=client.status,
                     status_date=client.status_date if client.status_date else datetime.now(),
+                    version=client.version,
                 )
                 break
         except Exception as e:
@@ -690,80 +1040,112 @@ class BillingSysemApp(tkinter.Tk):
                 f"Произошла ошибка!\nПодробнее:\n{e}"
             )
         new_window = WindowEditAndViewClient(self)
-        new_window.set_data_client(current_client)
+        new_window.set_data_client(current_client, accruals, payments)
         # self._load_clients()
 
-    def _accrual_of_amounts(self):
-        """Метод начисления ежемесячной оплаты Абонентам."""
-        db = next(get_db())
-        try:
-            clients = get_clients(db)
-            today = self.date_todey
-
-            for client in clients:
-                # Получаем дату начисления, если было начисление (иначе получим 0).
-                accrual_month = client.accrual_date.month if client.accrual_date else 0
-
-                # Получаем дату смены статуса, если статус меняли (если статус не менялся, получаем 0).
-                status_date_month = client.status_date.month if client.status_date else 0
-                status_date_day = client.status_date.day if client.status_date else 0
-                status_date_year = client.status_date.year if client.status_date else 0
-                conn_date = client.connection_date
-
-                if accrual_month == 0 or accrual_month != today.month:
-
-                    # Начисление оплаты клиенту, если клиент имеет статус Подключен
-                    if client.status == StatusClientEnum.CONNECTING:
-
-                        # Проверяем, когда был получен статус
-                        if status_date_month != today.month:
-
-                            # Если подключение было в ПРОШЛОМ месяце или раньше
-                            if conn_date.month != today.month and conn_date.year != today.year:
-                                if apply_monthly_charge(db, client.id):
-                                    client.accrual_date = today
-                                    tariff = get_tariff_by_name(db, client.tariff)
-                                    create_accrual_monthly(db, client, tariff, today)
+    def _setup_status_bar(self):
+        """Создает строку состояния с ходом фонового начисления."""
+        self.status_bar = ttk.Frame(self, relief="sunken", padding=(5, 2))
+        self.status_bar.pack(side="bottom", fill="x")
 
-                            # Если подключение в ЭТОМ месяце (пропорциональное начисление)
-                            else:
-                                # Узнаем сколько всего дней в месяце (для 2026 года)
-                                _, days_in_month = calendar.monthrange(conn_date.year, conn_date.month)
+        self.status_bar_label = ttk.Label(self.status_bar, text="Готово")
+        self.status_bar_label.pack(side="left", padx=5)
 
-                                # Считаем количество дней пользования: (Всего - ДеньПодключения + 1)
-                                # Если подключился 11-го, то (31 - 11 + 1) = 21 день владения
-                                actual_days = days_in_month - conn_date.day + 1
+        self.btn_cancel_accrual = ttk.Button(self.status_bar, text="Отменить", command=self._cancel_accrual)
 
-                                if apply_daily_charge(db, client.id, actual_days):
-                                    client.accrual_date = today
-                                    create_accrual_daily(db, client.id, actual_days, today)
+        self.accrual_progress = ttk.Progressbar(self.status_bar, orient="horizontal", length=200, mode="determinate")
 
-                        # Если статус абонента изменен в этом месяце и в этом году
-                        elif status_date_month == today.month and status_date_year == today.year:
-                            _, days_in_month = calendar.monthrange(status_date_year, status_date_month)
-
-                            actual_days = days_in_month - conn_date.day + 1
-
-                            if apply_daily_charge(db, client.id, actual_days):
-                                client.accrual_date = today
-                                create_accrual_daily(db, client.id, actual_days, today)
+    def _has_unfinished_accrual(self) -> bool:
+        """Проверяет, осталось ли прерванное начисление за текущий период."""
+        for db in get_db():
+            accrual_run = get_accrual_run(db, accrual_period(self.date_todey))
+            return accrual_run is not None and accrual_run.finished_at is None
+        return False
 
-                    # Начисление оплаты клиенту, если клиент в текущем месяце был приостановлен
-                    elif client.status == StatusClientEnum.PAUSE:
-                        if status_date_month == today.month and status_date_year == today.year:
-                            actual_days = status_date_day - 1
+    def _accrual_of_amounts(self, manual: bool = False):
+        """Метод начисления ежемесячной оплаты Абонентам.
+        Начисление выполняется в фоновом потоке, ход выполнения отображается в строке состояния.
 
-                            if apply_daily_charge(db, client.id, actual_days):
-                                client.accrual_date = today
-                                create_accrual_daily(db, client.id, actual_days, today)
+        :param manual: Ручное начисление из вкладки 'Настройки' (выполняется и за уже завершенный период).
+        """
+        if self.accrual_worker is not None and self.accrual_worker.is_alive():
+            if manual:
+                messagebox.showwarning("Внимание!", "Начисление уже выполняется.")
+            return
 
-            db.commit()  # Фиксируем все начисления одной транзакцией
+        self.accrual_manual = manual
+        self.accrual_worker = AccrualWorker(self.date_todey, force=manual)
+        self.accrual_worker.start()
+
+        self.status_bar_label.configure(text="Начисление: подготовка...")
+        self.accrual_progress.configure(value=0, maximum=1)
+        self.btn_cancel_accrual.pack(side="right", padx=5)
+        self.accrual_progress.pack(side="right", padx=5)
+        self.after(100, self._poll_accrual)
+
+    def _cancel_accrual(self):
+        """Обрабатывает нажатие кнопки 'Отменить' в строке состояния."""
+        if self.accrual_worker is not None:
+            self.accrual_worker.cancel()
+            self.status_bar_label.configure(text="Начисление: отмена...")
+
+    def _poll_accrual(self):
+        """Забирает сообщения фонового начисления и обновляет строку состояния."""
+        worker = self.accrual_worker
+        finished = False
+        while True:
+            try:
+                kind, payload = worker.messages.get_nowait()
+            except queue.Empty:
+                break
 
-        except Exception as e:
-            db.rollback()
-            messagebox.showerror("Ошибка!", f"Ошибка начисления оплаты!\n{e}")
-        finally:
-            db.close()
+            if kind == "progress":
+                processed, total, elapsed = payload
+                self.accrual_progress.configure(value=processed, maximum=max(total, 1))
+                self.status_bar_label.configure(text=f"Начисление: {processed} из {total} ({elapsed:.1f} с)")
+            else:
+                finished = True
+                self._finish_accrual(kind, payload)
+
+        if not finished:
+            self.after(100, self._poll_accrual)
+
+    def _finish_accrual(self, kind: str, payload):
+        """Отображает результат фонового начисления."""
+        self.btn_cancel_accrual.pack_forget()
+        self.accrual_progress.pack_forget()
+
+        if kind == "done":
+            if payload is None:
+                self.status_bar_label.configure(text="Готово")
+                if self.accrual_manual:
+                    messagebox.showwarning(
+                        "Внимание!",
+                        "Начисление уже выполняется в другом экземпляре программы, повторите позже."
+                    )
+                return
+            self.status_bar_label.configure(
+                text=f"Начисление выполнено: {payload.clients_charged} абонентов на {payload.total_amount:.2f} руб."
+            )
+            self._search_clients()
+            if self.accrual_manual:
+                messagebox.showinfo(
+                    "Успешно!",
+                    f"Начисление выполнено.\nАбонентов: {payload.clients_charged}"
+                    f"\nСумма: {payload.total_amount:.2f} руб."
+                )
+            backfill = self.accrual_worker.backfill_summary
+            if backfill is not None and backfill.clients_charged:
+                messagebox.showinfo(
+                    "Доначисление",
+                    f"Доначислена оплата за пропущенные месяцы.\nНачислений: {backfill.clients_charged}"
+                    f"\nСумма: {backfill.total_amount:.2f} руб."
+                )
+        elif kind == "cancelled":
+            self.status_bar_label.configure(text="Начисление приостановлено, оно будет продолжено при следующем запуске")
+        else:
+            self.status_bar_label.configure(text="Ошибка начисления")
+            messagebox.showerror("Ошибка!", f"Ошибка начисления оплаты!\n{payload}")
 
     def _get_debtors_clients(self):
         """Создание нового окна для отчета."""
@@ -778,7 +1160,7 @@ class BillingSysemApp(tkinter.Tk):
 
         clients = None
         for db in get_db():
-            clients = get_clients(db)
+            clients = list(iter_client_movement_rows(db))
             break
 
         count_result = 0
@@ -812,7 +1194,7 @@ class BillingSysemApp(tkinter.Tk):
         dir_path.mkdir(parents=True, exist_ok=True)
 
         for db in get_db():
-            clients = get_clients(db)
+            clients = get_bank_report_rows(db)
 
             if clients:
                 with file_path.open(mode="w", encoding="cp1251") as file:
@@ -828,7 +1210,7 @@ class BillingSysemApp(tkinter.Tk):
                         accrual_date_month = client.accrual_date.month if client.accrual_date else 0
                         if accrual_date_month == current_month and client.status == StatusClientEnum.CONNECTING:
                             if client.balance < 0:
-                                amount = math.fabs(client.balance)
+                                amount = abs(client.balance)
                         record = f"{personal_account};{full_name};;ТВ;;{amount:.2f}\n"
                         if amount != 0:
                             file.write(record)
@@ -840,8 +1222,61 @@ class BillingSysemApp(tkinter.Tk):
             break
 
     def _set_report_for_bank(self):
-        """Метод для загрузки данных с банка"""
-        pass
+        """
+        Метод загрузки реестра платежей из банка.
+        Структура строки файла (как в реестре для банка): 'номер_ЛС;Фамилия ИО;;ТВ;;сумма_платежа', кодировка cp1251.
+        Строки с некорректным лицевым счетом или суммой (в том числе не больше нуля) не проводятся
+        и перечисляются в итоге загрузки.
+        Все платежи реестра проводятся одной транзакцией. Идентификатор платежа составляется из хэша файла
+        и номера строки, поэтому повторная загрузка того же файла платежи второй раз не проводит.
+        """
+        file_path = filedialog.askopenfilename(
+            title="Реестр платежей из банка",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+        )
+        if not file_path:
+            return
+
+        content = Path(file_path).read_bytes()
+        file_hash = hashlib.sha256(content).hexdigest()[:16]
+        payments = []
+        invalid_lines = []
+        for line_number, line in enumerate(content.decode("cp1251").splitlines(), start=1):
+            clean_line = line.strip()
+            if not clean_line:
+                continue
+            data_line = clean_line.split(";")
+            try:
+                payments.append(RegistryPayment(
+                    personal_account=int(data_line[0]),
+                    amount=data_line[5],
+                    external_id=f"bank:{file_hash}:{line_number}",
+                ))
+            except (ValueError, IndexError):
+                invalid_lines.append(str(line_number))
+
+        summary = None
+        for db in get_db():
+            summary = post_payments_bulk(db, payments)
+            break
+
+        if summary is None:
+            messagebox.showerror("Ошибка!", "Не удалось провести реестр платежей, платежи не загружены.")
+            return
+
+        message = (f"Проведено платежей: {summary.posted} на сумму {summary.total_amount:.2f} руб.\n"
+                   f"Загружены ранее: {summary.duplicates}\n"
+                   f"Неизвестные лицевые счета: {summary.unknown_accounts}")
+        unknown_accounts = [str(result.personal_account) for result in summary.results
+                            if result.status is PostingStatusEnum.UNKNOWN_ACCOUNT]
+        if unknown_accounts:
+            message += f" ({', '.join(unknown_accounts[:10])}{'...' if len(unknown_accounts) > 10 else ''})"
+        if summary.rejected:
+            message += f"\nОтклонены (сумма не больше нуля): {summary.rejected}"
+        if invalid_lines:
+            message += f"\nОшибки в строках: {', '.join(invalid_lines[:10])}{'...' if len(invalid_lines) > 10 else ''}"
+        messagebox.showinfo(title="Реестр платежей загружен", message=message)
+        self._load_clients()
 
     def _get_last_payment_client(self, client_id: int, current_month: int) -> float:
         result = 0
@@ -875,7 +1310,8 @@ class BillingSysemApp(tkinter.Tk):
 
         buttons_abonents_frame = ttk.Frame(abonents_frame)
         buttons_abonents_frame.grid(row=current_row, column=0, sticky='ew', pady=15)
-        ttk.Button(buttons_abonents_frame, text="Выполнить ручное начисление", command=self._accrual_of_amounts).pack(
+        ttk.Button(buttons_abonents_frame, text="Выполнить ручное начисление",
+                   command=lambda: self._accrual_of_amounts(manual=True)).pack(
             side="left", padx=5)
 
     def _select_file(self):
@@ -894,30 +1330,36 @@ class BillingSysemApp(tkinter.Tk):
             filename = filedialog.askopenfile()
             if filename:
                 with filename:
-                    list_lines_of_file = filename.readlines()
-                    for line in list_lines_of_file:
-                        clean_line = line.strip()
-                        if not clean_line: continue
-                        data_line = clean_line.split(";")
-                        try:
-                            client_data = ClientCreate(
-                                personal_account=int(data_line[0]),
-                                full_name=data_line[1],
-                                address=data_line[2],
-                                phone_number=data_line[3],
-                                tariff=data_line[4],
-                                connection_date=date.strptime(data_line[5], "%Y-%m-%d"),
-                                balance=float(data_line[6].replace(',', '.')),
-                            )
-                            clients.append(client_data)
-                        except (ValueError, IndexError) as e:
-                            messagebox.showerror(
-                                title="Ошибка!",
-                                message=f"Ошибка в строке: {line}. Ошибка: {e}"
-                            )
-                            continue
-                    db = next(get_db())
+                    # Массовая загрузка выполняется с профилем базы данных "bulk-load"
+                    db = next(get_db("bulk-load"))
                     try:
+                        # Названия тарифов из файла сопоставляются с ID тарифов один раз для всего файла
+                        tariff_ids = get_tariff_ids(db)
+                        list_lines_of_file = filename.readlines()
+                        for line in list_lines_of_file:
+                            clean_line = line.strip()
+                            if not clean_line: continue
+                            data_line = clean_line.split(";")
+                            try:
+                                tariff_id = tariff_ids.get(data_line[4].lower())
+                                if tariff_id is None:
+                                    raise ValueError(f"тариф '{data_line[4]}' не найден")
+                                client_data = ClientCreate(
+                                    personal_account=int(data_line[0]),
+                                    full_name=data_line[1],
+                                    address=data_line[2],
+                                    phone_number=data_line[3],
+                                    tariff_id=tariff_id,
+                                    connection_date=date.strptime(data_line[5], "%Y-%m-%d"),
+                                    balance=data_line[6],
+                                )
+                                clients.append(client_data)
+                            except (ValueError, IndexError) as e:
+                                messagebox.showerror(
+                                    title="Ошибка!",
+                                    message=f"Ошибка в строке: {line}. Ошибка: {e}"
+                                )
+                                continue
                         clear_db_clients(db)
                         bulk_create_clients(db, clients)
                     finally:
@@ -939,14 +1381,15 @@ class BillingSysemApp(tkinter.Tk):
         file_path = dir_path / f"data_clients_{date.today()}.csv"
         dir_path.mkdir(parents=True, exist_ok=True)
 
-        for db in get_db():
-            clients = get_clients(db)
+        # Выгрузка только читает базу данных
+        for db in get_db("read-only-reporting"):
+            clients = list(iter_clients(db))
             break
 
         if clients:
             with file_path.open(mode="w", encoding="utf-8") as file:
                 for client in clients:
-                    record = f"{client.personal_account};{client.full_name};{client.address};{client.phone_number};{client.tariff};{client.connection_date.strftime("%Y-%m-%d")};{client.balance:.2f};{client.status.value}\n"
+                    record = f"{client.personal_account};{client.full_name};{client.address};{client.phone_number};{client.tariff.name};{client.connection_date.strftime("%Y-%m-%d")};{client.balance:.2f};{client.status.value}\n"
                     if record:
                         file.write(record)
                     else:
@@ -985,7 +1428,8 @@ class WindowAddClient(tkinter.Toplevel):
 
         ttk.Label(self, text="Тариф:").grid(row=4, column=0, padx=5, pady=5, sticky="w")
         self.tariff_entry = ttk.Combobox(self, state="readonly", width=37)
-        self.tariff_entry["values"] = (self._get_tariffs() if len(self._get_tariffs()) > 0 else ["Нет тарифов"])
+        tariff_names = self._get_tariffs()
+        self.tariff_entry["values"] = (tariff_names if len(tariff_names) > 0 else ["Нет тарифов"])
         self.tariff_entry.current(0)
         self.tariff_entry.grid(row=4, column=1, padx=5, pady=5)
 
@@ -1067,6 +1511,8 @@ class WindowAddClient(tkinter.Toplevel):
         self.full_name_entry.insert(0, client.full_name)
         self.address_entry.insert(0, client.address)
         self.phone_entry.insert(0, client.phone_number)
+        if client.tariff_id in self.tariff_ids:
+            self.tariff_entry.current(self.tariff_ids.index(client.tariff_id))
         self.balance_entry.insert(0, client.balance)
 
     def _send_data_client(self):
@@ -1078,7 +1524,7 @@ class WindowAddClient(tkinter.Toplevel):
             "full_name": self.full_name_entry.get(),
             "address": self.address_entry.get(),
             "phone_number": self.phone_entry.get(),
-            "tariff": self.tariff_entry.get(),
+            "tariff_id": self._get_selected_tariff_id(),
             "balance": self.balance_entry.get(),
             "connection_date": self.cal_entry.get_date(),
         }
@@ -1096,7 +1542,7 @@ class WindowAddClient(tkinter.Toplevel):
                             full_name=self.full_name_entry.get(),
                             address=self.address_entry.get(),
                             phone_number=self.phone_entry.get(),
-                            tariff=self.tariff_entry.get(),
+                            tariff_id=self._get_selected_tariff_id(),
                         )
                         self._update_client(int(client.id), current_client)
 
@@ -1112,15 +1558,17 @@ class WindowAddClient(tkinter.Toplevel):
             )
 
     def _get_tariffs(self):
-        """Получает тарифы из базы и возвращает списком"""
+        """Получает тарифы из базы и возвращает списком названий (ID тарифов — в self.tariff_ids)"""
         try:
             list_tariffs = []
+            self.tariff_ids = []
             for db in get_db():
                 tariffs = get_tariffs(db)
                 if tariffs:
 
                     for tariff in tariffs:
                         list_tariffs.append(tariff.name)
+                        self.tariff_ids.append(tariff.id)
                     return list_tariffs
                 else:
                     messagebox.showerror(
@@ -1134,6 +1582,11 @@ class WindowAddClient(tkinter.Toplevel):
 
             self.destroy()
 
+    def _get_selected_tariff_id(self):
+        """Возвращает ID тарифа, выбранного в списке тарифов, или None."""
+        index = self.tariff_entry.current()
+        return self.tariff_ids[index] if 0 <= index < len(self.tariff_ids) else None
+
 
 class WindowAddPayment(tkinter.Toplevel):
     """Класс для вызова окна внесения оплаты."""
@@ -1169,6 +1622,10 @@ class WindowAddPayment(tkinter.Toplevel):
         self.status_text = tkinter.StringVar()
         status_label = ttk.Label(main_frame, textvariable=self.status_text, width=30)
         status_label.grid(column=1, row=3, padx=10, pady=5, sticky=tkinter.E)
+        # Версия абонента на момент открытия окна (см. set_data_client)
+        self.client_version = None
+        # Идентификатор платежа этого окна: повторное нажатие «Оплатить» не проводит платеж второй раз
+        self.payment_key = f"gui:{uuid.uuid4().hex}"
 
         ttk.Label(main_frame, text="Сумма (RUB):").grid(column=0, row=4, sticky=tkinter.W, pady=5)
         self.amount_entry = ttk.Entry(main_frame, width=30)
@@ -1189,23 +1646,22 @@ class WindowAddPayment(tkinter.Toplevel):
         try:
 
             personal_account = int(self.personal_account.get())
-            amount = float(self.amount_entry.get())
-            if personal_account and amount > 0.0:
+            amount = to_money(self.amount_entry.get())
+            if personal_account and amount > 0:
                 for db in get_db():
                     current_client = get_client_by_pa(db, personal_account)
 
                     new_payment = PaymentCreate(
                         amount=amount,
                         client_id=int(current_client.id),
+                        external_id=self.payment_key,
                     )
-                    new_payment_db = create_payment(db, new_payment)
-
-                    new_balance = amount + current_client.balance
-                    client_for_update = ClientUpdate(
-                        balance=new_balance,
-                    )
-                    current_client.balance += amount
-                    update_client(db, int(current_client.id), client_for_update)
+                    # Платеж и пополнение баланса проводятся одной транзакцией, если абонента
+                    # не изменили после открытия окна (например, второй оператор уже внес платеж)
+                    new_payment_db = post_payment(db, new_payment, expected_version=self.client_version)
+                    if new_payment_db is None:
+                        messagebox.showerror("Ошибка!", "Не удалось провести платеж.")
+                        return
                     messagebox.showinfo(
                         "Успех!",
                         f"Внесена сумма: {amount} руб. \nдля Клиента: {current_client.full_name} \nЛицевой счёт: {current_client.personal_account}"
@@ -1213,6 +1669,13 @@ class WindowAddPayment(tkinter.Toplevel):
 
                     break
             self.destroy()
+        except StaleDataError:
+            messagebox.showwarning(
+                "Внимание!",
+                "Данные абонента изменились после открытия окна (возможно, платеж уже внесен).\n"
+                "Проверьте баланс и повторите оплату."
+            )
+            self._refresh_client()
         except (Exception, ValidationError) as e:
             messagebox.showerror(
                 "Ошибка!",
@@ -1225,6 +1688,16 @@ class WindowAddPayment(tkinter.Toplevel):
         self.full_name_text.set(current_client.full_name)
         self.balance_text.set(str(current_client.balance))
         self.status_text.set("Активный" if current_client.is_active else "Приостановлен")
+        self.client_version = current_client.version
+
+    def _refresh_client(self):
+        """Перечитывает баланс и версию абонента после изменения другим пользователем."""
+        for db in get_db():
+            client = get_client_by_pa(db, int(self.personal_account.get()))
+            if client:
+                self.balance_text.set(str(client.balance))
+                self.client_version = client.version
+            break
 
 
 class WindowAddTariff(tkinter.Toplevel):
@@ -1278,8 +1751,8 @@ class WindowAddTariff(tkinter.Toplevel):
             return
 
         try:
-            # Преобразуем цену в число (float)
-            price = float(price_str.replace(',', '.'))
+            # Преобразуем цену в сумму с точностью до копейки (Decimal)
+            price = to_money(price_str)
         except ValueError:
             messagebox.showerror("Ошибка ввода", "Некорректный формат цены. Используйте цифры и точку.")
             return
@@ -1305,6 +1778,71 @@ class WindowAddTariff(tkinter.Toplevel):
             messagebox.showerror("Ошибка добавления", f"Не удалось добавить тариф:\n{e}")
 
 
+class WindowTariffPrice(tkinter.Toplevel):
+    """Класс для вызова окна изменения цены тарифа с указанной даты."""
+
+    def __init__(self, parent, tariff_name: str):
+        super().__init__(parent)
+        self.parent = parent
+        self.tariff_name = tariff_name
+        self.title('Изменить цену тарифа')
+        self.geometry('400x200')
+        self.resizable(False, False)
+
+        main_frame = ttk.Frame(self, padding=10)
+        main_frame.pack(fill="both", expand=True)
+
+        ttk.Label(main_frame, text=f"Тариф: {tariff_name}").grid(row=0, column=0, columnspan=2, padx=5, pady=5,
+                                                                 sticky="w")
+
+        ttk.Label(main_frame, text="Новая стоимость в месяц:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.tariff_price_entry = ttk.Entry(main_frame, width=25)
+        self.tariff_price_entry.grid(row=1, column=1, padx=5, pady=5, sticky="we")
+
+        # Цена действует с начала месяца, в который попадает дата
+        ttk.Label(main_frame, text="Действует с:").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.effective_from_entry = DateEntry(main_frame, width=22, date_pattern="dd.mm.yyyy")
+        self.effective_from_entry.grid(row=2, column=1, padx=5, pady=5, sticky="we")
+
+        ttk.Button(main_frame, text="Сохранить", command=self._save_price).grid(
+            row=3, column=0, columnspan=2, pady=15
+        )
+
+        main_frame.columnconfigure(1, weight=1)
+
+        self.transient(parent)
+        self.grab_set()
+
+    def _save_price(self):
+        """Обрабатывает нажатие кнопки 'Сохранить'."""
+        price_str = self.tariff_price_entry.get().strip()
+        if not price_str:
+            messagebox.showwarning("Внимание", "Укажите новую стоимость.")
+            return
+
+        try:
+            price = to_money(price_str)
+        except ValueError:
+            messagebox.showerror("Ошибка ввода", "Некорректный формат цены. Используйте цифры и точку.")
+            return
+
+        effective_from = self.effective_from_entry.get_date()
+        for db in get_db():
+            tariff = get_tariff_by_name(db, self.tariff_name)
+            tariff_price = set_tariff_price(db, tariff.id, price, effective_from) if tariff else None
+            if tariff_price is None:
+                messagebox.showerror("Ошибка", "Не удалось изменить цену тарифа.")
+                return
+            messagebox.showinfo(
+                "Успех",
+                f"Цена тарифа {self.tariff_name} {price:.2f} руб. действует с {effective_from:%d.%m.%Y}."
+            )
+            break
+
+        self.parent._load_tariffs()
+        self.destroy()
+
+
 class WindowAddService(tkinter.Toplevel):
     """Класс для вызова окна добавления Услуги."""
 
@@ -1356,8 +1894,8 @@ class WindowAddService(tkinter.Toplevel):
             return
 
         try:
-            # Преобразуем цену в число (float)
-            price = float(price_str.replace(',', '.'))
+            # Преобразуем цену в сумму с точностью до копейки (Decimal)
+            price = to_money(price_str)
         except ValueError:
             messagebox.showerror("Ошибка ввода", "Некорректный формат цены. Используйте цифры и точку.")
             return
@@ -1392,6 +1930,8 @@ class WindowEditAndViewClient(tkinter.Toplevel):
         self.title("Карточка абонента")
         self.geometry("650x450")
         self.resizable(False, False)
+        # Версия абонента на момент открытия карточки (см. set_data_client)
+        self.client_version = None
 
         notebook = ttk.Notebook(self)
         notebook.pack(pady=10, padx=10, expand=True, fill="both")
@@ -1412,17 +1952,21 @@ class WindowEditAndViewClient(tkinter.Toplevel):
 
         self.transient(parent)
 
-    def set_data_client(self, client: ClientCard):
+    def set_data_client(self, client: ClientCard, accruals: Sequence[Accrual], payments: Sequence[Payment]):
         """Функция заполняет данные абонента из базы в Карточку абонента.
         :param client: Базовая модель Клиента.
+        :param accruals: Начисления абонента.
+        :param payments: Платежи абонента.
         """
+        self.client_version = client.version
         passport_client = client.passport
 
         self.personal_account_entry.insert(0, int(client.personal_account))
         self.full_name_entry.insert(0, client.full_name)
         self.text_address.insert(0, client.address)
         self.phone_entry.insert(0, client.phone_number)
-        self.tariff_entry.current(self._get_tariffs().index(client.tariff))
+        if client.tariff_id in self.tariff_ids:
+            self.tariff_entry.current(self.tariff_ids.index(client.tariff_id))
         self.balance_entry.insert(0, float(client.balance))
         self.combo_status.current(self.status_list.index(client.status))
         if client.status_date:
@@ -1435,27 +1979,23 @@ class WindowEditAndViewClient(tkinter.Toplevel):
         for item in self.tree_accruals.get_children():
             self.tree_accruals.delete(item)
 
-        for db in get_db():
-            for accrual in get_accruals_by_client(db, client_id=client.client_id):
-                (self.tree_accruals.insert("", "end", values=(
-                    accrual.created_at.strftime("%d.%m.%Y"),
-                    accrual.amount,
-                    accrual.accrual_date.month,
-                )))
-            break
+        for accrual in accruals:
+            (self.tree_accruals.insert("", "end", values=(
+                accrual.created_at.strftime("%d.%m.%Y"),
+                accrual.amount,
+                accrual.accrual_date.month,
+            )))
 
         for item in self.tree_payments.get_children():
             self.tree_payments.delete(item)
 
-        for db in get_db():
-            for payment in get_payments_by_client(db, client_id=client.client_id):
-                (self.tree_payments.insert("", "end", values=(
-                    payment.id,
-                    payment.payment_date.strftime("%d.%m.%Y"),
-                    payment.amount,
-                    payment.status.title(),
-                )))
-            break
+        for payment in payments:
+            (self.tree_payments.insert("", "end", values=(
+                payment.id,
+                payment.payment_date.strftime("%d.%m.%Y"),
+                payment.amount,
+                payment.status.title(),
+            )))
 
     def on_ok(self):
         """Функция сохранения данных из карточки Абонента."""
@@ -1471,7 +2011,7 @@ class WindowEditAndViewClient(tkinter.Toplevel):
             full_name=self.full_name_entry.get(),
             address=self.text_address.get(),
             phone_number=self.phone_entry.get(),
-            tariff=self.tariff_entry.get(),
+            tariff_id=self._get_selected_tariff_id(),
             # balance=float(self.balance_entry.get()),
             passport=passport,
             status=self.combo_status.get(),
@@ -1587,10 +2127,13 @@ class WindowEditAndViewClient(tkinter.Toplevel):
         tariff_name = self.tariff_entry.get()
         tariff = None
         service = None  # Услуга должна называться 'Подключение'
+        tariff_price = None
         db = next(get_db())
         try:
             tariff = get_tariff_by_name(db, tariff_name)
             service = get_service_by_name(db, "Подключение")
+            if tariff:
+                tariff_price = get_tariff_prices_on(db, date.today())[tariff.id]
         finally:
             db.close()
 
@@ -1605,7 +2148,7 @@ class WindowEditAndViewClient(tkinter.Toplevel):
 
         sheet['C32'] = tariff.name
         sheet['L32'] = service.service_price
-        sheet['Z32'] = tariff.monthly_price
+        sheet['Z32'] = tariff_price
 
         sheet['AG38'] = datetime.now().strftime("%d.%m.%Y")
 
@@ -1617,15 +2160,17 @@ class WindowEditAndViewClient(tkinter.Toplevel):
             os.startfile(result)
 
     def _get_tariffs(self):
-        """Получает тарифы из базы и возвращает списком"""
+        """Получает тарифы из базы и возвращает списком названий (ID тарифов — в self.tariff_ids)"""
         try:
             list_tariffs = []
+            self.tariff_ids = []
             for db in get_db():
                 tariffs = get_tariffs(db)
                 if tariffs:
 
                     for tariff in tariffs:
                         list_tariffs.append(tariff.name)
+                        self.tariff_ids.append(tariff.id)
                     return list_tariffs
                 else:
                     list_tariffs[0] = "Нет"
@@ -1637,6 +2182,11 @@ class WindowEditAndViewClient(tkinter.Toplevel):
                 f"Возникла ошибка!\nПодробности: \n{e}"
             )
 
+    def _get_selected_tariff_id(self):
+        """Возвращает ID тарифа, выбранного в списке тарифов, или None."""
+        index = self.tariff_entry.current()
+        return self.tariff_ids[index] if 0 <= index < len(self.tariff_ids) else None
+
     def _get_all_services(self):
         """Получает услуги из базы и возвращает списком"""
         try:
@@ -1665,27 +2215,30 @@ class WindowEditAndViewClient(tkinter.Toplevel):
             service = get_service_by_name(db, self.combo_services.get())
             client = get_client_by_pa(db, int(self.personal_account_entry.get()))
             if service and client:
-                current_accrual = create_accrual(
+                # Начисление и списание с баланса проводятся одной транзакцией
+                current_accrual = post_accrual(
                     db,
                     AccrualCreate(
-                        amount=float(service.service_price),
+                        amount=service.service_price,
                         accrual_date=datetime.today(),
                         client_id=int(client.id),
-                    )
+                    ),
+                    expected_version=self.client_version,
                 )
                 if current_accrual:
-                    update_client(
-                        db,
-                        client.id,
-                        ClientUpdate(
-                            balance=float(client.balance - service.service_price),
-                        )
-                    )
+                    self.client_version = client.version
+                    self.balance_entry.delete(0, END)
+                    self.balance_entry.insert(0, float(client.balance))
                     messagebox.showinfo(
                         "Успешно!",
                         f"Услуга - {service.service_name} на сумму {service.service_price} успешно начислена абоненту {client.full_name}!"
                     )
 
+        except StaleDataError:
+            messagebox.showwarning(
+                "Внимание!",
+                "Данные абонента изменились после открытия карточки.\nОткройте карточку заново и повторите начисление."
+            )
         except Exception as e:
             messagebox.showerror("Ошибка!", f"Ошибка начисления оплаты!\n{e}")
         finally:
@@ -2080,7 +2633,7 @@ class WindowReport(tkinter.Toplevel):
 
         clients = None
         for db in get_db():
-            clients = get_debtors_report(db)
+            clients = get_debtor_rows(db)
             break
 
         # 3. Отображение
@@ -2096,7 +2649,7 @@ class WindowReport(tkinter.Toplevel):
 
         payments = None
         for db in get_db():
-            payments = get_payments_in_range(db, self.start_date, self.end_date)
+            payments = list(iter_payment_report_rows(db, self.start_date, self.end_date))
             break
 
         # 3. Отображение
@@ -2108,7 +2661,7 @@ class WindowReport(tkinter.Toplevel):
         for item in self.tree_frame.get_children():
             self.tree_frame.delete(item)
 
-        total_sum = 0.0
+        total_sum = Decimal("0")
 
         for client in clients:
             self.tree_frame.insert("", "end", values=(
@@ -2118,28 +2671,25 @@ class WindowReport(tkinter.Toplevel):
                 f"{client.balance:.2f}",  # Форматируем баланс
                 client.status.value,
             ))
-            total_sum += float(client.balance)
+            total_sum += client.balance
 
         self.total_amount_var.set(f"{total_sum:,.2f}".replace(",", " "))
 
     def _display_payments(self, payments):
-        """Отображает список платежей и обновляет итог."""
+        """Отображает строки платежей (PaymentReportRow) и обновляет итог."""
         for item in self.tree_frame.get_children():
             self.tree_frame.delete(item)
 
-        total_sum = 0.0
+        total_sum = Decimal("0")
 
-        for db in get_db():
-            for payment in payments:
-                client = get_client_by_id(db, payment.client_id)
-                self.tree_frame.insert("", "end", values=(
-                    client.personal_account,
-                    client.full_name,
-                    payment.payment_date.strftime("%d.%m.%Y"),
-                    f"{payment.amount:.2f}",
-                ))
-                total_sum += float(payment.amount)
-            break
+        for payment in payments:
+            self.tree_frame.insert("", "end", values=(
+                payment.personal_account,
+                payment.full_name,
+                payment.payment_date.strftime("%d.%m.%Y"),
+                f"{payment.amount:.2f}",
+            ))
+            total_sum += payment.amount
 
         self.total_amount_var.set(f"{total_sum:,.2f}".replace(",", " "))
 
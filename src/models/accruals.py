@@ -1,13 +1,41 @@
 from datetime import datetime
+from decimal import Decimal
 
 from pydantic import BaseModel, Field
 
+from src.models.money import Money
+
 
 class AccrualBase(BaseModel):
-    amount: float = Field(...)
+    amount: Money = Field(...)
     accrual_date: datetime
     client_id: int = Field(...)
 
 
 class AccrualCreate(AccrualBase):
-    pass
\ No newline at end of file
+    pass
+
+
+class AccrualSummary(BaseModel):
+    """Итог массового начисления за месяц."""
+    clients_charged: int = Field(0, description="Количество абонентов, которым выполнено начисление.")
+    total_amount: Money = Field(Decimal("0"), description="Общая сумма начислений.")
+
+
+class TariffSimulation(BaseModel):
+    """Прогноз начисления по одному тарифу."""
+    tariff: str = Field(..., description="Название тарифа.")
+    monthly_price: Money = Field(..., description="Стоимость тарифа в прогнозе.")
+    clients_charged: int = Field(0, description="Количество абонентов с начислением.")
+    current_amount: Money = Field(Decimal("0"), description="Сумма начисления по текущей цене.")
+    projected_amount: Money = Field(Decimal("0"), description="Сумма начисления по цене прогноза.")
+    new_debtors: int = Field(0, description="Количество абонентов, у которых баланс станет отрицательным.")
+
+
+class AccrualSimulation(BaseModel):
+    """Прогноз ежемесячного начисления при изменении стоимости тарифов."""
+    clients_charged: int = Field(0, description="Количество абонентов с начислением.")
+    current_amount: Money = Field(Decimal("0"), description="Сумма начисления по текущим ценам.")
+    projected_amount: Money = Field(Decimal("0"), description="Сумма начисления по ценам прогноза.")
+    new_debtors: int = Field(0, description="Количество абонентов, у которых баланс станет отрицательным.")
+    by_tariff: list[TariffSimulation] = Field(default_factory=list, description="Разбивка по тарифам.")
@@ -1,9 +1,11 @@
 from datetime import datetime
+from decimal import Decimal
 from typing import Optional
 
 from pydantic import BaseModel, Field, ConfigDict
 
 from src.db.models import StatusClientEnum
+from src.models.money import Money
 
 
 class ClientBase(BaseModel):
@@ -12,8 +14,8 @@ class ClientBase(BaseModel):
     full_name: str = Field(..., description='Полное ФИО клиента.', min_length=3)
     address: str = Field(..., description='Адрес подключения.', min_length=3)
     phone_number: str = Field(..., description='Номер телефона.', min_length=5)
-    tariff: str = Field(..., description='Название выбранного тарифа.')
-    balance: float = Field(0.0, description='Начальный баланс.')
+    tariff_id: int = Field(..., description='ID выбранного тарифа.')
+    balance: Money = Field(Decimal("0"), description='Начальный баланс.')
 
 
 class ClientCreate(ClientBase):
@@ -23,6 +25,7 @@ class ClientCreate(ClientBase):
 
 class ClientForPayments(ClientBase):
     is_active: int
+    version: Optional[int] = None
 
 
 class ClientCard(ClientBase):
@@ -32,6 +35,7 @@ class ClientCard(ClientBase):
     passport: Optional[dict] = None
     status: Optional[StatusClientEnum] = None
     status_date: datetime = None
+    version: Optional[int] = None
 
 
 class ClientUpdate(ClientBase):
@@ -40,8 +44,8 @@ class ClientUpdate(ClientBase):
     full_name: Optional[str] = None
     address: Optional[str] = None
     phone_number: Optional[str] = None
-    tariff: Optional[str] = None
-    balance: Optional[float] = None
+    tariff_id: Optional[int] = None
+    balance: Optional[Money] = None
     is_active: Optional[int] = None
     passport: Optional[dict] = None
     status: Optional[StatusClientEnum] = None
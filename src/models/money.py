@@ -0,0 +1,54 @@
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from typing import Annotated
+
+from pydantic import BeforeValidator, PlainSerializer
+
+# Денежные суммы хранятся в базе целым числом копеек, в программе — Decimal с двумя знаками
+KOPECK = Decimal("0.01")
+
+
+def to_money(value) -> Decimal:
+    """
+    Приводит сумму (Decimal, int, float или строку) к Decimal с точностью до копейки.
+
+    float преобразуется через строку, поэтому 0.1 становится Decimal('0.10'), а не
+    двоичным приближением. Половина копейки округляется от нуля (как ROUND в SQLite).
+
+    :raises ValueError: Если значение не является конечным числом.
+    """
+    if isinstance(value, float):
+        value = repr(value)
+    if isinstance(value, str):
+        value = value.strip().replace(",", ".")
+    try:
+        money = Decimal(value)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Некорректная сумма: {value!r}") from None
+    if not money.is_finite():
+        raise ValueError(f"Некорректная сумма: {value!r}")
+    return money.quantize(KOPECK, rounding=ROUND_HALF_UP)
+
+
+def to_kopecks(value) -> int:
+    """Переводит сумму в рублях в целое число копеек."""
+    return int(to_money(value) * 100)
+
+
+def from_kopecks(kopecks: int) -> Decimal:
+    """Переводит целое число копеек в сумму в рублях (Decimal с двумя знаками)."""
+    return (Decimal(int(kopecks)) / 100).quantize(KOPECK)
+
+
+def prorate_kopecks(kopecks: int, used_days: int, days: int) -> int:
+    """
+    Доля суммы в копейках за used_days из days дней: kopecks * used_days / days,
+    половина копейки округляется от нуля. Вычисляется целочисленно, без float.
+    """
+    numerator = kopecks * used_days
+    sign = -1 if numerator < 0 else 1
+    return sign * ((abs(numerator) * 2 + days) // (days * 2))
+
+
+# Денежная сумма в моделях Pydantic: принимает числа и строки ("12,50"), хранит Decimal
+# с двумя знаками после запятой, в JSON выводится строкой без потери точности
+Money = Annotated[Decimal, BeforeValidator(to_money), PlainSerializer(str, return_type=str, when_used="json")]
@@ -1,12 +1,16 @@
+import enum
+from datetime import datetime
+from decimal import Decimal
 from typing import Optional
 
 from pydantic import BaseModel, Field
 
 from src.db.models import CurrencyEnum, StatusEnum
+from src.models.money import Money
 
 
 class PaymentBase(BaseModel):
-    amount: float = Field(...)
+    amount: Money = Field(...)
     currency: CurrencyEnum = Field(default=CurrencyEnum.RUB)
     status: StatusEnum = Field(default=StatusEnum.PAID)
     external_id: str = Field(...)
@@ -17,3 +21,37 @@ class PaymentCreate(PaymentBase):
     currency: Optional[CurrencyEnum] = None
     status: Optional[StatusEnum] = None
     external_id: Optional[str] = None
+
+
+class PostingStatusEnum(str, enum.Enum):
+    """Результат проведения строки реестра платежей."""
+    POSTED = "Проведен"
+    UNKNOWN_ACCOUNT = "Неизвестный лицевой счет"
+    DUPLICATE = "Повтор"
+    REJECTED = "Отклонен"
+
+
+class RegistryPayment(BaseModel):
+    """Строка реестра платежей из банка."""
+    personal_account: int = Field(..., description="Лицевой счет абонента.")
+    amount: Money = Field(..., gt=0, description="Сумма платежа (больше нуля).")
+    external_id: Optional[str] = Field(None, description="Идентификатор платежа в реестре банка.")
+    payment_date: Optional[datetime] = Field(None, description="Дата платежа (по умолчанию — дата проведения).")
+
+
+class PaymentPostingResult(BaseModel):
+    """Результат проведения одной строки реестра (в порядке строк реестра)."""
+    personal_account: int
+    external_id: Optional[str] = None
+    amount: Money
+    status: PostingStatusEnum
+
+
+class PaymentPostingSummary(BaseModel):
+    """Итог проведения реестра платежей."""
+    posted: int = Field(0, description="Количество проведенных платежей.")
+    unknown_accounts: int = Field(0, description="Количество строк с неизвестным лицевым счетом.")
+    duplicates: int = Field(0, description="Количество повторно загруженных платежей.")
+    rejected: int = Field(0, description="Количество строк с суммой не больше нуля.")
+    total_amount: Money = Field(Decimal("0"), description="Сумма проведенных платежей.")
+    results: list[PaymentPostingResult] = Field(default_factory=list, description="Результаты по строкам реестра.")
@@ -1,9 +1,11 @@
 from pydantic import BaseModel, Field
 
+from src.models.money import Money
+
 
 class ServiceBase(BaseModel):
     service_name: str = Field(..., description="Название услуги.")
-    service_price: float = Field(..., description="Cтоимость.")
+    service_price: Money = Field(..., description="Cтоимость.")
 
 
 class ServiceCreate(ServiceBase):
@@ -1,9 +1,11 @@
 from pydantic import BaseModel, Field
 
+from src.models.money import Money
+
 
 class TariffBase(BaseModel):
     name: str = Field(..., description="Название тарифа.")
-    monthly_price: float = Field(..., description="Ежемесячная стоимость.")
+    monthly_price: Money = Field(..., description="Ежемесячная стоимость.")
 
 
 class TariffCreate(TariffBase):
@@ -0,0 +1,6 @@
+"""
+Тесты программы (unittest из стандартной библиотеки).
+
+Запуск из корня репозитория:
+    python -m unittest discover -s tests -t .
+"""
@@ -0,0 +1,41 @@
+"""Общие заготовки тестов: базы данных SQLite во временном каталоге."""
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic import generate_database
+from src.db.database import BaseModel, create_db_engine
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Тест с временным каталогом для файлов баз данных (каталог удаляется после теста)."""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.work_dir = work_dir.name
+
+    def database_path(self, name: str) -> str:
+        """Путь к файлу базы данных во временном каталоге теста."""
+        return os.path.join(self.work_dir, name)
+
+    def open_database(self, path: str, profile: str = "desktop-safe") -> sessionmaker:
+        """Возвращает фабрику сессий базы данных (движок закрывается после теста)."""
+        engine = create_db_engine(f"sqlite:///{path}", profile)
+        self.addCleanup(engine.dispose)
+        return sessionmaker(bind=engine, autoflush=False)
+
+    def empty_database(self, name: str = "test.db") -> sessionmaker:
+        """Создает пустую базу данных со всеми таблицами моделей."""
+        session_factory = self.open_database(self.database_path(name))
+        BaseModel.metadata.create_all(session_factory.kw["bind"])
+        return session_factory
+
+    def synthetic_database(self, name: str, clients: int, today: date, seed: int = 1) -> str:
+        """Создает синтетическую базу абонентов (benchmarks/synthetic.py) и возвращает путь к ней."""
+        path = self.database_path(name)
+        generate_database(path, clients, datetime.combine(today, datetime.min.time()), seed)
+        return path
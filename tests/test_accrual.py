@@ -0,0 +1,278 @@
+"""Ежемесячное начисление набором SQL-запросов, расчет в пуле процессов и доначисление."""
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from sqlalchemy import select
+
+from benchmarks.legacy_accrual import legacy_accrual
+from src.db import parallel_accrual
+from src.db.billing_calendar import billing_period_of, prorate
+from src.db.crud import apply_monthly_accrual, run_monthly_accrual, backfill_accruals, get_accrual_run, \
+    accrual_period, daily_charge_period
+from src.db.models import Client, Accrual, AccrualRun, Tariff, StatusClientEnum
+from tests.support import DatabaseTestCase
+
+ACCRUAL_DATE = date(2026, 10, 3)
+# Начисления абонентам тестовой базы (по лицевому счету) на ACCRUAL_DATE
+EXPECTED_CHARGES = {1: Decimal("310.00"), 2: Decimal("999.99"), 3: Decimal("166.67"), 4: Decimal("548.38")}
+
+
+def _accrual_state(session_factory) -> tuple[list, list]:
+    """Начисления (абонент, сумма) и балансы всех абонентов базы."""
+    with session_factory() as db:
+        accruals = sorted(db.execute(select(Accrual.client_id, Accrual.amount)).tuples())
+        balances = db.execute(select(Client.id, Client.balance).order_by(Client.id)).tuples().all()
+    return accruals, balances
+
+
+class _Interrupted(Exception):
+    """Прерывание начисления из функции отслеживания хода (как отмена в GUI)."""
+
+
+class MonthlyAccrualTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session_factory = self.empty_database()
+        self.client_ids = self._fill_database(self.session_factory)
+
+    def _fill_database(self, session_factory) -> dict[int, int]:
+        """Заполняет базу абонентами на все правила начисления, возвращает {лицевой счет: id абонента}."""
+        with session_factory() as db:
+            basic = Tariff(name="Базовый", monthly_price=Decimal("310.00"))
+            premium = Tariff(name="Премиум", monthly_price=Decimal("999.99"))
+            db.add_all([basic, premium])
+            db.flush()
+            clients = [
+                # Подключен в прошлом году — полная стоимость тарифа
+                self._client(1, basic, datetime(2025, 8, 15)),
+                # Подключен в прошлом месяце этого года — пропорционально, 30 дней из 30 дней сентября
+                self._client(2, premium, datetime(2026, 9, 1)),
+                # 5 дней из 30: 999.99 * 5 / 30 = 166.665, половина копейки округляется вверх
+                self._client(3, premium, datetime(2026, 9, 26)),
+                # Статус изменен в месяце начисления — пропорционально, 31 - 15 + 1 = 17 дней из 31
+                self._client(4, premium, datetime(2026, 3, 15), status_date=datetime(2026, 10, 2)),
+                # Начисление в этом месяце уже выполнено
+                self._client(5, basic, datetime(2025, 8, 15), accrual_date=datetime(2026, 10, 1)),
+                # Приостановленным абонентам ежемесячное начисление не выполняется
+                self._client(6, basic, datetime(2025, 8, 15), status=StatusClientEnum.PAUSE,
+                             status_date=datetime(2026, 9, 10)),
+            ]
+            db.add_all(clients)
+            db.commit()
+            return {client.personal_account: client.id for client in clients}
+
+    @staticmethod
+    def _client(number: int, tariff: Tariff, connection_date: datetime, status=StatusClientEnum.CONNECTING,
+                status_date: datetime = None, accrual_date: datetime = None) -> Client:
+        return Client(personal_account=number, full_name=f"Абонент{number}", address=f"кв. {number}",
+                      phone_number=f"8900{number:07d}", tariff_id=tariff.id, connection_date=connection_date,
+                      status=status, status_date=status_date, accrual_date=accrual_date, balance=Decimal("0"))
+
+    def assertCharged(self, expected: dict):
+        """Проверяет начисления и балансы абонентов (суммы начислений по лицевым счетам)."""
+        accruals, balances = _accrual_state(self.session_factory)
+        self.assertEqual(accruals, sorted((self.client_ids[number], amount) for number, amount in expected.items()))
+        self.assertEqual(balances, [(self.client_ids[number], -expected.get(number, Decimal("0")))
+                                    for number in sorted(self.client_ids)])
+
+    def test_charges_by_client_rules(self):
+        progress = []
+        with self.session_factory() as db:
+            summary = apply_monthly_accrual(db, ACCRUAL_DATE, batch_size=4,
+                                            on_progress=lambda *counts: progress.append(counts))
+            db.commit()
+
+        self.assertEqual(progress, [(4, 6), (6, 6)])
+        self.assertCharged(EXPECTED_CHARGES)
+        self.assertEqual(summary.clients_charged, len(EXPECTED_CHARGES))
+        self.assertEqual(summary.total_amount, sum(EXPECTED_CHARGES.values()))
+
+    def test_period_is_charged_once(self):
+        with self.session_factory() as db:
+            summary = run_monthly_accrual(db, ACCRUAL_DATE)
+            state = _accrual_state(self.session_factory)
+
+            run = get_accrual_run(db, accrual_period(ACCRUAL_DATE))
+            self.assertIsNotNone(run.finished_at)
+            self.assertEqual((run.clients_count, run.total_amount), (summary.clients_charged, summary.total_amount))
+            self.assertIsNone(run_monthly_accrual(db, ACCRUAL_DATE))
+            # Ручное повторное начисление не начисляет абонентам, которым начисление уже выполнено
+            self.assertEqual(run_monthly_accrual(db, ACCRUAL_DATE, force=True).clients_charged, 0)
+        self.assertEqual(_accrual_state(self.session_factory), state)
+
+    def _synthetic_copies(self, accrual_date: date, clients: int = 500) -> tuple:
+        """Две одинаковые синтетические базы для сравнения способов начисления."""
+        path = self.synthetic_database(f"{accrual_date}.db", clients, accrual_date)
+        copy_path = self.database_path(f"{accrual_date}-copy.db")
+        shutil.copy(path, copy_path)
+        return self.open_database(path), self.open_database(copy_path)
+
+    def test_matches_per_client_accrual(self):
+        """Начисление пачками совпадает с прежним обходом абонентов по одному до копейки."""
+        for accrual_date in (ACCRUAL_DATE, date(2026, 3, 2), date(2026, 2, 1)):
+            with self.subTest(accrual_date=accrual_date):
+                legacy, chunked = self._synthetic_copies(accrual_date)
+                with legacy() as db:
+                    legacy_accrual(db, accrual_date)
+                with chunked() as db:
+                    summary = run_monthly_accrual(db, accrual_date, batch_size=37)
+
+                accruals, balances = _accrual_state(chunked)
+                self.assertEqual((accruals, balances), _accrual_state(legacy))
+                self.assertEqual(summary.clients_charged, len(accruals))
+                self.assertEqual(summary.total_amount, sum(amount for _, amount in accruals))
+
+    def test_resumes_after_interruption(self):
+        """Прерванное начисление продолжается с контрольной точки и начисляет каждому абоненту один раз."""
+        def _interrupt(processed, total_clients):
+            if processed > 2:
+                raise _Interrupted
+
+        with self.session_factory() as db:
+            with self.assertRaises(_Interrupted):
+                run_monthly_accrual(db, ACCRUAL_DATE, batch_size=2, on_progress=_interrupt)
+            run = get_accrual_run(db, accrual_period(ACCRUAL_DATE))
+            self.assertIsNone(run.finished_at)
+            self.assertEqual(run.last_client_id, self.client_ids[2])
+            self.assertCharged({number: EXPECTED_CHARGES[number] for number in (1, 2)})
+
+            summary = run_monthly_accrual(db, ACCRUAL_DATE, batch_size=2)
+            self.assertEqual(summary.clients_charged, 2)
+            run = get_accrual_run(db, accrual_period(ACCRUAL_DATE))
+            self.assertIsNotNone(run.finished_at)
+            self.assertEqual(run.clients_count, len(EXPECTED_CHARGES))
+        self.assertCharged(EXPECTED_CHARGES)
+
+    def test_parallel_matches_serial(self):
+        """Расчет сумм в пуле процессов дает те же начисления, балансы и итоги журнала."""
+        serial = self.empty_database("serial.db")
+        self._fill_database(serial)
+        with serial() as db:
+            run_monthly_accrual(db, ACCRUAL_DATE, batch_size=2)
+
+        with mock.patch.object(parallel_accrual, "PARALLEL_ACCRUAL_MIN_CLIENTS", 1), \
+                mock.patch.object(parallel_accrual, "ProcessPoolExecutor", wraps=ProcessPoolExecutor) as pool:
+            with self.session_factory() as db:
+                summary = run_monthly_accrual(db, ACCRUAL_DATE, batch_size=2, workers=2)
+        pool.assert_called_once()
+
+        self.assertEqual(summary.clients_charged, len(EXPECTED_CHARGES))
+        self.assertEqual(_accrual_state(self.session_factory), _accrual_state(serial))
+        runs = []
+        for session_factory in (self.session_factory, serial):
+            with session_factory() as db:
+                run = get_accrual_run(db, accrual_period(ACCRUAL_DATE))
+                runs.append((run.clients_count, run.total_amount, run.last_client_id, run.finished_at is not None))
+        self.assertEqual(runs[0], runs[1])
+
+
+class ProratedAccrualTest(DatabaseTestCase):
+
+    def test_per_client_period_matches_set_engine(self):
+        """Пропорциональная оплата считается по длине того же месяца, что и в начислении набором запросов."""
+        session_factory = self.empty_database()
+        with session_factory() as db:
+            premium = Tariff(name="Премиум", monthly_price=Decimal("999.99"))
+            db.add(premium)
+            db.flush()
+            # Подключен в прошлом месяце этого года: доля месяца подключения (30 дней сентября)
+            connected = MonthlyAccrualTest._client(1, premium, datetime(2026, 9, 1))
+            # Статус изменен в месяце начисления: доля месяца начисления (31 день октября)
+            changed = MonthlyAccrualTest._client(2, premium, datetime(2026, 3, 15), status_date=datetime(2026, 10, 2))
+            db.add_all([connected, changed])
+            db.commit()
+
+            self.assertEqual(daily_charge_period(connected, ACCRUAL_DATE), billing_period_of(date(2026, 9, 1)))
+            self.assertEqual(daily_charge_period(changed, ACCRUAL_DATE), billing_period_of(ACCRUAL_DATE))
+            expected = {
+                connected.id: prorate(Decimal("999.99"), 30, daily_charge_period(connected, ACCRUAL_DATE)),
+                changed.id: prorate(Decimal("999.99"), 17, daily_charge_period(changed, ACCRUAL_DATE)),
+            }
+            self.assertEqual(expected, {connected.id: Decimal("999.99"), changed.id: Decimal("548.38")})
+
+            run_monthly_accrual(db, ACCRUAL_DATE)
+            charged = dict(db.execute(select(Accrual.client_id, Accrual.amount)).all())
+
+        self.assertEqual(charged, expected)
+
+
+class BackfillTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session_factory = self.empty_database()
+        with self.session_factory() as db:
+            basic = Tariff(name="Базовый", monthly_price=Decimal("310.00"))
+            db.add(basic)
+            db.flush()
+            clients = [
+                # Подключен в марте этого года, последнее начисление в мае: июнь - сентябрь полностью
+                Client(personal_account=1, full_name="Абонент1", address="кв. 1", phone_number="89000000001",
+                       tariff_id=basic.id, connection_date=datetime(2026, 3, 10),
+                       accrual_date=datetime(2026, 5, 1), balance=Decimal("0")),
+                # Подключен в августе прошлого года, последнее начисление в декабре: январь - сентябрь
+                # полностью, в том числе август
+                Client(personal_account=2, full_name="Абонент2", address="кв. 2", phone_number="89000000002",
+                       tariff_id=basic.id, connection_date=datetime(2025, 8, 15),
+                       accrual_date=datetime(2025, 12, 1), balance=Decimal("0")),
+                # Приостановлен в августе: доначисление не выполняется
+                Client(personal_account=3, full_name="Абонент3", address="кв. 3", phone_number="89000000003",
+                       tariff_id=basic.id, connection_date=datetime(2025, 11, 15), status=StatusClientEnum.PAUSE,
+                       status_date=datetime(2026, 8, 20), accrual_date=datetime(2026, 6, 1), balance=Decimal("0")),
+                # Подключен в текущем месяце: доначислять нечего
+                Client(personal_account=4, full_name="Абонент4", address="кв. 4", phone_number="89000000004",
+                       tariff_id=basic.id, connection_date=datetime(2026, 10, 1), balance=Decimal("0")),
+                # Подключен в марте, но ни разу не получал начисление: пропуск не определить,
+                # начисление выполняет только ежемесячное начисление текущего месяца
+                Client(personal_account=5, full_name="Абонент5", address="кв. 5", phone_number="89000000005",
+                       tariff_id=basic.id, connection_date=datetime(2026, 3, 10), balance=Decimal("0")),
+            ]
+            db.add_all(clients)
+            db.commit()
+            self.client_ids = [client.id for client in clients]
+
+    def _accruals(self, db, client_id: int) -> list[tuple[str, Decimal]]:
+        rows = db.execute(
+            select(Accrual.accrual_date, Accrual.amount)
+            .where(Accrual.client_id == client_id)
+            .order_by(Accrual.accrual_date)
+        )
+        return [(accrual_date.strftime("%Y-%m"), amount) for accrual_date, amount in rows]
+
+    def test_missed_months_are_charged(self):
+        with self.session_factory() as db:
+            summary = backfill_accruals(db, ACCRUAL_DATE, 12)
+
+            self.assertEqual(self._accruals(db, self.client_ids[0]),
+                             [(f"2026-{month:02d}", Decimal("310.00")) for month in range(6, 10)])
+            self.assertEqual(self._accruals(db, self.client_ids[1]),
+                             [(f"2026-{month:02d}", Decimal("310.00")) for month in range(1, 10)])
+            self.assertEqual(self._accruals(db, self.client_ids[2]), [])
+            self.assertEqual(self._accruals(db, self.client_ids[3]), [])
+            self.assertEqual(self._accruals(db, self.client_ids[4]), [])
+            self.assertEqual((summary.clients_charged, summary.total_amount), (13, Decimal("4030.00")))
+            for month in range(1, 10):
+                run = get_accrual_run(db, f"2026-{month:02d}")
+                clients_count = 2 if month >= 6 else 1
+                self.assertEqual((run.clients_count, run.total_amount),
+                                 (clients_count, Decimal("310.00") * clients_count))
+
+            # Текущий период освобожден для ежемесячного начисления (абоненты 1, 2, 4 и 5)
+            self.assertEqual(run_monthly_accrual(db, ACCRUAL_DATE).clients_charged, 4)
+            # Абонент 5 подключен в этом году: ежемесячное начисление считает оплату по месяцу подключения
+            self.assertEqual(self._accruals(db, self.client_ids[4]), [("2026-10", Decimal("220.00"))])
+
+    def test_skipped_while_period_is_held(self):
+        with self.session_factory() as db:
+            # Начисление текущего периода выполняется другим экземпляром программы
+            db.add(AccrualRun(period=accrual_period(ACCRUAL_DATE), started_at=datetime.now(),
+                              heartbeat_at=datetime.now(), last_client_id=0, clients_count=0,
+                              total_amount=Decimal("0")))
+            db.commit()
+
+            self.assertIsNone(backfill_accruals(db, ACCRUAL_DATE, 12))
+            self.assertEqual(db.execute(select(Accrual.id)).all(), [])
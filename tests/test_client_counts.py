@@ -0,0 +1,38 @@
+"""Счетчики абонентов по статусам в таблице client_status_counts."""
+from collections import Counter
+from datetime import date
+
+from sqlalchemy import delete, select, update
+
+from src.db.crud import count_clients_by_status
+from src.db.models import Client, StatusClientEnum
+from tests.support import DatabaseTestCase
+
+COUNT_DATE = date(2026, 10, 3)
+
+
+class ClientStatusCountsTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session_factory = self.open_database(self.synthetic_database("counts.db", 1000, COUNT_DATE))
+
+    def assertCountsMatchClients(self, db):
+        expected = Counter(db.execute(select(Client.status)).scalars())
+        self.assertEqual(count_clients_by_status(db), {status: expected[status] for status in StatusClientEnum})
+
+    def test_counts_follow_client_changes(self):
+        with self.session_factory() as db:
+            self.assertCountsMatchClients(db)
+
+            # Массовая смена статуса, удаление и изменение одного абонента через ORM
+            db.execute(update(Client).where(Client.id <= 100).values(status=StatusClientEnum.PAUSE))
+            db.execute(delete(Client).where(Client.id.between(101, 150)))
+            client = db.get(Client, 200)
+            client.status = StatusClientEnum.DISCONNECTING
+            db.commit()
+            self.assertCountsMatchClients(db)
+
+            db.execute(delete(Client))
+            db.commit()
+            self.assertEqual(set(count_clients_by_status(db).values()), {0})
@@ -0,0 +1,48 @@
+"""Поиск абонентов по полнотекстовому индексу clients_fts."""
+from datetime import date
+
+from sqlalchemy import select, update
+
+from src.db.crud import search_clients, search_client_rows
+from src.db.models import Client
+from tests.support import DatabaseTestCase
+
+SEARCH_DATE = date(2026, 10, 3)
+
+
+class ClientSearchTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session_factory = self.open_database(self.synthetic_database("search.db", 1000, SEARCH_DATE))
+        with self.session_factory() as db:
+            self.renamed_id = db.execute(select(Client.id).where(Client.personal_account == 100500)).scalar_one()
+            # Изменение ФИО должно попасть в индекс через триггер
+            db.execute(update(Client).where(Client.id == self.renamed_id).values(full_name="Ёлкина Анна Петровна"))
+            db.commit()
+
+    def _found_ids(self, term: str, limit=None) -> list[int]:
+        with self.session_factory() as db:
+            return [client.id for client in search_clients(db, term, limit)]
+
+    def test_cyrillic_case_and_yo(self):
+        for term in ("ёлкина", "ЕЛК", "елкина анна"):
+            with self.subTest(term=term):
+                self.assertEqual(self._found_ids(term), [self.renamed_id])
+
+    def test_words_match_as_prefixes(self):
+        with self.session_factory() as db:
+            expected = db.execute(
+                select(Client.id).where(Client.full_name.like("Абонент12%")).order_by(Client.id)
+            ).scalars().all()
+            rows = search_client_rows(db, "абонент12")
+        self.assertEqual(len(expected), 11)
+        self.assertEqual([row.id for row in rows], expected)
+
+    def test_digits_match_personal_account(self):
+        with self.session_factory() as db:
+            accounts = [client.personal_account for client in search_clients(db, "1001")]
+        self.assertEqual(accounts, list(range(100100, 100200)))
+
+    def test_limit(self):
+        self.assertEqual(len(self._found_ids("абонент", limit=25)), 25)
@@ -0,0 +1,133 @@
+"""Создание базы данных (init_db), проверка схемы существующей базы и миграции Alembic."""
+import os
+import warnings
+from decimal import Decimal
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, select, text
+from sqlalchemy.exc import SAWarning
+
+from src.db.client_counts import has_client_status_counts
+from src.db.client_search import has_clients_fts
+from src.db.crud import search_clients, count_clients_by_status
+from src.db.database import init_db, schema_differences, OutdatedSchemaError
+from src.db.models import Client, Payment, Tariff, StatusClientEnum
+from tests.support import DatabaseTestCase
+
+# Схема базы данных до перехода на журнал начислений, tariff_id и суммы в копейках
+# (с нее начинается цепочка миграций migration/versions)
+_OUTDATED_SCHEMA = [
+    """
+    CREATE TABLE tariffs (
+        name VARCHAR NOT NULL UNIQUE, monthly_price FLOAT NOT NULL, is_active BOOLEAN NOT NULL,
+        id INTEGER NOT NULL PRIMARY KEY,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE clients (
+        personal_account INTEGER NOT NULL UNIQUE, full_name VARCHAR NOT NULL, address VARCHAR NOT NULL UNIQUE,
+        phone_number VARCHAR NOT NULL UNIQUE, tariff VARCHAR NOT NULL,
+        connection_date DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, accrual_date DATETIME,
+        balance FLOAT NOT NULL, is_active BOOLEAN NOT NULL, status VARCHAR(13) NOT NULL, status_date DATETIME,
+        passport JSON NOT NULL, id INTEGER NOT NULL PRIMARY KEY,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE services (
+        service_name VARCHAR NOT NULL UNIQUE, service_price FLOAT NOT NULL, id INTEGER NOT NULL PRIMARY KEY,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE payments (
+        amount FLOAT NOT NULL, payment_date DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, currency VARCHAR(3),
+        status VARCHAR(8), external_id VARCHAR, client_id INTEGER NOT NULL REFERENCES clients (id),
+        id INTEGER NOT NULL PRIMARY KEY,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE accruals (
+        amount FLOAT NOT NULL, accrual_date DATETIME, client_id INTEGER NOT NULL REFERENCES clients (id),
+        id INTEGER NOT NULL PRIMARY KEY,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+    )
+    """,
+    "INSERT INTO tariffs (id, name, monthly_price, is_active) VALUES (1, 'Базовый', 310.0, 1)",
+    """
+    INSERT INTO clients (id, personal_account, full_name, address, phone_number, tariff, connection_date,
+                         accrual_date, balance, is_active, status, passport)
+    VALUES (1, 100001, 'Ёлкина Анна Петровна', 'ул. Ленина, д. 1, кв. 1', '89000000001', 'Базовый',
+            '2025-03-10 00:00:00', '2026-09-01 00:00:00', -155.55, 1, 'CONNECTING', '{}')
+    """,
+    "INSERT INTO payments (client_id, amount, external_id) VALUES (1, 500.1, 'bank:1'), (1, 20.0, 'bank:1')",
+]
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+class InitDbTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session_factory = self.open_database(self.database_path("test.db"))
+        self.engine = self.session_factory.kw["bind"]
+
+    def test_creates_new_database(self):
+        init_db(self.engine)
+        # Повторный запуск программы с той же базой
+        init_db(self.engine)
+        with self.engine.connect() as connection:
+            self.assertEqual(schema_differences(connection), [])
+            self.assertTrue(has_clients_fts(connection))
+
+    def test_refuses_outdated_database(self):
+        with self.engine.begin() as connection:
+            for statement in _OUTDATED_SCHEMA:
+                connection.execute(text(statement))
+
+        with self.assertRaises(OutdatedSchemaError) as raised:
+            init_db(self.engine)
+        self.assertIn("нет столбца clients.tariff_id", str(raised.exception))
+        self.assertIn("сумма clients.balance хранится не в копейках", str(raised.exception))
+
+        # База не изменена: новые таблицы и индексы создаются миграциями
+        with self.engine.connect() as connection:
+            inspector = inspect(connection)
+            self.assertEqual(set(inspector.get_table_names()), {"tariffs", "clients", "services", "payments", "accruals"})
+            self.assertEqual(inspector.get_indexes("clients"), [])
+
+    def test_migrated_database_opens(self):
+        with self.engine.begin() as connection:
+            for statement in _OUTDATED_SCHEMA:
+                connection.execute(text(statement))
+
+        config = Config(ALEMBIC_INI)
+        config.set_main_option("sqlalchemy.url", self.engine.url.render_as_string(hide_password=False))
+        # Журналирование тестов не перенастраивается по alembic.ini
+        config.attributes["configure_logger"] = False
+        with warnings.catch_warnings():
+            # Индексы по выражениям не читаются из схемы при пересоздании таблиц, ревизия c41f7a2e9d63 создает их заново
+            warnings.filterwarnings("ignore", "Skipped unsupported reflection", SAWarning)
+            command.upgrade(config, "head")
+
+        init_db(self.engine)
+        with self.session_factory() as db:
+            connection = db.connection()
+            self.assertEqual(schema_differences(connection), [])
+            self.assertTrue(has_clients_fts(connection))
+            self.assertTrue(has_client_status_counts(connection))
+
+            # Данные перенесены: тариф по id, суммы в копейках, повтор внешнего идентификатора переименован
+            client = db.get(Client, 1)
+            self.assertEqual(client.tariff_id, db.execute(select(Tariff.id)).scalar_one())
+            self.assertEqual(client.balance, Decimal("-155.55"))
+            amounts = db.execute(select(Payment.amount).order_by(Payment.id)).scalars().all()
+            self.assertEqual(amounts, [Decimal("500.10"), Decimal("20.00")])
+            external_ids = db.execute(select(Payment.external_id)).scalars().all()
+            self.assertEqual(len(set(external_ids)), 2)
+            self.assertEqual([found.id for found in search_clients(db, "елкина")], [1])
+            self.assertEqual(count_clients_by_status(db)[StatusClientEnum.CONNECTING], 1)
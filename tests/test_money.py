@@ -0,0 +1,98 @@
+"""Денежные суммы: Decimal с точностью до копейки в программе, целые копейки в базе."""
+import unittest
+from decimal import Decimal
+
+from sqlalchemy import select, func, literal, text, Integer
+
+from src.db.billing_calendar import get_billing_period, prorate
+from src.db.crud import _prorate_expr
+from src.db.models import Client, Tariff
+from src.models.money import to_money, to_kopecks, from_kopecks, prorate_kopecks
+from src.models.tariffs import TariffCreate
+from tests.support import DatabaseTestCase
+
+
+class ToMoneyTest(unittest.TestCase):
+
+    def test_float_is_converted_by_its_decimal_representation(self):
+        self.assertEqual(to_money(0.1), Decimal("0.10"))
+        self.assertEqual(to_money(0.1 + 0.2), Decimal("0.30"))
+
+    def test_half_kopeck_is_rounded_away_from_zero(self):
+        self.assertEqual(to_money("0.005"), Decimal("0.01"))
+        self.assertEqual(to_money("-0.005"), Decimal("-0.01"))
+        self.assertEqual(to_money("2.675"), Decimal("2.68"))
+
+    def test_string_with_comma(self):
+        self.assertEqual(to_money(" 12,5 "), Decimal("12.50"))
+
+    def test_invalid_amount(self):
+        for value in ("abc", "", None, "nan", float("inf")):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    to_money(value)
+
+    def test_kopecks_round_trip(self):
+        for value in ("0", "0.01", "999.99", "-500.10", "123456.78"):
+            with self.subTest(value=value):
+                self.assertEqual(from_kopecks(to_kopecks(value)), Decimal(value).quantize(Decimal("0.01")))
+        self.assertEqual(to_kopecks(999.99), 99999)
+
+    def test_money_field(self):
+        tariff = TariffCreate(name="Базовый", monthly_price="350,5")
+        self.assertEqual(tariff.monthly_price, Decimal("350.50"))
+        self.assertIn('"monthly_price":"350.50"', tariff.model_dump_json())
+
+
+class ProrateTest(unittest.TestCase):
+
+    def test_prorate_kopecks(self):
+        self.assertEqual(prorate_kopecks(99999, 30, 31), 96773)
+        self.assertEqual(prorate_kopecks(31000, 31, 31), 31000)
+        self.assertEqual(prorate_kopecks(31000, 0, 31), 0)
+        # Половина копейки округляется от нуля
+        self.assertEqual(prorate_kopecks(1, 1, 2), 1)
+        self.assertEqual(prorate_kopecks(-1, 1, 2), -1)
+
+    def test_prorate_by_billing_period(self):
+        self.assertEqual(prorate(Decimal("310.00"), 22, get_billing_period(2026, 3)), Decimal("220.00"))
+        self.assertEqual(prorate(Decimal("999.99"), 30, get_billing_period(2026, 9)), Decimal("999.99"))
+        self.assertEqual(prorate(Decimal("999.99"), 30, get_billing_period(2026, 10)), Decimal("967.73"))
+
+
+class KopecksColumnTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session_factory = self.empty_database()
+
+    def test_stored_as_integer_kopecks(self):
+        with self.session_factory() as db:
+            db.add(Tariff(name="Премиум", monthly_price=Decimal("999.99")))
+            db.commit()
+            self.assertEqual(db.execute(text("SELECT monthly_price FROM tariffs")).scalar_one(), 99999)
+            self.assertEqual(db.execute(select(Tariff.monthly_price)).scalar_one(), Decimal("999.99"))
+
+    def test_sum_is_exact(self):
+        with self.session_factory() as db:
+            tariff = Tariff(name="Базовый", monthly_price=Decimal("350"))
+            db.add(tariff)
+            db.flush()
+            for number in range(10):
+                db.add(Client(personal_account=number, full_name=f"Абонент{number}", address=f"кв. {number}",
+                              phone_number=f"8900{number:07d}", tariff_id=tariff.id, balance=0.1))
+            db.commit()
+            self.assertEqual(db.execute(select(func.sum(Client.balance))).scalar_one(), Decimal("1.00"))
+
+    def test_sql_prorate_matches_python(self):
+        """Доля суммы в SQL (начисление набором запросов) совпадает с prorate_kopecks до копейки."""
+        cases = [(kopecks, used_days, days)
+                 for kopecks in (25000, 35000, 60050, 99999, 1)
+                 for days in (28, 29, 30, 31)
+                 for used_days in range(days + 1)]
+        with self.session_factory() as db:
+            for kopecks, used_days, days in cases:
+                expr = _prorate_expr(literal(kopecks, Integer), literal(used_days, Integer), literal(days, Integer))
+                with self.subTest(kopecks=kopecks, used_days=used_days, days=days):
+                    self.assertEqual(db.execute(select(expr)).scalar_one(),
+                                     prorate_kopecks(kopecks, used_days, days))
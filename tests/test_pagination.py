@@ -0,0 +1,142 @@
+"""Постраничное чтение списков поиском по ключу (keyset) и курсоры страниц."""
+import base64
+import unittest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert, select
+
+from src.db.crud import (
+    get_clients_page, iter_clients, get_client_rows_page, iter_client_rows, get_payments_page,
+    get_payments_in_range_page, iter_payments_in_range, iter_payment_report_rows, get_accruals_page,
+    run_monthly_accrual, search_client_rows, CLIENT_ROW_SORT_KEYS,
+)
+from src.db.models import Accrual, Client, Payment, StatusClientEnum
+from src.db.pagination import encode_cursor, decode_cursor, walk_pages
+from tests.support import DatabaseTestCase
+
+PAGE_DATE = date(2026, 10, 3)
+PAYMENT_TIME = datetime(2026, 10, 3, 12, 0)
+
+
+class CursorTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        values = [datetime(2026, 10, 3, 12, 30), date(2026, 10, 3), Decimal("-12.50"), 42, "Абонент1", None]
+        self.assertEqual(decode_cursor(encode_cursor(values)), values)
+
+    def test_enum_is_encoded_by_name(self):
+        # Перечисления хранятся в базе по имени элемента
+        self.assertEqual(decode_cursor(encode_cursor([StatusClientEnum.PAUSE])), ["PAUSE"])
+
+    def test_damaged_cursor(self):
+        not_a_list = base64.urlsafe_b64encode(b'{"id": 1}').decode("ascii")
+        unknown_type = base64.urlsafe_b64encode(b'[{"time": "12:30"}]').decode("ascii")
+        for cursor in ("не курсор", "bm90IGpzb24=", not_a_list, unknown_type):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    decode_cursor(cursor)
+
+
+class PagesTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session_factory = self.open_database(self.synthetic_database("pages.db", 1000, PAGE_DATE))
+        with self.session_factory() as db:
+            client_ids = db.execute(select(Client.id).order_by(Client.id)).scalars().all()
+            # Платежи с одинаковым временем попадают на границы страниц
+            db.execute(insert(Payment), [
+                {"client_id": client_id, "amount": Decimal("100.00"),
+                 "created_at": PAYMENT_TIME + timedelta(minutes=number % 5)}
+                for number, client_id in enumerate(client_ids[:300])
+            ])
+            db.commit()
+            run_monthly_accrual(db, PAGE_DATE)
+
+    def test_clients_pages_cover_every_client_once(self):
+        with self.session_factory() as db:
+            client_ids = db.execute(select(Client.id).order_by(Client.id)).scalars().all()
+            paged_ids = [client.id for client in walk_pages(lambda cursor: get_clients_page(db, cursor, 37))]
+            iterated_ids = [client.id for client in iter_clients(db, page_size=37)]
+        self.assertEqual(paged_ids, client_ids)
+        self.assertEqual(iterated_ids, client_ids)
+
+    def test_client_rows_match_clients(self):
+        with self.session_factory() as db:
+            expected = [
+                (client.id, client.personal_account, client.full_name, client.tariff.name, client.balance, client.status)
+                for client in iter_clients(db)
+            ]
+            paged = list(walk_pages(lambda cursor: get_client_rows_page(db, cursor, 37)))
+            iterated = list(iter_client_rows(db, page_size=37))
+        self.assertEqual(
+            [(row.id, row.personal_account, row.full_name, row.tariff_name, row.balance, row.status) for row in paged],
+            expected,
+        )
+        self.assertEqual(iterated, paged)
+
+    def test_client_rows_pages_follow_sort_order(self):
+        with self.session_factory() as db:
+            rows = get_client_rows_page(db, limit=10 ** 6).items
+            for sort in CLIENT_ROW_SORT_KEYS:
+                # Статусы упорядочиваются по подписи, одинаковые значения — по ID
+                def _sort_key(row, sort=sort):
+                    value = getattr(row, sort)
+                    return value.value if isinstance(value, StatusClientEnum) else value, row.id
+
+                for descending in (False, True):
+                    with self.subTest(sort=sort, descending=descending):
+                        paged = list(walk_pages(lambda cursor: get_client_rows_page(
+                            db, cursor, 37, sort=sort, descending=descending
+                        )))
+                        self.assertEqual(paged, sorted(rows, key=_sort_key, reverse=descending))
+
+    def test_search_pages(self):
+        with self.session_factory() as db:
+            found = search_client_rows(db, "абонент1")
+            paged = list(walk_pages(lambda cursor: get_client_rows_page(db, cursor, 7, search_term="абонент1")))
+        self.assertGreater(len(found), 7)
+        self.assertEqual(paged, found)
+        self.assertTrue(all(row.full_name.startswith("Абонент1") for row in paged))
+
+    def test_payments_and_accruals_pages(self):
+        with self.session_factory() as db:
+            for model, get_page in ((Payment, get_payments_page), (Accrual, get_accruals_page)):
+                with self.subTest(model=model.__name__):
+                    ids = db.execute(select(model.id).order_by(model.id)).scalars().all()
+                    self.assertGreater(len(ids), 37)
+                    paged_ids = [row.id for row in walk_pages(lambda cursor: get_page(db, cursor, 37))]
+                    self.assertEqual(paged_ids, ids)
+
+    def test_payments_in_range_pages_keep_ties(self):
+        start, end = PAYMENT_TIME + timedelta(minutes=1), PAYMENT_TIME + timedelta(minutes=3)
+        with self.session_factory() as db:
+            expected = db.execute(
+                select(Payment.created_at, Payment.id)
+                .where(Payment.created_at.between(start, end))
+                .order_by(Payment.created_at, Payment.id)
+            ).all()
+            paged = [(payment.created_at, payment.id) for payment in walk_pages(
+                lambda cursor: get_payments_in_range_page(db, start, end, cursor, 7)
+            )]
+            iterated = [(payment.created_at, payment.id) for payment in iter_payments_in_range(db, start, end, 7)]
+            report = list(iter_payment_report_rows(db, start, end, 7))
+            payers = {client.id: client.full_name for client in iter_clients(db)}
+            payments = {payment.id: payment.client_id for payment in walk_pages(
+                lambda cursor: get_payments_page(db, cursor)
+            )}
+        self.assertEqual(len(expected), 180)
+        self.assertEqual(paged, [tuple(row) for row in expected])
+        self.assertEqual(iterated, paged)
+        self.assertEqual([(row.created_at, row.id) for row in report], paged)
+        for row in report:
+            self.assertEqual(row.full_name, payers[payments[row.id]])
+
+    def test_cursor_of_other_sort_is_rejected(self):
+        with self.session_factory() as db:
+            cursor = get_client_rows_page(db, limit=10, sort="full_name").next_cursor
+            with self.assertRaises(ValueError):
+                get_client_rows_page(db, cursor, 10)
+            with self.assertRaises(ValueError):
+                get_client_rows_page(db, sort="phone_number")
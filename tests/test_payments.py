@@ -0,0 +1,66 @@
+"""Проведение реестра платежей из банка (post_payments_bulk)."""
+from datetime import datetime
+from decimal import Decimal
+
+from pydantic import ValidationError
+from sqlalchemy import select
+
+from src.db.crud import post_payments_bulk
+from src.db.models import Client, Payment, Tariff
+from src.models.payments import RegistryPayment, PostingStatusEnum
+from tests.support import DatabaseTestCase
+
+
+class RegistryPostingTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session_factory = self.empty_database()
+        with self.session_factory() as db:
+            tariff = Tariff(name="Базовый", monthly_price=Decimal("310.00"))
+            db.add(tariff)
+            db.flush()
+            db.add_all([
+                Client(personal_account=100001, full_name="Абонент1", address="кв. 1", phone_number="89000000001",
+                       tariff_id=tariff.id, connection_date=datetime(2025, 3, 1), balance=Decimal("-310.00")),
+                Client(personal_account=100002, full_name="Абонент2", address="кв. 2", phone_number="89000000002",
+                       tariff_id=tariff.id, connection_date=datetime(2025, 3, 1), balance=Decimal("0")),
+            ])
+            db.commit()
+
+    def _balances(self, db) -> dict[int, Decimal]:
+        return dict(db.execute(select(Client.personal_account, Client.balance)).all())
+
+    def test_amount_must_be_positive(self):
+        for amount in ("0", "-10.00", "0,00"):
+            with self.subTest(amount=amount):
+                with self.assertRaises(ValidationError):
+                    RegistryPayment(personal_account=100001, amount=amount, external_id="bank:1")
+
+    def test_registry_outcomes(self):
+        registry = [
+            RegistryPayment(personal_account=100001, amount="500,10", external_id="bank:1"),
+            RegistryPayment(personal_account=100002, amount="20", external_id="bank:2"),
+            RegistryPayment(personal_account=999999, amount="30", external_id="bank:3"),
+            # Повтор строки внутри реестра
+            RegistryPayment(personal_account=100002, amount="20", external_id="bank:2"),
+            # Строка, созданная без проверки модели, с отрицательной суммой
+            RegistryPayment.model_construct(personal_account=100001, amount=Decimal("-40.00"),
+                                            external_id="bank:5", payment_date=None),
+        ]
+        with self.session_factory() as db:
+            summary = post_payments_bulk(db, registry)
+            self.assertEqual([result.status for result in summary.results], [
+                PostingStatusEnum.POSTED, PostingStatusEnum.POSTED, PostingStatusEnum.UNKNOWN_ACCOUNT,
+                PostingStatusEnum.DUPLICATE, PostingStatusEnum.REJECTED,
+            ])
+            self.assertEqual((summary.posted, summary.duplicates, summary.unknown_accounts, summary.rejected),
+                             (2, 1, 1, 1))
+            self.assertEqual(summary.total_amount, Decimal("520.10"))
+            self.assertEqual(self._balances(db), {100001: Decimal("190.10"), 100002: Decimal("20.00")})
+
+            # Повторная загрузка того же реестра ничего не проводит
+            repeated = post_payments_bulk(db, registry)
+            self.assertEqual((repeated.posted, repeated.duplicates), (0, 3))
+            self.assertEqual(self._balances(db), {100001: Decimal("190.10"), 100002: Decimal("20.00")})
+            self.assertEqual(len(db.execute(select(Payment.id)).all()), 2)
@@ -0,0 +1,76 @@
+"""История цен тарифов и цена расчетного периода."""
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from benchmarks.legacy_accrual import legacy_accrual
+from src.db.crud import set_tariff_price, get_tariff_prices, get_tariff_prices_on, run_monthly_accrual
+from src.db.models import Client, Accrual, Tariff
+from src.db.price_book import TariffPriceBook
+from tests.support import DatabaseTestCase
+
+# Дата начала действия цены, которая наступит позже даты запуска тестов
+FUTURE_PRICE_DATE = date(2030, 1, 1)
+
+
+class TariffPriceBookTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session_factory = self.empty_database()
+        with self.session_factory() as db:
+            tariff = Tariff(name="Базовый", monthly_price=Decimal("310.00"), created_at=datetime(2025, 1, 1))
+            db.add_all([tariff, Tariff(name="Премиум", monthly_price=Decimal("999.99"))])
+            db.flush()
+            db.add(Client(personal_account=1, full_name="Абонент1", address="кв. 1", phone_number="89000000001",
+                          tariff_id=tariff.id, connection_date=datetime(2025, 3, 1), balance=Decimal("0")))
+            db.commit()
+            self.tariff_id = tariff.id
+
+    def test_first_change_keeps_previous_price(self):
+        with self.session_factory() as db:
+            self.assertIsNotNone(set_tariff_price(db, self.tariff_id, Decimal("400.00"), date(2026, 10, 15)))
+            history = [(price.effective_from, price.monthly_price) for price in get_tariff_prices(db, self.tariff_id)]
+            premium_id = db.execute(select(Tariff.id).where(Tariff.name == "Премиум")).scalar_one()
+            book = TariffPriceBook.load(db)
+
+        self.assertEqual(history, [(date(2025, 1, 1), Decimal("310.00")), (date(2026, 10, 15), Decimal("400.00"))])
+        # Цена с середины месяца действует со следующего расчетного периода
+        self.assertEqual(book.period_prices(date(2026, 10, 20)), {self.tariff_id: Decimal("310.00")})
+        self.assertEqual(book.period_prices(date(2026, 11, 1)), {self.tariff_id: Decimal("400.00")})
+        # Раньше первой записи истории — первая цена, тариф без истории — текущая цена тарифа
+        self.assertEqual(book.price(self.tariff_id, date(2024, 5, 1)), Decimal("310.00"))
+        self.assertEqual(book.price(premium_id, date(2026, 11, 1)), Decimal("999.99"))
+
+    def test_accrual_uses_period_price(self):
+        with self.session_factory() as db:
+            set_tariff_price(db, self.tariff_id, Decimal("400.00"), date(2026, 10, 15))
+            run_monthly_accrual(db, date(2026, 10, 20))
+            run_monthly_accrual(db, date(2026, 11, 2))
+            amounts = db.execute(select(Accrual.amount).order_by(Accrual.accrual_date)).scalars().all()
+
+        self.assertEqual(amounts, [Decimal("310.00"), Decimal("400.00")])
+
+    def test_future_price_is_shown_from_its_date(self):
+        with self.session_factory() as db:
+            set_tariff_price(db, self.tariff_id, Decimal("400.00"), FUTURE_PRICE_DATE)
+            monthly_price = db.get(Tariff, self.tariff_id).monthly_price
+            prices_before = get_tariff_prices_on(db, date(2029, 12, 31))
+            prices_after = get_tariff_prices_on(db, FUTURE_PRICE_DATE)
+
+        # Tariff.monthly_price остается прежней, цену на дату дает история цен
+        self.assertEqual(monthly_price, Decimal("310.00"))
+        self.assertEqual(prices_before[self.tariff_id], Decimal("310.00"))
+        self.assertEqual(prices_after[self.tariff_id], Decimal("400.00"))
+        self.assertEqual(set(prices_after.values()), {Decimal("400.00"), Decimal("999.99")})
+
+    def test_per_client_accrual_uses_period_price(self):
+        with self.session_factory() as db:
+            set_tariff_price(db, self.tariff_id, Decimal("400.00"), FUTURE_PRICE_DATE)
+            legacy_accrual(db, date(2030, 2, 2))
+            amounts = db.execute(select(Accrual.amount)).scalars().all()
+            balance = db.execute(select(Client.balance)).scalar_one()
+
+        self.assertEqual(amounts, [Decimal("400.00")])
+        self.assertEqual(balance, Decimal("-400.00"))
@@ -0,0 +1,175 @@
+"""
+Планы запросов (EXPLAIN QUERY PLAN) функций чтения из src/db/crud.py.
+
+На синтетической базе (benchmarks/synthetic.py) с платежами и начислениями выполняется каждая
+функция, все ее запросы SELECT перехватываются и для каждого строится план выполнения.
+Запрос считается ошибочным, если в плане есть полный просмотр таблицы (SCAN без индекса).
+Функции, которые по смыслу читают всю таблицу (списки тарифов, выгрузка абонентов, реестр для банка),
+перечислены в FULL_SCAN_ALLOWED, небольшие справочники — в REFERENCE_TABLES. Поиск по полнотекстовому
+индексу (VIRTUAL TABLE INDEX) полным просмотром не считается. Страницы списка абонентов
+(SORTED_BY_INDEX) при любой сортировке должны читаться по индексу, без сортировки во временном B-дереве.
+
+Запуск из корня репозитория:
+    python -m unittest tests.test_query_plans
+"""
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic import generate_database
+from src.db import crud
+from src.db.database import create_db_engine
+from src.db.models import Client, Payment, Accrual
+
+# Функции, которым полный просмотр таблицы разрешен
+FULL_SCAN_ALLOWED = {"get_clients", "get_tariffs", "get_services", "get_bank_report_rows"}
+
+# Функции, страницы которых должны читаться в порядке индекса (без USE TEMP B-TREE FOR ORDER BY)
+SORTED_BY_INDEX = {"get_client_rows_page"}
+
+# Справочники и счетчики из нескольких строк, которые читаются целиком
+REFERENCE_TABLES = {"tariffs", "services", "client_status_counts"}
+
+PLAN_DATE = date(2026, 10, 3)
+
+
+def _fill_history(db, clients: int):
+    """Добавляет абонентам платежи и начисления, чтобы планы строились по заполненным таблицам."""
+    day = datetime.combine(PLAN_DATE, datetime.min.time())
+    client_ids = db.execute(select(Client.id).limit(clients)).scalars().all()
+    db.execute(insert(Payment), [
+        {"client_id": client_id, "amount": 300.0, "created_at": day - timedelta(days=client_id % 300)}
+        for client_id in client_ids
+    ])
+    db.execute(insert(Accrual), [
+        {"client_id": client_id, "amount": 350.0, "accrual_date": day - timedelta(days=30 * (client_id % 12))}
+        for client_id in client_ids
+    ])
+    db.execute(text("ANALYZE"))
+    db.commit()
+
+
+def _cases(db):
+    """Функции чтения и их аргументы на синтетической базе."""
+    client = db.execute(select(Client).limit(1)).scalar_one()
+    day = datetime.combine(PLAN_DATE, datetime.min.time())
+    week_ago = day - timedelta(days=7)
+    # Планы следующих страниц: курсор берется с первой страницы
+    clients_cursor = crud.get_clients_page(db, limit=100).next_cursor
+    payments_cursor = crud.get_payments_page(db, limit=100).next_cursor
+    range_cursor = crud.get_payments_in_range_page(db, week_ago, day, limit=100).next_cursor
+    accruals_cursor = crud.get_accruals_page(db, limit=100).next_cursor
+    client_rows_cursor = crud.get_client_rows_page(db, limit=100).next_cursor
+    found_rows_cursor = crud.get_client_rows_page(db, limit=10, search_term="абонент1").next_cursor
+    sorted_rows_cursors = {
+        (sort, descending): crud.get_client_rows_page(db, limit=100, sort=sort, descending=descending).next_cursor
+        for sort in crud.CLIENT_ROW_SORT_KEYS for descending in (False, True)
+    }
+    return [
+        ("get_client_by_id", crud.get_client_by_id, (db, client.id)),
+        ("get_client_by_pa", crud.get_client_by_pa, (db, client.personal_account)),
+        ("get_clients", crud.get_clients, (db,)),
+        ("get_clients_page", crud.get_clients_page, (db, clients_cursor)),
+        ("get_client_rows_page", crud.get_client_rows_page, (db, client_rows_cursor)),
+        ("get_client_rows_page(поиск)", crud.get_client_rows_page, (db, found_rows_cursor, 10, "абонент1")),
+        *(
+            (f"get_client_rows_page({sort}{', desc' if descending else ''})", crud.get_client_rows_page,
+             (db, cursor, 100, None, sort, descending))
+            for (sort, descending), cursor in sorted_rows_cursors.items()
+        ),
+        ("search_clients", crud.search_clients, (db, "Абонент1")),
+        ("search_clients(Л/С)", crud.search_clients, (db, "10001")),
+        ("search_client_rows", crud.search_client_rows, (db, "абонент12 лен", 100)),
+        ("count_clients_by_status", crud.count_clients_by_status, (db,)),
+        ("get_tariffs", crud.get_tariffs, (db,)),
+        ("get_tariff_by_name", crud.get_tariff_by_name, (db, "Базовый")),
+        ("get_tariff_by_id", crud.get_tariff_by_id, (db, 1)),
+        ("get_tariff_prices", crud.get_tariff_prices, (db, 1)),
+        ("get_services", crud.get_services, (db,)),
+        ("get_service_by_name", crud.get_service_by_name, (db, "Интернет")),
+        ("get_payment_by_id", crud.get_payment_by_id, (db, 1)),
+        ("get_payment_by_external_id", crud.get_payment_by_external_id, (db, "bank:0:1")),
+        ("get_debtors_report", crud.get_debtors_report, (db,)),
+        ("get_debtor_rows", crud.get_debtor_rows, (db,)),
+        ("get_bank_report_rows", crud.get_bank_report_rows, (db,)),
+        ("get_payments_by_client", crud.get_payments_by_client, (db, client.id)),
+        ("get_last_payment_by_client", crud.get_last_payment_by_client, (db, client.id)),
+        ("get_payments_page", crud.get_payments_page, (db, payments_cursor)),
+        ("get_payments_page(client_id)", crud.get_payments_page, (db, None, 100, client.id)),
+        ("get_payments_in_range", crud.get_payments_in_range, (db, week_ago, day)),
+        ("get_payments_in_range_page", crud.get_payments_in_range_page, (db, week_ago, day, range_cursor)),
+        ("iter_payment_report_rows", lambda *args: list(crud.iter_payment_report_rows(*args)), (db, week_ago, day)),
+        ("get_accruals_by_client", crud.get_accruals_by_client, (db, client.id)),
+        ("get_accruals_page", crud.get_accruals_page, (db, accruals_cursor)),
+        ("get_accruals_page(client_id)", crud.get_accruals_page, (db, None, 100, client.id)),
+        ("get_last_accrual_by_client", crud.get_last_accrual_by_client, (db, client.id)),
+        ("get_accrual_run", crud.get_accrual_run, (db, crud.accrual_period(PLAN_DATE))),
+        ("apply_monthly_accrual", crud.apply_monthly_accrual, (db, PLAN_DATE)),
+    ]
+
+
+def _temp_sorts(plan: list[str]) -> list[str]:
+    """Строки плана с сортировкой результата во временном B-дереве."""
+    return [detail for detail in plan if detail.startswith("USE TEMP B-TREE FOR") and "ORDER BY" in detail]
+
+
+def _full_scans(plan: list[str]) -> list[str]:
+    """Строки плана с полным просмотром таблицы (без индекса)."""
+    return [
+        detail for detail in plan
+        if detail.startswith("SCAN ") and "USING" not in detail and "CONSTANT ROW" not in detail
+        and "VIRTUAL TABLE INDEX" not in detail
+        and detail.split()[1] not in REFERENCE_TABLES and not detail.split()[1].startswith("sqlite_")
+    ]
+
+
+class QueryPlanTest(unittest.TestCase):
+    """Запросы функций чтения на синтетической базе из 20 000 абонентов выполняются по индексам."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.work_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.work_dir.name, "plans.db")
+        generate_database(path, 20_000, datetime.combine(PLAN_DATE, datetime.min.time()))
+        cls.engine = create_db_engine(f"sqlite:///{path}", "desktop-safe")
+        cls.captured = []
+
+        @event.listens_for(cls.engine, "before_cursor_execute")
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and not executemany:
+                cls.captured.append((statement, parameters))
+
+        cls.db = sessionmaker(bind=cls.engine, autoflush=False)()
+        _fill_history(cls.db, 20_000)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+        cls.engine.dispose()
+        cls.work_dir.cleanup()
+
+    def _plan_problems(self, name: str, function, args) -> list[str]:
+        """Выполняет функцию и возвращает строки планов ее запросов с полным просмотром или сортировкой."""
+        self.captured.clear()
+        function(*args)
+        self.db.rollback()
+
+        problems = []
+        with self.engine.connect() as connection:
+            for statement, parameters in list(self.captured):
+                plan = [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+                problems.extend(_full_scans(plan))
+                if name.split("(")[0] in SORTED_BY_INDEX:
+                    problems.extend(_temp_sorts(plan))
+        return sorted(set(problems))
+
+    def test_queries_use_indexes(self):
+        for name, function, args in _cases(self.db):
+            with self.subTest(name):
+                problems = self._plan_problems(name, function, args)
+                if name not in FULL_SCAN_ALLOWED:
+                    self.assertEqual(problems, [], f"{name}: полный просмотр или сортировка без индекса")
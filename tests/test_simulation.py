@@ -0,0 +1,87 @@
+"""Прогноз начисления (AccrualSimulator) в сравнении с ежемесячным начислением в базе."""
+import random
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import select, func
+
+from src.db.crud import apply_monthly_accrual
+from src.db.models import Client, Accrual, Tariff, StatusClientEnum
+from src.db.simulation import AccrualSimulator
+from tests.support import DatabaseTestCase
+
+ACCRUAL_DATE = date(2026, 10, 3)
+# Архивный тариф — неактивный тариф с нулевой ценой, как после перевода абонентов на tariff_id
+TARIFFS = {"Базовый": Decimal("310.00"), "Премиум": Decimal("999.99"), "Стандарт": Decimal("555.55"),
+           "Архивный": Decimal("0")}
+
+
+class AccrualSimulatorTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session_factory = self.empty_database()
+        rnd = random.Random(5)
+        start = datetime(2025, 1, 1)
+        with self.session_factory() as db:
+            tariffs = [Tariff(name=name, monthly_price=price, is_active=bool(price)) for name, price in TARIFFS.items()]
+            db.add_all(tariffs)
+            db.flush()
+            for number in range(1, 1001):
+                connection_date = start + timedelta(days=rnd.randrange(640))
+                status = rnd.choice(list(StatusClientEnum))
+                changed = connection_date + timedelta(days=rnd.randrange(30))
+                db.add(Client(
+                    personal_account=number, full_name=f"Абонент{number}", address=f"кв. {number}",
+                    phone_number=f"8900{number:07d}", tariff_id=rnd.choice(tariffs).id,
+                    connection_date=connection_date, status=status,
+                    status_date=rnd.choice([None, changed, datetime(2026, 10, rnd.randint(1, 3))]),
+                    accrual_date=rnd.choice([None, datetime(2026, 9, 1), datetime(2026, 10, 1)]),
+                    balance=Decimal(rnd.randint(-50000, 150000)) / 100,
+                ))
+            db.commit()
+
+    def _charged_by_tariff(self, db) -> dict[str, tuple[int, Decimal]]:
+        rows = db.execute(
+            select(Tariff.name, func.count(Accrual.id), func.sum(Accrual.amount))
+            .join(Client, Client.tariff_id == Tariff.id)
+            .join(Accrual, Accrual.client_id == Client.id)
+            .group_by(Tariff.name)
+        )
+        return {tariff: (count, amount) for tariff, count, amount in rows}
+
+    def test_matches_monthly_accrual(self):
+        """Прогноз при текущих ценах совпадает с начислением в базе до копейки."""
+        with self.session_factory() as db:
+            simulation = AccrualSimulator(db).simulate(ACCRUAL_DATE)
+            balances = dict(db.execute(select(Client.id, Client.balance)).all())
+
+            summary = apply_monthly_accrual(db, ACCRUAL_DATE)
+            charged = self._charged_by_tariff(db)
+            new_debtors = sum(1 for client_id, balance in db.execute(select(Client.id, Client.balance))
+                              if balance < 0 <= balances[client_id])
+
+        self.assertGreater(summary.clients_charged, 0)
+        self.assertEqual(simulation.clients_charged, summary.clients_charged)
+        self.assertEqual(simulation.current_amount, summary.total_amount)
+        self.assertEqual(simulation.projected_amount, summary.total_amount)
+        self.assertEqual(simulation.new_debtors, new_debtors)
+        self.assertEqual(
+            {row.tariff: (row.clients_charged, row.projected_amount) for row in simulation.by_tariff
+             if row.clients_charged},
+            charged,
+        )
+
+    def test_new_prices(self):
+        """Прогноз с новой ценой совпадает с начислением в базе после изменения цены."""
+        with self.session_factory() as db:
+            simulator = AccrualSimulator(db)
+            simulation = simulator.simulate(ACCRUAL_DATE, {"Премиум": Decimal("1199.99")})
+
+            db.execute(Tariff.__table__.update().where(Tariff.name == "Премиум").values(monthly_price=Decimal("1199.99")))
+            summary = apply_monthly_accrual(db, ACCRUAL_DATE)
+
+        self.assertEqual(simulation.current_amount, simulator.simulate(ACCRUAL_DATE).projected_amount)
+        self.assertEqual(simulation.projected_amount, summary.total_amount)
+        premium = next(row for row in simulation.by_tariff if row.tariff == "Премиум")
+        self.assertEqual(premium.monthly_price, Decimal("1199.99"))
@@ -0,0 +1,42 @@
+"""Профили настроек соединения SQLite."""
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from src.db.database import SQLITE_PROFILES, create_db_engine
+from tests.support import DatabaseTestCase
+
+
+class SqliteProfileTest(DatabaseTestCase):
+
+    def test_pragmas_are_applied(self):
+        # (journal_mode, synchronous, foreign_keys, query_only)
+        expected = {
+            "desktop-safe": ("wal", 1, 1, 0),
+            "bulk-load": ("wal", 0, 1, 0),
+            "read-only-reporting": ("wal", 1, 1, 1),
+        }
+        self.assertEqual(set(expected), set(SQLITE_PROFILES))
+        for profile, pragmas in expected.items():
+            with self.subTest(profile=profile):
+                engine = create_db_engine(f"sqlite:///{self.database_path('test.db')}", profile)
+                self.addCleanup(engine.dispose)
+                with engine.connect() as connection:
+                    values = tuple(connection.execute(text(f"PRAGMA {name}")).scalar()
+                                   for name in ("journal_mode", "synchronous", "foreign_keys", "query_only"))
+                self.assertEqual(values, pragmas)
+
+    def test_read_only_profile_rejects_writes(self):
+        path = self.database_path("test.db")
+        session_factory = self.open_database(path)
+        with session_factory() as db:
+            db.execute(text("CREATE TABLE notes (id INTEGER PRIMARY KEY)"))
+            db.commit()
+
+        with self.open_database(path, "read-only-reporting")() as db:
+            self.assertEqual(db.execute(text("SELECT count(*) FROM notes")).scalar(), 0)
+            with self.assertRaises(OperationalError):
+                db.execute(text("INSERT INTO notes DEFAULT VALUES"))
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            create_db_engine(f"sqlite:///{self.database_path('test.db')}", "fast")